@@ -1,8 +1,11 @@
 from flask import Flask
 from config import Config
 from loguru import logger
+from app.lifecycle import PROCESS_STARTED_AT
 import os
+import time
 def create_app():
+    baslangic = time.perf_counter()
     app = Flask(__name__)
     app.config.from_object(Config)
 
@@ -11,10 +14,36 @@ def create_app():
     logger.add(Config.LOG_FILE, rotation="10 MB", level="INFO")
     
 
+    # İstek süreleri/sayıları ve Server-Timing için
+    from app.metrics import init_app as init_metrics
+    init_metrics(app)
+
     from app.routes import main_bp, auth_bp, admin_bp
     app.register_blueprint(main_bp)
     app.register_blueprint(auth_bp, url_prefix='/api/auth')
     app.register_blueprint(admin_bp, url_prefix='/api/admin')
 
-    logger.info("Flask uygulaması başlatıldı.")
-    return app
\ No newline at end of file
+    # Yüz ile giriş için galeri indeksini başlangıçta bir kere kuruyorum.
+    from app.models import User, ensure_indexes
+    from app.gallery import gallery_index
+    ensure_indexes()
+    try:
+        user_model = User()
+        gallery_index.vector_loader = user_model.load_face_embeddings
+        gallery_index.build(user_model.iter_gallery_entries())
+    except Exception as e:
+        logger.error(f"Galeri indeksi oluşturulurken hata: {e}")
+
+    # Modeller (TensorFlow, MediaPipe) isteklere bloklamadan arka planda yükleniyor; /readyz hazır olunca 200 döner.
+    # Kapalıysa ilk yüz isteğinde yükleniyor.
+    # INFERENCE_MODE='process' ise modeller bu süreçte değil çıkarım havuzunun işçilerinde yükleniyor.
+    from app.utils import model_manager
+    from app.procpool import inference_pool
+    if inference_pool is not None:
+        inference_pool.start()
+    elif Config.MODEL_PRELOAD:
+        model_manager.preload()
+
+    logger.info(f"Flask uygulaması başlatıldı ({time.perf_counter() - baslangic:.2f} sn, "
+                f"süreç başlangıcından {time.monotonic() - PROCESS_STARTED_AT:.2f} sn).")
+    return app
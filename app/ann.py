@@ -0,0 +1,241 @@
+import functools
+
+import numpy as np
+from loguru import logger
+
+from config import Config
+from app.quantization import ProductQuantizer, ScalarQuantizer
+
+
+# Atama/eğitim sırasında bellek patlamasın diye satırları bu boyutta parçalar halinde işliyorum.
+_CHUNK_ROWS = 65536
+
+
+def _assign(matrix, centroids):
+    """Her satırı en yakın (kosinüs) merkeze atar."""
+    atamalar = np.empty(matrix.shape[0], dtype=np.int32)
+    for bas in range(0, matrix.shape[0], _CHUNK_ROWS):
+        parca = matrix[bas:bas + _CHUNK_ROWS]
+        atamalar[bas:bas + parca.shape[0]] = np.argmax(parca @ centroids.T, axis=1)
+    return atamalar
+
+
+def train_spherical_kmeans(matrix, n_clusters, n_iter=10, sample_size=None, seed=0):
+    """
+    Simge: Normalize vektörler üzerinde küresel k-means, IVF'in kaba nicemleyicisi için.
+    """
+    rng = np.random.default_rng(seed)
+    if sample_size and matrix.shape[0] > sample_size:
+        matrix = matrix[rng.choice(matrix.shape[0], sample_size, replace=False)]
+    n_clusters = min(n_clusters, matrix.shape[0])
+    centroids = matrix[rng.choice(matrix.shape[0], n_clusters, replace=False)].copy()
+
+    for _ in range(n_iter):
+        atamalar = _assign(matrix, centroids)
+        toplamlar = np.zeros_like(centroids)
+        np.add.at(toplamlar, atamalar, matrix)
+        bos = ~np.any(toplamlar, axis=1)
+        if np.any(bos):
+            # Boş kalan kümeleri rastgele noktalarla yeniden başlatıyorum.
+            toplamlar[bos] = matrix[rng.choice(matrix.shape[0], int(bos.sum()), replace=False)]
+        centroids = toplamlar / np.linalg.norm(toplamlar, axis=1, keepdims=True)
+    return centroids.astype(np.float32)
+
+
+class ExactSearch:
+    """
+    Simge: Varsayılan arama; tüm galeri satırlarını aday kabul eder (tam tarama).
+
+    Tüm motorlarda candidates'a rows (satır indeksleri) verilirse aday seçimi sadece bu
+    satırlar arasında yapılıyor (GalleryIndex'in merkez ön elemesi için).
+    """
+    name = 'exact'
+
+    def build(self, matrix):
+        return None
+
+    def append(self, state, matrix, new_rows):
+        return None
+
+    def remove(self, state, matrix, bas, son):
+        return None
+
+    def candidates(self, state, matrix, query, rows=None):
+        return rows  # None = tüm satırlar
+
+
+class _IVFState:
+    def __init__(self, centroids, assignments, trained_size):
+        self.centroids = centroids
+        self.assignments = assignments
+        self.trained_size = trained_size
+        # Ters listeler: satırları küme numarasına göre sıralayıp her kümenin sınırlarını tutuyorum.
+        self.order = np.argsort(assignments, kind='stable').astype(np.int64)
+        self.offsets = np.searchsorted(assignments[self.order], np.arange(centroids.shape[0] + 1))
+
+
+class IVFSearch:
+    """
+    Simge: IVF (inverted file) tarzı yaklaşık en yakın komşu araması.
+    Galeri nlist kümeye bölünüyor, sorguda sadece sorguya en yakın nprobe kümenin
+    satırları aday oluyor. nprobe büyüdükçe doğruluk (recall) artıyor, gecikme de artıyor.
+    Adaylar galeri tarafında float matris üzerinden tam olarak yeniden skorlanıyor.
+    """
+    name = 'ivf'
+
+    def __init__(self, nlist=Config.IVF_NLIST, nprobe=Config.IVF_NPROBE,
+                 min_train_size=Config.IVF_MIN_TRAIN_SIZE, n_iter=10):
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.min_train_size = min_train_size
+        self.n_iter = n_iter
+
+    def _n_clusters(self, n_rows):
+        # nlist 0 ise galeri boyutuna göre otomatik seçiyorum (~4*sqrt(n)).
+        if self.nlist > 0:
+            return self.nlist
+        return max(1, int(4 * np.sqrt(n_rows)))
+
+    def build(self, matrix):
+        if matrix.shape[0] < self.min_train_size:
+            return None  # Küçük galeride tam tarama zaten hızlı.
+        n_clusters = self._n_clusters(matrix.shape[0])
+        centroids = train_spherical_kmeans(matrix, n_clusters, self.n_iter, sample_size=n_clusters * 64)
+        logger.info(f"IVFSearch: {matrix.shape[0]} satır için {centroids.shape[0]} küme eğitildi (nprobe={self.nprobe}).")
+        return _IVFState(centroids, _assign(matrix, centroids), matrix.shape[0])
+
+    def append(self, state, matrix, new_rows):
+        if state is None or matrix.shape[0] >= 2 * state.trained_size:
+            # Galeri eğitimden bu yana iki katına çıktıysa kümeleri yeniden eğitiyorum.
+            return self.build(matrix)
+        return _IVFState(state.centroids, np.concatenate((state.assignments, _assign(new_rows, state.centroids))), state.trained_size)
+
+    def remove(self, state, matrix, bas, son):
+        if state is None:
+            return None
+        if matrix.shape[0] < self.min_train_size:
+            return None
+        return _IVFState(state.centroids, np.concatenate((state.assignments[:bas], state.assignments[son:])), state.trained_size)
+
+    def candidates(self, state, matrix, query, rows=None):
+        if state is None:
+            return rows
+        nprobe = min(self.nprobe, state.centroids.shape[0])
+        merkez_skorlari = state.centroids @ query
+        kumeler = np.argpartition(-merkez_skorlari, nprobe - 1)[:nprobe]
+        adaylar = np.concatenate([state.order[state.offsets[c]:state.offsets[c + 1]] for c in kumeler])
+        return adaylar if rows is None else np.intersect1d(adaylar, rows, assume_unique=True)
+
+
+class _QuantizedState:
+    def __init__(self, quantizer, codes, scales, trained_size, rows):
+        self.quantizer = quantizer
+        self.codes = codes
+        self.scales = scales
+        self.trained_size = trained_size
+        # Küçük galeride yeniden eğitim için tutulan float satırlar (yoksa None)
+        self.rows = rows
+
+
+class QuantizedSearch:
+    """
+    Simge: Nicemlenmiş kodlar üzerinden aday seçimi. Benzerlik doğrudan kodlar
+    üzerinde yaklaşık hesaplanıyor, en iyi rerank_k satır galeri tarafında float
+    vektörlerle tam olarak yeniden skorlanıyor. Float matris bellekte tutulmuyorsa
+    (GALLERY_KEEP_FLOAT_VECTORS=false) yeniden skorlama için vektörler MongoDB'den okunuyor.
+
+    Nicemleyici quantizer_factory() ile oluşturulup galeri satırlarıyla eğitiliyor. Galeri
+    eğitildiği boyutun iki katına çıkınca (IVF gibi) yeniden eğitiliyor; böylece ilk kurulumda
+    tek bir (ör. admin'in) vektörüyle eğitilen kod kitabı kalıcı olmuyor. Galeri min_train_size
+    satırın altındayken float satırlar motorda tutuluyor, yeniden eğitimde tüm kodlar bunlardan
+    baştan çıkarılıyor; sonrasında float matris galeride varsa o kullanılıyor.
+    """
+    quantized = True
+
+    def __init__(self, quantizer_factory, rerank_k=Config.QUANTIZED_RERANK_K,
+                 min_train_size=Config.QUANTIZED_MIN_TRAIN_SIZE):
+        self.quantizer_factory = quantizer_factory
+        self.rerank_k = rerank_k
+        self.min_train_size = min_train_size
+
+    def _train(self, rows):
+        quantizer = self.quantizer_factory().train(rows)
+        codes, scales = quantizer.encode(rows)
+        return _QuantizedState(quantizer, codes, scales, rows.shape[0],
+                               rows.copy() if rows.shape[0] < self.min_train_size else None)
+
+    def build(self, matrix):
+        if matrix.shape[0] == 0:
+            return None
+        return self._train(matrix)
+
+    def append(self, state, matrix, new_rows):
+        if state is None:
+            # Galeri boşken kurulduysa nicemleyiciyi ilk gelen satırlarla eğitiyorum.
+            return self._train(new_rows)
+        if state.codes.shape[0] + new_rows.shape[0] >= 2 * state.trained_size:
+            if state.rows is not None:
+                return self._train(np.concatenate((state.rows, new_rows)))
+            if matrix.shape[1]:
+                return self._train(matrix)
+        codes, scales = state.quantizer.encode(new_rows)
+        if scales is not None:
+            scales = np.concatenate((state.scales, scales))
+        rows = np.concatenate((state.rows, new_rows)) if state.rows is not None else None
+        return _QuantizedState(state.quantizer, np.concatenate((state.codes, codes)), scales, state.trained_size, rows)
+
+    def remove(self, state, matrix, bas, son):
+        if state is None or state.codes.shape[0] == son - bas:
+            return None
+        scales = None if state.scales is None else np.concatenate((state.scales[:bas], state.scales[son:]))
+        rows = None if state.rows is None else np.concatenate((state.rows[:bas], state.rows[son:]))
+        return _QuantizedState(state.quantizer, np.concatenate((state.codes[:bas], state.codes[son:])), scales,
+                               state.trained_size, rows)
+
+    def candidates(self, state, matrix, query, rows=None):
+        if state is None:
+            return np.empty(0, dtype=np.int64)
+        if rows is None:
+            skorlar = state.quantizer.scores(state.codes, state.scales, query)
+        else:
+            skorlar = state.quantizer.scores(state.codes[rows], None if state.scales is None else state.scales[rows], query)
+        k = min(self.rerank_k, skorlar.shape[0])
+        secilen = np.argpartition(-skorlar, k - 1)[:k]
+        return secilen if rows is None else rows[secilen]
+
+
+class Int8Search(QuantizedSearch):
+    name = 'int8'
+
+    def __init__(self, rerank_k=Config.QUANTIZED_RERANK_K, min_train_size=Config.QUANTIZED_MIN_TRAIN_SIZE):
+        super().__init__(ScalarQuantizer, rerank_k, min_train_size)
+
+
+class PQSearch(QuantizedSearch):
+    name = 'pq'
+
+    def __init__(self, n_subspaces=Config.PQ_SUBSPACES, codebook_size=Config.PQ_CODEBOOK_SIZE,
+                 rerank_k=Config.QUANTIZED_RERANK_K, min_train_size=Config.QUANTIZED_MIN_TRAIN_SIZE):
+        super().__init__(functools.partial(ProductQuantizer, n_subspaces, codebook_size), rerank_k, min_train_size)
+        self.n_subspaces = n_subspaces
+        self.codebook_size = codebook_size
+
+
+SEARCH_BACKENDS = {
+    ExactSearch.name: ExactSearch,
+    IVFSearch.name: IVFSearch,
+    Int8Search.name: Int8Search,
+    PQSearch.name: PQSearch,
+}
+
+
+def create_search_engine(backend=None):
+    """
+    Simge: Config.GALLERY_SEARCH_BACKEND'e göre arama motorunu oluşturur.
+    Bilinmeyen bir değer gelirse uygulama çökmesin diye tam taramaya düşüyorum.
+    """
+    backend = backend or Config.GALLERY_SEARCH_BACKEND
+    if backend not in SEARCH_BACKENDS:
+        logger.warning(f"Bilinmeyen galeri arama motoru '{backend}', tam tarama kullanılacak.")
+        backend = ExactSearch.name
+    return SEARCH_BACKENDS[backend]()
@@ -0,0 +1,334 @@
+import asyncio
+import collections
+import datetime
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+import numpy as np
+from a2wsgi import WSGIMiddleware
+from bson.objectid import ObjectId
+from loguru import logger
+from motor.motor_asyncio import AsyncIOMotorClient
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Mount, Route
+
+from config import Config
+from app.metrics import metrics, timed
+from app.models import USER_PROJECTIONS, cached_face_profile, face_profile_from_document, generate_token
+from app.ratelimit import MongoRateLimitStore
+from app.routes import (FACE_ERRORS, FACE_NO_MATCH_MESSAGE, best_face_match, component_stats_providers, embed_frame,
+                        face_login_success, failed_login_model, login_limiter, video_broadcaster)
+from app.uploads import IMAGE_MIMETYPES, data_url_bytes, decode_image
+
+
+def parse_endpoint_limits(spec):
+    """Simge: '/api/auth/login/face=64,/video_feed=8' biçimindeki ayarı {yol: en fazla eşzamanlı istek} sözlüğüne çevirir."""
+    limitler = {}
+    for parca in (spec or '').split(','):
+        yol, _, deger = parca.strip().rpartition('=')
+        if not yol:
+            continue
+        try:
+            limitler[yol] = int(deger)
+        except ValueError:
+            logger.warning(f"ASGI_ENDPOINT_LIMITS içinde geçersiz değer atlandı: '{parca}'")
+    return limitler
+
+
+class ConcurrencyLimitMiddleware:
+    """
+    Simge: Yol başına eşzamanlı istek sınırı (ASGI ara katmanı). Sınırdaki yola gelen istek
+    beklemeden 503 + Retry-After alıyor. İstek, yanıt gövdesi bitene kadar sayılıyor; yani
+    /video_feed için sınır aynı anda bağlı izleyici sayısı. Sınırı olmayan yollar (Flask'a
+    giden diğer uç noktalar dahil) olduğu gibi geçiyor.
+    """
+
+    def __init__(self, app, limits):
+        self.app = app
+        self.limits = {yol: limit for yol, limit in limits.items() if limit > 0}
+        self._in_flight = collections.Counter()
+        self._peak = collections.Counter()
+        self._rejected = collections.Counter()
+
+    async def __call__(self, scope, receive, send):
+        yol = scope.get('path') if scope['type'] == 'http' else None
+        limit = self.limits.get(yol)
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+        # Tek event loop'ta çalıştığı için sayaçlara kilitsiz erişiyorum.
+        if self._in_flight[yol] >= limit:
+            self._rejected[yol] += 1
+            yanit = JSONResponse({'message': FACE_ERRORS['busy'][0]}, status_code=503, headers={'Retry-After': '1'})
+            await yanit(scope, receive, send)
+            return
+        self._in_flight[yol] += 1
+        self._peak[yol] = max(self._peak[yol], self._in_flight[yol])
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self._in_flight[yol] -= 1
+
+    def stats(self):
+        return {yol: {'limit': limit, 'in_flight': self._in_flight[yol], 'peak': self._peak[yol],
+                      'rejected': self._rejected[yol]} for yol, limit in self.limits.items()}
+
+
+class AsyncUserStore:
+    """
+    Simge: Yüz ile giriş uç noktasının MongoDB erişimi (motor). User/FailedLogin'deki
+    senkron çağrıların async karşılıkları; kullanıcı embedding önbelleği ve hatalı giriş
+    yazıcısı senkron taraf ile ortak. İstemci event loop'a bağlı olduğu için start() ile
+    uygulama başlarken oluşturuluyor.
+    """
+
+    def __init__(self, uri, database_name):
+        self.uri = uri
+        self.database_name = database_name
+        self.client = None
+        self.db = None
+
+    def start(self):
+        try:
+            self.client = AsyncIOMotorClient(self.uri)
+            self.db = self.client[self.database_name]
+            logger.info("MongoDB (motor) bağlantısı hazır.")
+        except Exception as e:
+            logger.error(f"MongoDB (motor) bağlantı hatası: {e}")
+            self.client = self.db = None
+
+    def close(self):
+        if self.client is not None:
+            self.client.close()
+
+    async def get_face_profile(self, username):
+        # User.get_face_profile ile aynı adımlar, sadece doküman motor ile okunuyor.
+        profil, nesil = cached_face_profile(username)
+        if profil is not None or self.db is None:
+            return profil
+        return face_profile_from_document(await self.db.users.find_one({"username": username}, USER_PROJECTIONS['matching']), nesil)
+
+    async def update_last_login(self, user_id):
+        if self.db is None:
+            return
+        try:
+            await self.db.users.update_one({"_id": ObjectId(user_id)}, {"$set": {"last_login": datetime.datetime.now(datetime.timezone.utc)}})
+        except Exception as e:
+            logger.error(f"Kullanıcı ID '{user_id}' için son giriş zamanı güncellenirken hata: {e}")
+
+    async def log_failed_login(self, username, ip_address):
+        if self.db is None:
+            return
+        log_data = {"username": username, "ip_address": ip_address, "timestamp": datetime.datetime.now(datetime.timezone.utc)}
+        logger.warning(f"Hatalı giriş denemesi: Kullanıcı '{username}', IP: {ip_address}")
+        # Toplu yazıcı açıksa kayıt kuyruğa bırakılıyor (bloklamıyor), kapalıysa tek tek async yazıyorum.
+        if failed_login_model.writer is not None:
+            failed_login_model.writer.write(log_data)
+            return
+        try:
+            await self.db.failed_logins.insert_one(log_data)
+        except Exception as e:
+            logger.error(f"Hatalı giriş loglanırken hata: {e}")
+
+
+def _content_type(request):
+    return request.headers.get('content-type', '').split(';')[0].strip().lower()
+
+
+async def _request_field(request, name):
+    # app.uploads.request_field'in Starlette karşılığı
+    content_type = _content_type(request)
+    if content_type == 'application/json' or content_type.endswith('+json'):
+        try:
+            data = await request.json()
+        except ValueError:
+            return None
+        return data.get(name) if isinstance(data, dict) else None
+    if content_type == 'multipart/form-data':
+        return (await request.form()).get(name)
+    return request.query_params.get(name)
+
+
+async def _request_image_bytes(request, field='image'):
+    # app.uploads.request_image_bytes'ın Starlette karşılığı; gövde event loop'ta, thread tutmadan okunuyor.
+    content_type = _content_type(request)
+    if content_type == 'multipart/form-data':
+        dosya = (await request.form()).get(field)
+        veri = await dosya.read() if hasattr(dosya, 'read') else b''
+    elif content_type in IMAGE_MIMETYPES:
+        veri = await request.body()
+    else:
+        try:
+            data = await request.json()
+        except ValueError:
+            return None
+        return data_url_bytes(data.get(field)) if isinstance(data, dict) else None
+    return np.frombuffer(veri, np.uint8) if veri else None
+
+
+def _decode_and_embed(image_bytes):
+    # Executor thread'inde: görüntü çözme + algılama + FaceNet (ya da süreç havuzuna gönderip bekleme).
+    frame = decode_image(image_bytes, Config.DECODE_TARGET_SIDE)
+    if frame is None:
+        return None, 'invalid_image'
+    return embed_frame(frame)
+
+
+def create_asgi_app(flask_app, config=Config):
+    """
+    Simge: Görüntü uç noktalarını (/api/auth/login/face, /api/utils/extract_embedding, /video_feed)
+    asyncio ile sunan Starlette uygulaması; diğer tüm yollar WSGI köprüsüyle Flask uygulamasına gidiyor.
+    İstek/yanıt biçimleri Flask rotalarıyla aynı. Gövde okuma ve MongoDB (motor) beklemesi event
+    loop'ta yapılıyor, thread tutmuyor; CPU'lu iş (çözme, algılama, FaceNet, galeri araması) ayrı bir executor'da.
+    """
+    cpu_executor = ThreadPoolExecutor(max_workers=config.ASGI_CPU_WORKERS or os.cpu_count() or 4,
+                                      thread_name_prefix='asgi-cpu')
+    store = AsyncUserStore(config.MONGO_URI, config.DATABASE_NAME)
+    # Oran sınırlayıcı MongoDB'deyse sayaç güncellemeleri senkron pymongo ile yapılıyor, thread havuzuna veriyorum.
+    limiter_bloklar = login_limiter is not None and isinstance(login_limiter.store, MongoRateLimitStore)
+
+    async def limiter_call(fn, *args):
+        return await run_in_threadpool(fn, *args) if limiter_bloklar else fn(*args)
+
+    async def login_failed(username, ip_address):
+        await store.log_failed_login(username, ip_address)
+        if login_limiter is not None:
+            await limiter_call(login_limiter.record_failure, ip_address, username)
+
+    async def embed(image_bytes):
+        return await asyncio.get_running_loop().run_in_executor(cpu_executor, _decode_and_embed, image_bytes)
+
+    async def match(anlik_yuz_embedding, username_hint, profil):
+        # Galeri araması (matris çarpımı, IVF/PQ puanlama, gerekirse yeniden sıralama için MongoDB'den
+        # vektör okuma) de CPU'lu/bloklayan iş; event loop'u tutmasın diye aynı executor'da.
+        return await asyncio.get_running_loop().run_in_executor(cpu_executor, best_face_match,
+                                                                anlik_yuz_embedding, username_hint, profil)
+
+    def observed(endpoint):
+        # Flask'taki istek metrikleriyle aynı uç nokta adları (metrics.init_app'in karşılığı)
+        def decorator(handler):
+            async def wrapped(request):
+                baslangic = time.perf_counter()
+                yanit = await handler(request)
+                metrics.observe_request(endpoint, request.method, yanit.status_code, time.perf_counter() - baslangic)
+                return yanit
+            return wrapped
+        return decorator
+
+    async def read_face_request(request, endpoint, ip_address):
+        # Bozuk gövde (ör. yarım kalmış multipart) Starlette'in kendi 400'üne düşmesin; loglanıp
+        # observed üzerinden Flask rotasıyla aynı biçimde yanıtlanıyor.
+        try:
+            return await _request_image_bytes(request), await _request_field(request, 'username_hint'), None
+        except Exception as e:
+            logger.warning(f"{endpoint}: İstek gövdesi okunamadı: {e}. IP: {ip_address}")
+            return None, None, JSONResponse({'message': 'Geçersiz istek gövdesi!'}, status_code=400)
+
+    @observed('auth.login_with_face')
+    async def login_with_face(request):
+        ip_address = request.client.host if request.client else None
+        image_bytes, username_hint, hata_yaniti = await read_face_request(request, 'login_with_face', ip_address)
+        if hata_yaniti is not None:
+            return hata_yaniti
+        if login_limiter is not None:
+            bekle = await limiter_call(login_limiter.check, ip_address, username_hint)
+            if bekle is not None:
+                logger.warning(f"Oran sınırı aşıldı, istek reddedildi. IP: {ip_address}")
+                return JSONResponse({'message': 'Çok fazla giriş denemesi. Lütfen daha sonra tekrar deneyin.', 'retry_after': bekle},
+                                    status_code=429, headers={'Retry-After': str(bekle)})
+
+        if image_bytes is None:
+            return JSONResponse({'message': 'Görüntü verisi gerekli!'}, status_code=400)
+
+        try:
+            anlik_yuz_embedding, hata = await embed(image_bytes)
+            if hata == 'invalid_image':
+                logger.warning(f"login_with_face: Geçersiz görüntü formatı veya boş kare. IP: {ip_address}")
+                return JSONResponse({'message': 'Geçersiz görüntü formatı!'}, status_code=400)
+            if hata:
+                # Flask rotasındaki gibi hat hataları deneme sayılmıyor.
+                mesaj, durum = FACE_ERRORS[hata]
+                logger.warning(f"login_with_face: {mesaj} Giriş reddedildi. IP: {ip_address}")
+                return JSONResponse({'message': mesaj}, status_code=durum)
+
+            profil = None
+            if username_hint:
+                with timed('gallery_fetch'):
+                    profil = await store.get_face_profile(username_hint)
+            en_iyi_eslesen_kullanici, en_yuksek_benzerlik = await match(anlik_yuz_embedding, username_hint, profil)
+
+            if en_iyi_eslesen_kullanici:
+                with timed('token'):
+                    token = generate_token(en_iyi_eslesen_kullanici['_id'])
+                with timed('mongo_write'):
+                    await store.update_last_login(en_iyi_eslesen_kullanici['_id'])
+                if login_limiter is not None:
+                    await limiter_call(login_limiter.record_success, ip_address, en_iyi_eslesen_kullanici['username'])
+                logger.info(f"Kullanıcı '{en_iyi_eslesen_kullanici['username']}' yüz ile başarıyla giriş yaptı. Benzerlik: {en_yuksek_benzerlik:.2f}%. IP: {ip_address}")
+                return JSONResponse(face_login_success(en_iyi_eslesen_kullanici, en_yuksek_benzerlik, token))
+            await login_failed(username_hint or "UNKNOWN", ip_address)
+            logger.warning(f"Yüz tanıma ile giriş başarısız. IP: {ip_address}. En yüksek benzerlik: {en_yuksek_benzerlik:.2f}%")
+            return JSONResponse({'message': FACE_NO_MATCH_MESSAGE}, status_code=401)
+        except Exception as e:
+            logger.error(f"Yüzle giriş sırasında beklenmedik bir hata oluştu: {e}. IP: {ip_address}")
+            return JSONResponse({'message': 'Sunucu hatası.'}, status_code=500)
+
+    @observed('main.extract_embedding_api')
+    async def extract_embedding_api(request):
+        ip_address = request.client.host if request.client else None
+        image_bytes, _, hata_yaniti = await read_face_request(request, 'extract_embedding_api', ip_address)
+        if hata_yaniti is not None:
+            return hata_yaniti
+        if image_bytes is None:
+            logger.warning(f"Embedding çıkarımı için görüntü verisi eksik. IP: {ip_address}")
+            return JSONResponse({'message': 'Görüntü verisi gerekli!'}, status_code=400)
+        try:
+            anlik_yuz_embedding, hata = await embed(image_bytes)
+            if hata == 'invalid_image':
+                logger.warning(f"extract_embedding_api: Geçersiz görüntü formatı veya boş kare. IP: {ip_address}")
+                return JSONResponse({'message': 'Geçersiz görüntü formatı!'}, status_code=400)
+            if hata:
+                mesaj, durum = FACE_ERRORS[hata]
+                logger.warning(f"extract_embedding_api: {mesaj} IP: {ip_address}")
+                return JSONResponse({'message': mesaj}, status_code=durum)
+            logger.info(f"Yüz embedding'i başarıyla çıkarıldı. IP: {ip_address}")
+            return JSONResponse({'embedding': anlik_yuz_embedding.tolist()})
+        except Exception as e:
+            logger.error(f"Embedding çıkarımı sırasında beklenmedik bir hata oluştu: {e}. IP: {ip_address}")
+            return JSONResponse({'message': 'Sunucu hatası.'}, status_code=500)
+
+    @observed('main.video_feed')
+    async def video_feed(request):
+        async def generate_frames():
+            # İstemci bağlantıyı kesince Starlette üreteci kapatıyor, izleyici aboneliği de bitiyor.
+            async for frame in video_broadcaster.aframes():
+                yield b'--frame\r\nContent-Type: image/jpeg\r\n\r\n' + frame + b'\r\n'
+
+        return StreamingResponse(generate_frames(), media_type='multipart/x-mixed-replace; boundary=frame')
+
+    @asynccontextmanager
+    async def lifespan(app):
+        store.start()
+        try:
+            yield
+        finally:
+            store.close()
+            cpu_executor.shutdown(wait=False, cancel_futures=True)
+
+    app = Starlette(
+        routes=[
+            Route('/api/auth/login/face', login_with_face, methods=['POST']),
+            Route('/api/utils/extract_embedding', extract_embedding_api, methods=['POST']),
+            Route('/video_feed', video_feed, methods=['GET']),
+            Mount('/', WSGIMiddleware(flask_app, workers=config.WAITRESS_THREADS)),
+        ],
+        lifespan=lifespan,
+    )
+    limitli = ConcurrencyLimitMiddleware(app, parse_endpoint_limits(config.ASGI_ENDPOINT_LIMITS))
+    component_stats_providers['asgi_endpoints'] = limitli.stats
+    logger.info(f"ASGI uygulaması hazır; eşzamanlı istek sınırları: {limitli.limits or 'yok'}.")
+    return limitli
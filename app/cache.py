@@ -0,0 +1,180 @@
+import threading
+import time
+from collections import OrderedDict
+
+from config import Config
+
+
+class TTLCache:
+    """
+    Simge: Thread güvenli, boyut sınırlı (LRU) ve süreli (TTL) basit önbellek.
+    İsabet/ıska/çıkarma sayaçlarını admin istatistikleri için tutuyor.
+    """
+
+    def __init__(self, max_size=1024, ttl_seconds=300, name='cache', on_evict=None):
+        self.max_size = max_size
+        self.ttl = ttl_seconds
+        self.name = name
+        # LRU ya da TTL ile düşen kayıtlar için on_evict(key, value); kilit dışında çağrılıyor.
+        self.on_evict = on_evict
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        with self._lock:
+            kayit = self._data.get(key)
+            if kayit is None:
+                self.misses += 1
+                return None
+            deger, son_kullanma = kayit
+            if son_kullanma >= time.monotonic():
+                self._data.move_to_end(key)
+                self.hits += 1
+                return deger
+            del self._data[key]
+            self.expirations += 1
+            self.misses += 1
+        self._evicted([(key, deger)])
+        return None
+
+    def record_miss(self):
+        # Anahtar hiç bilinmediğinde (ör. önbellekte olmayan kullanıcı adı) ıskayı saymak için
+        with self._lock:
+            self.misses += 1
+
+    def put(self, key, value):
+        dusenler = []
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                eski_anahtar, (eski_deger, _) = self._data.popitem(last=False)
+                dusenler.append((eski_anahtar, eski_deger))
+                self.evictions += 1
+        self._evicted(dusenler)
+
+    def _evicted(self, kayitlar):
+        if self.on_evict is not None:
+            for key, value in kayitlar:
+                self.on_evict(key, value)
+
+    def pop(self, key):
+        with self._lock:
+            kayit = self._data.pop(key, None)
+            if kayit is None:
+                return None
+            self.invalidations += 1
+            return kayit[0]
+
+    def clear(self):
+        with self._lock:
+            self.invalidations += len(self._data)
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        with self._lock:
+            toplam = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'max_size': self.max_size,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / toplam, 3) if toplam else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+            }
+
+
+class UserEmbeddingCache:
+    """
+    Simge: username_hint ile girişlerde kullanıcının pozlarını her denemede BSON
+    listelerinden tekrar ayrıştırmamak için önbellek. Anahtar kullanıcı ID'si, değer
+    token üretmek için gereken alanlar ve normalize (n_poz, boyut) float32 matris.
+    Kullanıcı adından ID'ye küçük bir eşleme tablosu da tutuluyor; kayıt önbellekten
+    düşünce (LRU/TTL) eşlemesi de siliniyor.
+    Her geçersiz kılmada nesil sayacı artıyor: MongoDB'den okumadan önce generation()
+    alınıp put'a veriliyor, okuma sırasında kullanıcı silinmiş ya da güncellenmişse
+    eski profil önbelleğe yazılmıyor.
+    """
+
+    def __init__(self, max_size=Config.USER_CACHE_MAX_SIZE, ttl_seconds=Config.USER_CACHE_TTL_S):
+        self._cache = TTLCache(max_size, ttl_seconds, name='user_embeddings', on_evict=self._forget_username)
+        self._ids_by_username = {}
+        # put içinde LRU çıkarması _forget_username'i aynı thread'de çağırıyor, bu yüzden RLock
+        self._lock = threading.RLock()
+        self._generation = 0
+        self.stale_puts = 0
+
+    def _forget_username(self, user_id, profil):
+        with self._lock:
+            if self._ids_by_username.get(profil['username']) == user_id:
+                del self._ids_by_username[profil['username']]
+
+    def generation(self):
+        return self._generation
+
+    def _bump(self):
+        # Çağıran self._lock'u tutuyor
+        self._generation += 1
+
+    def get_by_username(self, username):
+        user_id = self._ids_by_username.get(username)
+        if user_id is None:
+            self._cache.record_miss()
+            return None
+        return self._cache.get(user_id)
+
+    def put(self, user_id, username, matrix, generation=None):
+        """
+        Simge: Profili önbelleğe yazar ve döndürür. generation verilmişse ve o zamandan beri
+        bir geçersiz kılma olduysa profil sadece döndürülüyor, önbelleğe yazılmıyor.
+        """
+        user_id = str(user_id)
+        profil = {'_id': user_id, 'username': username, 'matrix': matrix}
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                self.stale_puts += 1
+                return profil
+            self._cache.put(user_id, profil)
+            self._ids_by_username[username] = user_id
+        return profil
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._bump()
+            profil = self._cache.pop(str(user_id))
+            if profil is not None and self._ids_by_username.get(profil['username']) == str(user_id):
+                del self._ids_by_username[profil['username']]
+
+    def invalidate_username(self, username):
+        with self._lock:
+            self._bump()
+            user_id = self._ids_by_username.pop(username, None)
+            if user_id is not None:
+                self._cache.pop(user_id)
+
+    def clear(self):
+        with self._lock:
+            self._bump()
+            self._cache.clear()
+            self._ids_by_username.clear()
+
+    def stats(self):
+        return {**self._cache.stats(), 'usernames': len(self._ids_by_username), 'stale_puts': self.stale_puts}
+
+
+user_embedding_cache = UserEmbeddingCache()
+
+# Yetkilendirmede token'daki kullanıcı ID'sinden çözülen kimlik (_id, username, role).
+# TTL kısa tutuluyor; kullanıcı silinince delete_user kaydı hemen düşürüyor.
+principal_cache = TTLCache(Config.PRINCIPAL_CACHE_MAX_SIZE, Config.PRINCIPAL_CACHE_TTL_S, name='principals')
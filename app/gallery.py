@@ -0,0 +1,413 @@
+import collections
+import threading
+
+import numpy as np
+from loguru import logger
+
+from config import Config
+from app.ann import create_search_engine
+from app.pca import load_projection
+
+
+def normalize_rows(matrix):
+    """
+    Simge: Her satırı L2 normuna böler. Sıfır normlu satırlar olduğu gibi kalır.
+    """
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def cosine_to_similarity(cosine):
+    # calculate_similarity ile aynı ölçek: kosinüs [-1, 1] -> [0, 100]
+    return ((cosine + 1) / 2) * 100
+
+
+def embeddings_to_matrix(face_embeddings, dim=None):
+    """
+    Simge: Bir kullanıcının poz embedding'lerini (n, dim) float32 normalize matrise çevirir.
+    Boyut sabit değil (keras-facenet'in varsayılan modeli 512 boyut veriyor); dim verilmezse
+    ilk pozun boyutu alınıyor. Sıfır normlu pozlar atlanıyor (calculate_similarity bunlar için
+    zaten 0.0 döndürüyor). Boyutu farklı pozlar da atlanıyor ama hata olarak loglanıyor.
+    """
+    if isinstance(face_embeddings, np.ndarray) and face_embeddings.ndim == 2:
+        # İkili bloktan gelen matris: satır satır dolaşmadan tek seferde süzüyorum.
+        if dim is not None and face_embeddings.shape[1] != dim:
+            logger.error(f"Embedding boyutu uyuşmuyor: beklenen {dim}, gelen {face_embeddings.shape[1]} "
+                         f"({face_embeddings.shape[0]} poz atlandı).")
+            return np.empty((0, dim), dtype=np.float32)
+        matris = face_embeddings.astype(np.float32)
+        matris = matris[np.any(matris, axis=1)]
+        return normalize_rows(matris).astype(np.float32, copy=False)
+
+    satirlar, uyumsuz = [], 0
+    for embedding in (face_embeddings if face_embeddings is not None else []):
+        vektor = np.asarray(embedding, dtype=np.float32).reshape(-1)
+        if dim is None and vektor.shape[0]:
+            dim = vektor.shape[0]
+        if vektor.shape[0] != dim:
+            uyumsuz += 1
+            continue
+        if np.any(vektor):
+            satirlar.append(vektor)
+    if uyumsuz:
+        logger.error(f"Embedding boyutu uyuşmuyor: beklenen {dim}, {uyumsuz} poz farklı boyutta olduğu için atlandı.")
+    if not satirlar:
+        return np.empty((0, dim or 0), dtype=np.float32)
+    return normalize_rows(np.stack(satirlar)).astype(np.float32, copy=False)
+
+
+def common_dim(matrices):
+    """Simge: Satırı olan matrislerde en sık görülen embedding boyutu; hiç yoksa None."""
+    boyutlar = collections.Counter(m.shape[1] for m in matrices if m.shape[0])
+    return boyutlar.most_common(1)[0][0] if boyutlar else None
+
+
+def best_similarity(matrix, query):
+    """
+    Simge: Sorgunun bir kullanıcının normalize poz matrisine en yüksek benzerliği (0-100).
+    calculate_similarity ile aynı sonucu tüm pozlar için tek çarpımda veriyor.
+    """
+    sorgu = np.asarray(query, dtype=np.float32).reshape(-1)
+    norm = np.linalg.norm(sorgu)
+    if matrix.shape[0] == 0 or norm == 0:
+        return 0.0
+    if sorgu.shape[0] != matrix.shape[1]:
+        logger.error(f"Embedding boyutu uyuşmuyor: sorgu {sorgu.shape[0]}, kayıtlı pozlar {matrix.shape[1]} boyutlu.")
+        return 0.0
+    return float(cosine_to_similarity(np.max(matrix @ (sorgu / norm))))
+
+
+class _GalleryState:
+    """
+    Simge: Galerinin değişmez bir anlık görüntüsü. Yazmalar yeni bir görüntü üretip
+    tek atamayla değiştiriyor, aramalar elindeki görüntüyü kilitsiz kullanıyor.
+    İzdüşüm de görüntünün parçası, böylece sorgu her zaman matrisle aynı uzaya taşınıyor.
+    """
+
+    def __init__(self, matrix, user_ids, usernames, starts, centroids, engine_state, projection, dim):
+        self.matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+        self.user_ids = user_ids
+        self.usernames = usernames
+        self.starts = starts
+        self.centroids = centroids
+        self.engine_state = engine_state
+        self.projection = projection
+        # Ham (izdüşüm öncesi) embedding boyutu; galeri boşken ve boyut verilmemişken None.
+        self.dim = dim
+
+    def rows_of(self, slot):
+        son = self.starts[slot + 1] if slot + 1 < len(self.starts) else self.matrix.shape[0]
+        return self.starts[slot], son
+
+
+def centroid_of(matris):
+    """Simge: Normalize satırların normalize ortalaması (kullanıcının merkez vektörü)."""
+    merkez = matris.mean(axis=0)
+    norm = np.linalg.norm(merkez)
+    return merkez / norm if norm > 0 else merkez
+
+
+class GalleryIndex:
+    """
+    Simge: Yüz ile girişte (1:N) tüm kullanıcıları MongoDB'den çekmek yerine
+    süreç içinde tutulan galeri. Tüm pozlar tek bir bitişik float32 matriste,
+    her satırın hangi kullanıcıya ait olduğu paralel dizilerde tutuluyor.
+    Bir kullanıcının pozları matriste hep art arda duruyor, böylece kullanıcı
+    bazında en iyi skor np.maximum.reduceat ile tek seferde bulunuyor.
+
+    Yazma işlemleri (build/add/remove) kilit altında yeni diziler üretip
+    referansları değiştiriyor, aramalar ise o anki görüntü üzerinde kilitsiz çalışıyor.
+    build() sırasında gelen add/remove çağrıları yeni görüntüye de uygulanıyor.
+
+    Aday satırları seçen arama motoru (search_engine) takılabilir: varsayılanı tam
+    tarama, büyük galeriler için app.ann.IVFSearch. Motor hangi satırları seçerse
+    seçsin son skorlar float matris üzerinden tam kosinüsle hesaplanıyor, yani eşik
+    kararı calculate_similarity ile aynı kalıyor.
+
+    Nicemlenmiş motorlarda (int8/pq) keep_float=False verilirse float matris bellekte
+    tutulmuyor (sıfır genişlikli matris satır sayısını taşıyor), adayların float
+    vektörleri yeniden skorlama için vector_loader ile okunuyor.
+
+    PCA izdüşümü (projection) verilirse galeri satırları ve sorgu indirgenmiş uzaya
+    taşınıyor ve eşleştirme orada yapılıyor. MongoDB'deki embedding'ler tam boyutta
+    kalıyor; izdüşüm sürümü değişince build() ile galeri yeniden izdüşürülüyor.
+
+    Embedding boyutu (dim) verilmezse veriden alınıyor: build() kullanıcılarda en sık görülen
+    boyutu (PCA açıksa izdüşümün giriş boyutunu), boş galeriye ilk eklenen kullanıcı kendi boyutunu
+    belirliyor. Boyutu farklı kullanıcılar ve sorgular sessizce düşmüyor, hata olarak loglanıyor.
+
+    Her kullanıcı için satırlarının normalize ortalaması (merkez) da tutuluyor.
+    centroid_shortlist > 0 ise arama iki aşamalı: önce sorgu tüm merkezlerle
+    karşılaştırılıyor, arama motoru adaylarını sadece en iyi centroid_shortlist
+    kullanıcının satırları arasından seçiyor. Ön eleme tam taramayı da yaklaşık
+    yaptığı için varsayılan olarak kapalı.
+    """
+
+    def __init__(self, dim=None, search_engine=None, keep_float=None, vector_loader=None,
+                 projection=None, centroid_shortlist=None):
+        self.dim = dim
+        self.projection = projection
+        self.search_engine = search_engine or create_search_engine()
+        if keep_float is None:
+            keep_float = Config.GALLERY_KEEP_FLOAT_VECTORS
+        # Float vektörleri bırakmak sadece kodlar üzerinden aday seçebilen motorlarda mümkün.
+        self.keep_float = keep_float or not getattr(self.search_engine, 'quantized', False)
+        self.vector_loader = vector_loader
+        self.centroid_shortlist = Config.CENTROID_SHORTLIST if centroid_shortlist is None else centroid_shortlist
+        self._lock = threading.Lock()
+        # build() çağrılarını sıralıyor; _pending kurulum sürerken gelen yazmaları tutuyor.
+        self._build_lock = threading.Lock()
+        self._pending = None
+        self._state = self._empty_state(projection, self._expected_dim(projection))
+
+    def _expected_dim(self, projection, fallback=None):
+        # Sabit boyut verildiyse o, PCA açıksa izdüşümün giriş boyutu, yoksa veriden gelen boyut.
+        if self.dim is not None:
+            return self.dim
+        return projection.source_dim if projection is not None else fallback
+
+    def _empty_state(self, projection, dim):
+        # Motor durumu None: motorlar ilk append'te kendilerini gelen satırlarla kuruyor.
+        bos = np.empty((0, projection.n_components if projection is not None else dim or 0), dtype=np.float32)
+        return _GalleryState(bos, [], [], np.empty(0, dtype=np.int64), bos, None, projection, dim)
+
+    def _project(self, matris, projection):
+        if projection is not None and matris.shape[0]:
+            matris = projection.project(matris)
+        return matris
+
+    def _to_matrix(self, face_embeddings, projection, dim):
+        return self._project(embeddings_to_matrix(face_embeddings, dim), projection)
+
+    def _stored(self, matris):
+        return matris if self.keep_float else matris[:, :0]
+
+    def __len__(self):
+        return len(self._state.user_ids)
+
+    @property
+    def size(self):
+        """Galerideki toplam poz (satır) sayısı."""
+        return self._state.matrix.shape[0]
+
+    def stats(self):
+        state = self._state
+        return {
+            'users': len(state.user_ids),
+            'rows': state.matrix.shape[0],
+            'search_backend': self.search_engine.name,
+            'float_vectors_in_memory': self.keep_float,
+            'centroid_shortlist': self.centroid_shortlist,
+            'dim': state.projection.n_components if state.projection is not None else state.dim,
+            'embedding_dim': state.dim,
+            'pca_version': state.projection.version if state.projection is not None else None,
+        }
+
+    def build(self, users, projection=False):
+        """
+        Simge: Galeriyi sıfırdan kurar. users: (user_id, username, face_embeddings) üçlüleri.
+        projection verilirse (None dahil) galeri yeni izdüşümle kuruluyor.
+
+        MongoDB okuması ve motor kurulumu kilit dışında yapılıyor (aramalar ve yazmalar
+        beklemesin diye). Bu sırada gelen add_user/remove_user çağrıları eski görüntüye
+        uygulanıyor ve ayrıca kaydediliyor; yeni görüntü yerine konmadan önce aynı sırayla
+        ona da uygulanıyor, böylece yeniden kurulum sırasında yapılan kayıt/silme kaybolmuyor.
+        """
+        with self._build_lock:
+            with self._lock:
+                self._pending = []
+            try:
+                self._build(users, self.projection if projection is False else projection)
+            finally:
+                with self._lock:
+                    self._pending = None
+
+    def _build(self, users, projection):
+        ham = [(user_id, username, embeddings_to_matrix(face_embeddings, self.dim)) for user_id, username, face_embeddings in users]
+        boyut = self._expected_dim(projection, common_dim(matris for _, _, matris in ham))
+        bloklar, merkezler, user_ids, usernames, uzunluklar, uyumsuz = [], [], [], [], [], []
+        for user_id, username, matris in ham:
+            if matris.shape[0] == 0:
+                logger.warning(f"GalleryIndex: Kullanıcı '{username}' için geçerli embedding yok, galeriye eklenmedi.")
+                continue
+            if matris.shape[1] != boyut:
+                uyumsuz.append(username)
+                continue
+            matris = self._project(matris, projection)
+            bloklar.append(matris)
+            merkezler.append(centroid_of(matris))
+            user_ids.append(str(user_id))
+            usernames.append(username)
+            uzunluklar.append(matris.shape[0])
+
+        if uyumsuz:
+            logger.error(f"GalleryIndex: {len(uyumsuz)} kullanıcının embedding boyutu galerinin boyutundan ({boyut}) farklı, "
+                         f"galeriye eklenmedi (ör. {', '.join(uyumsuz[:5])}).")
+        genislik = projection.n_components if projection is not None else boyut or 0
+        matrix = np.concatenate(bloklar) if bloklar else np.empty((0, genislik), dtype=np.float32)
+        centroids = np.stack(merkezler).astype(np.float32) if merkezler else np.empty((0, genislik), dtype=np.float32)
+        starts = np.concatenate(([0], np.cumsum(uzunluklar)[:-1])).astype(np.int64) if uzunluklar else np.empty(0, dtype=np.int64)
+        engine_state = self.search_engine.build(matrix)
+        state = _GalleryState(self._stored(matrix), user_ids, usernames, starts, centroids, engine_state, projection, boyut)
+        with self._lock:
+            for islem, args in self._pending:
+                state = islem(state, *args)
+            self.projection = projection
+            self._state = state
+        surum = f", PCA sürümü {projection.version}" if projection is not None else ""
+        logger.info(f"GalleryIndex: {len(state.user_ids)} kullanıcı, {state.matrix.shape[0]} poz ile galeri oluşturuldu{surum} "
+                    f"(kurulum sırasında {len(self._pending)} yazma).")
+
+    def add_user(self, user_id, username, face_embeddings):
+        with self._lock:
+            self._apply(self._with_user, str(user_id), username, face_embeddings)
+
+    def remove_user(self, user_id):
+        user_id = str(user_id)
+        with self._lock:
+            bulundu = user_id in self._state.user_ids
+            self._apply(self._without_user, user_id)
+            return bulundu
+
+    def _apply(self, islem, *args):
+        # Kilit altında çağrılıyor. Kurulum sürüyorsa yazma yeni görüntüye de uygulanmak üzere kaydediliyor.
+        if self._pending is not None:
+            self._pending.append((islem, args))
+        self._state = islem(self._state, *args)
+
+    def _with_user(self, state, user_id, username, face_embeddings):
+        matris = embeddings_to_matrix(face_embeddings, state.dim)
+        if matris.shape[0] == 0:
+            logger.warning(f"GalleryIndex: Kullanıcı '{username}' için geçerli embedding yok, galeriye eklenmedi.")
+            return state
+        if state.dim is None:
+            # Boş galeriye ilk eklenen kullanıcı boyutu belirliyor.
+            state = self._empty_state(state.projection, matris.shape[1])
+        matris = self._project(matris, state.projection)
+        if user_id in state.user_ids:
+            # Aynı kullanıcı tekrar eklenirse önce eski pozlarını çıkarıyorum.
+            state = self._without(state, state.user_ids.index(user_id))
+        starts = np.append(state.starts, state.matrix.shape[0]).astype(np.int64)
+        matrix = np.concatenate((state.matrix, self._stored(matris)))
+        centroids = np.concatenate((state.centroids, centroid_of(matris)[None, :].astype(np.float32)))
+        engine_state = self.search_engine.append(state.engine_state, matrix, matris)
+        return _GalleryState(matrix, state.user_ids + [user_id], state.usernames + [username],
+                             starts, centroids, engine_state, state.projection, state.dim)
+
+    def _without_user(self, state, user_id):
+        if user_id not in state.user_ids:
+            return state
+        return self._without(state, state.user_ids.index(user_id))
+
+    def _without(self, state, slot):
+        bas, son = state.rows_of(slot)
+        matrix = np.concatenate((state.matrix[:bas], state.matrix[son:]))
+        starts = np.concatenate((state.starts[:slot], state.starts[slot + 1:] - (son - bas))).astype(np.int64)
+        centroids = np.concatenate((state.centroids[:slot], state.centroids[slot + 1:]))
+        engine_state = self.search_engine.remove(state.engine_state, matrix, bas, son)
+        return _GalleryState(matrix, state.user_ids[:slot] + state.user_ids[slot + 1:],
+                             state.usernames[:slot] + state.usernames[slot + 1:],
+                             starts, centroids, engine_state, state.projection, state.dim)
+
+    def best_similarity(self, matrix, query):
+        """
+        Simge: username_hint yolunda kullanıcının (tam boyutlu, önbellekteki) poz matrisine sorgunun
+        en yüksek benzerliği. PCA açıksa ikisi de galerinin o anki izdüşümüyle indirgenmiş uzaya
+        taşınıyor, böylece %70 eşiği galeri aramasıyla aynı uzayda uygulanıyor.
+        """
+        projection = self._state.projection
+        sorgu = np.asarray(query, dtype=np.float32).reshape(-1)
+        if projection is not None and matrix.shape[0] and sorgu.shape[0] == matrix.shape[1] == projection.source_dim:
+            matrix, sorgu = projection.project(matrix), projection.project(sorgu)
+        return best_similarity(matrix, sorgu)
+
+    def _centroid_candidates(self, state, sorgu):
+        """
+        Simge: İki aşamalı eşleştirmenin ilk aşaması. Kullanıcı merkezlerine göre en iyi
+        centroid_shortlist kullanıcıyı seçip onların satır indekslerini döndürür.
+        """
+        merkez_skorlari = state.centroids @ sorgu
+        m = self.centroid_shortlist
+        secilen = np.argpartition(-merkez_skorlari, m - 1)[:m]
+        return np.concatenate([np.arange(*state.rows_of(slot)) for slot in secilen])
+
+    def search(self, query, k=1):
+        """
+        Simge: Sorgu embedding'ine en benzer k kullanıcıyı döndürür.
+        Dönen liste (user_id, username, benzerlik) üçlülerinden oluşuyor, benzerlik
+        calculate_similarity ile aynı 0-100 ölçeğinde ve büyükten küçüğe sıralı.
+        """
+        state = self._state
+        matrix, starts = state.matrix, state.starts
+        if matrix.shape[0] == 0 or query is None:
+            return []
+
+        sorgu = np.asarray(query, dtype=np.float32).reshape(-1)
+        norm = np.linalg.norm(sorgu)
+        if sorgu.shape[0] != state.dim:
+            logger.error(f"GalleryIndex.search: Sorgu embedding'i {sorgu.shape[0]} boyutlu, galeri {state.dim} boyutlu; "
+                         f"boş sonuç döndürüldü.")
+            return []
+        if norm == 0:
+            logger.warning("GalleryIndex.search: Geçersiz sorgu embedding'i, boş sonuç döndürüldü.")
+            return []
+
+        sorgu = sorgu / norm
+        if state.projection is not None:
+            sorgu = state.projection.project(sorgu)
+
+        # Merkez ön elemesi açıksa motor sadece seçilen kullanıcıların satırları arasından aday seçiyor.
+        satirlar = self._centroid_candidates(state, sorgu) if 0 < self.centroid_shortlist < len(state.user_ids) else None
+        adaylar = self.search_engine.candidates(state.engine_state, matrix, sorgu, rows=satirlar)
+
+        if adaylar is None:
+            skorlar = matrix @ sorgu  # tek matris-vektör çarpımı
+            kullanici_skorlari = np.maximum.reduceat(skorlar, starts)
+            slotlar = np.arange(kullanici_skorlari.shape[0])
+        else:
+            if adaylar.shape[0] == 0:
+                return []
+            if matrix.shape[1] == 0:
+                slotlar, kullanici_skorlari = self._rerank_loaded(state, adaylar, sorgu)
+                if slotlar.shape[0] == 0:
+                    return []
+            else:
+                # Aday satırları tam skorla yeniden sırala, her kullanıcının en iyi satırını tut.
+                skorlar = matrix[adaylar] @ sorgu
+                sira = np.argsort(-skorlar)
+                aday_slotlari = np.searchsorted(starts, adaylar[sira], side='right') - 1
+                slotlar, ilk = np.unique(aday_slotlari, return_index=True)
+                kullanici_skorlari = skorlar[sira][ilk]
+
+        k = min(k, kullanici_skorlari.shape[0])
+        if k == 1:
+            en_iyiler = [int(np.argmax(kullanici_skorlari))]
+        else:
+            aday = np.argpartition(-kullanici_skorlari, k - 1)[:k]
+            en_iyiler = aday[np.argsort(-kullanici_skorlari[aday])]
+
+        return [(state.user_ids[slotlar[i]], state.usernames[slotlar[i]], float(cosine_to_similarity(kullanici_skorlari[i])))
+                for i in en_iyiler]
+
+    def _rerank_loaded(self, state, adaylar, sorgu):
+        """
+        Simge: Float matris bellekte yokken aday kullanıcıların tüm pozlarını
+        vector_loader ile okuyup tam skorla değerlendirir.
+        """
+        slotlar = np.unique(np.searchsorted(state.starts, adaylar, side='right') - 1)
+        if self.vector_loader is None:
+            logger.error("GalleryIndex: Float vektörler tutulmuyor ama vector_loader tanımlı değil.")
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        vektorler = self.vector_loader([state.user_ids[slot] for slot in slotlar])
+        bulunan, skorlar = [], []
+        for slot in slotlar:
+            matris = self._to_matrix(vektorler.get(state.user_ids[slot]), state.projection, state.dim)
+            if matris.shape[0]:
+                bulunan.append(slot)
+                skorlar.append(np.max(matris @ sorgu))
+        return np.array(bulunan, dtype=np.int64), np.array(skorlar, dtype=np.float32)
+
+
+# Süreç genelinde paylaşılan galeri, create_app içinde MongoDB'den dolduruluyor.
+gallery_index = GalleryIndex(projection=load_projection())
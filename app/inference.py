@@ -0,0 +1,156 @@
+import atexit
+import collections
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+from loguru import logger
+
+
+class InferenceBusy(Exception):
+    """Çıkarım kapasitesi yetmiyor (kuyruk dolu ya da sonuç zamanında gelmedi); istek 503 almalı."""
+
+
+class InferenceQueueFull(InferenceBusy):
+    """Kuyruk dolu olduğunda submit bu hatayı fırlatır, istek beklemeden reddedilir."""
+
+
+class EmbeddingBatcher:
+    """
+    Simge: İstekler arası dinamik mikro-toplama (micro-batching).
+    Waitress thread'leri tek tek FaceNet çağırmak yerine ön işlenmiş yüzlerini kuyruğa
+    bırakıp bir Future üzerinde bekliyor. Arka plandaki işçi en fazla max_batch_size
+    yüz toplayana ya da ilk yüzün üzerinden max_wait_ms geçene kadar bekleyip tek
+    bir ileri geçişte hepsini işliyor ve sonuçları Future'lara dağıtıyor.
+    Beklerken zaman aşımına uğrayıp iptal edilen (Future.cancel) yüzler toplu geçişe alınmıyor.
+    """
+
+    def __init__(self, run_batch, max_batch_size=16, max_wait_ms=5, queue_depth=256, name='facenet'):
+        self.run_batch = run_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0, max_wait_ms) / 1000.0
+        self.name = name
+        self._queue = queue.Queue(maxsize=queue_depth)
+        self._thread = None
+        self._closing = False
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._batch_size_counts = [0] * (self.max_batch_size + 1)
+        self._wait_times = collections.deque(maxlen=1000)
+        self._total_items = 0
+        self._rejected = 0
+        self._failed_batches = 0
+
+    def _ensure_started(self):
+        # İşçi thread'i ilk istekte başlatıyorum, import sırasında thread açılmasın.
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._worker, name=f"{self.name}-batcher", daemon=True)
+                self._thread.start()
+
+    def submit(self, item):
+        """
+        Simge: Tek bir ön işlenmiş yüzü (160x160x3) kuyruğa ekler ve sonucun yazılacağı Future'ı döndürür.
+        """
+        self._ensure_started()
+        future = Future()
+        try:
+            self._queue.put_nowait((item, future, time.monotonic()))
+        except queue.Full:
+            with self._stats_lock:
+                self._rejected += 1
+            raise InferenceQueueFull(f"{self.name} çıkarım kuyruğu dolu ({self._queue.maxsize}).")
+        return future
+
+    def _collect(self, ilk):
+        batch = [ilk]
+        son_tarih = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            kalan = son_tarih - time.monotonic()
+            try:
+                item = self._queue.get_nowait() if kalan <= 0 else self._queue.get(timeout=kalan)
+            except queue.Empty:
+                break
+            if item is None:
+                # Kapanış işareti: bu toplu geçiş bitince işçi duruyor. İşareti dolu kuyruğa
+                # geri koymaya çalışmak tek tüketiciyi kendini beklemeye sokardı.
+                self._closing = True
+                break
+            batch.append(item)
+        return batch
+
+    def _worker(self):
+        while not self._closing:
+            ilk = self._queue.get()
+            if ilk is None:
+                return
+            # İptal edilen Future'lar atlanıyor; kalanlar çalışıyor olarak işaretleniyor (artık iptal edilemez).
+            batch = [b for b in self._collect(ilk) if b[1].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            baslangic = time.monotonic()
+            with self._stats_lock:
+                self._batch_size_counts[len(batch)] += 1
+                self._total_items += len(batch)
+                self._wait_times.extend(baslangic - eklenme for _, _, eklenme in batch)
+
+            try:
+                sonuclar = self.run_batch(np.stack([item for item, _, _ in batch]))
+                for (_, future, _), sonuc in zip(batch, sonuclar):
+                    future.set_result(sonuc)
+            except Exception as e:
+                logger.error(f"EmbeddingBatcher: {len(batch)} elemanlı toplu çıkarım başarısız: {e}")
+                with self._stats_lock:
+                    self._failed_batches += 1
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def stats(self):
+        with self._stats_lock:
+            bekleme_ms = np.array(self._wait_times) * 1000 if self._wait_times else np.zeros(1)
+            batch_sayisi = sum(self._batch_size_counts)
+            return {
+                'queue_depth': self._queue.qsize(),
+                'queue_capacity': self._queue.maxsize,
+                'batches': batch_sayisi,
+                'items': self._total_items,
+                'rejected': self._rejected,
+                'failed_batches': self._failed_batches,
+                'avg_batch_size': round(self._total_items / batch_sayisi, 2) if batch_sayisi else 0.0,
+                'batch_size_histogram': {str(boyut): adet for boyut, adet in enumerate(self._batch_size_counts) if adet},
+                'wait_ms': {
+                    'p50': round(float(np.percentile(bekleme_ms, 50)), 3),
+                    'p95': round(float(np.percentile(bekleme_ms, 95)), 3),
+                    'max': round(float(bekleme_ms.max()), 3),
+                },
+            }
+
+    def shutdown(self, timeout=5.0):
+        if self._thread is None or not self._thread.is_alive():
+            return
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            logger.warning(f"EmbeddingBatcher '{self.name}': kuyruk dolu, kapanış işareti bırakılamadı.")
+            return
+        self._thread.join(timeout)
+        logger.info(f"EmbeddingBatcher '{self.name}' durduruldu.")
+
+
+def create_batcher(run_batch, config):
+    """Simge: Config'teki ayarlarla batcher oluşturur; toplama kapalıysa None döner."""
+    if not config.INFERENCE_BATCHING_ENABLED:
+        return None
+    batcher = EmbeddingBatcher(
+        run_batch,
+        max_batch_size=config.INFERENCE_MAX_BATCH_SIZE,
+        max_wait_ms=config.INFERENCE_MAX_WAIT_MS,
+        queue_depth=config.INFERENCE_QUEUE_DEPTH,
+    )
+    atexit.register(batcher.shutdown)
+    return batcher
@@ -0,0 +1,132 @@
+import threading
+import time
+
+from loguru import logger
+
+# Süreç başlangıcına yakın bir referans (app paketi import edilirken); hazır olma süresi buna göre loglanıyor.
+PROCESS_STARTED_AT = time.monotonic()
+
+
+class ModelManager:
+    """
+    Simge: Ağır modellerin (TensorFlow/keras_facenet, MediaPipe) yaşam döngüsü.
+    Modeller import sırasında değil ilk kullanımda ya da preload() ile arka plan thread'inde
+    yükleniyor; böylece create_app() TensorFlow'u beklemiyor. Her model bir kere yükleniyor,
+    aynı anda isteyen thread'ler yüklemenin bitmesini bekliyor. Tüm modeller yüklenip
+    warm_up (sahte girdiyle ilk çıkarım, graf izleme maliyeti) bitince hazır sayılıyor (/readyz).
+    Yüklenemeyen model için get None döndürüyor ve hata status()'ta görünüyor. Hata kalıcı
+    değil: retry_after_s geçtikten sonraki ilk get yüklemeyi tekrar deniyor (ör. model dosyası
+    indirilirken geçici ağ hatası), arada gelen çağrılar beklemeden None alıyor.
+    """
+
+    def __init__(self, loaders, warm_up=None, name='models', retry_after_s=30.0):
+        self._loaders = dict(loaders)
+        self._warm_up = warm_up
+        self.name = name
+        self.retry_after_s = retry_after_s
+        self._models = {}
+        self._errors = {}
+        self._failed_at = {}
+        self._load_s = {}
+        self._locks = {ad: threading.Lock() for ad in self._loaders}
+        self._state_lock = threading.Lock()
+        self._preload_thread = None
+        self._ready = threading.Event()
+        self._warm_up_s = None
+        self._ready_after_s = None
+
+    def get(self, name):
+        """Simge: Modeli döndürür, yüklenmemişse bu thread'de yükler. Yüklenemezse None."""
+        model = self._models.get(name)
+        if model is not None or self._backing_off(name):
+            return model
+        with self._locks[name]:
+            if name not in self._models and not self._backing_off(name):
+                baslangic = time.perf_counter()
+                try:
+                    self._models[name] = self._loaders[name]()
+                    self._load_s[name] = time.perf_counter() - baslangic
+                    self._errors.pop(name, None)
+                    self._failed_at.pop(name, None)
+                    logger.info(f"ModelManager '{self.name}': '{name}' {self._load_s[name]:.2f} sn'de yüklendi.")
+                except Exception as e:
+                    self._errors[name] = str(e)
+                    self._failed_at[name] = time.monotonic()
+                    logger.error(f"ModelManager '{self.name}': '{name}' yüklenirken hata: {e} "
+                                 f"({self.retry_after_s:.0f} sn sonra tekrar denenecek)")
+        return self._models.get(name)
+
+    def _backing_off(self, name):
+        # Son yükleme hatasının üzerinden retry_after_s geçmediyse tekrar denemiyorum.
+        hata_zamani = self._failed_at.get(name)
+        return hata_zamani is not None and time.monotonic() - hata_zamani < self.retry_after_s
+
+    def override(self, name, loader):
+        """
+        Simge: Modelin yükleyicisini değiştirir (ör. benchmarks/suite.py'de FaceNet yerine hafif
+        bir taklit). Model daha önce yüklendiyse ya da hata aldıysa bir sonraki get'te yeniden yükleniyor.
+        """
+        with self._state_lock:
+            self._locks.setdefault(name, threading.Lock())
+            with self._locks[name]:
+                self._loaders[name] = loader
+                self._models.pop(name, None)
+                self._errors.pop(name, None)
+                self._failed_at.pop(name, None)
+                self._load_s.pop(name, None)
+            self._ready.clear()
+
+    def load_all(self):
+        """Simge: Tüm modelleri yükleyip ısıtır; hepsi hazırsa True döner."""
+        for ad in self._loaders:
+            self.get(ad)
+        if self._errors:
+            logger.error(f"ModelManager '{self.name}': modeller hazır değil, hatalı: {', '.join(self._errors)}")
+            return False
+        if self._ready.is_set():
+            return True
+        with self._state_lock:
+            if self._ready.is_set():
+                return True
+            if self._warm_up is not None:
+                baslangic = time.perf_counter()
+                try:
+                    self._warm_up(self)
+                except Exception as e:
+                    # Isınma başarısız olsa da modeller kullanılabilir, sadece ilk istek yavaş olur.
+                    logger.error(f"ModelManager '{self.name}': ısınma çıkarımında hata: {e}")
+                self._warm_up_s = time.perf_counter() - baslangic
+            self._ready_after_s = time.monotonic() - PROCESS_STARTED_AT
+            self._ready.set()
+        logger.info(f"ModelManager '{self.name}': modeller hazır (başlangıçtan {self._ready_after_s:.2f} sn, "
+                    f"yükleme {sum(self._load_s.values()):.2f} sn, ısınma {self._warm_up_s or 0:.2f} sn).")
+        return True
+
+    def preload(self):
+        """
+        Simge: load_all'u arka plan thread'inde başlatır (birden fazla çağrıda tek thread).
+        Önceki deneme bitmiş ama modeller hazır değilse (yükleme hatası) yeni bir deneme başlatıyor.
+        """
+        with self._state_lock:
+            if self._preload_thread is None or (not self._preload_thread.is_alive() and not self._ready.is_set()):
+                self._preload_thread = threading.Thread(target=self.load_all, name=f"{self.name}-preload", daemon=True)
+                self._preload_thread.start()
+        return self._preload_thread
+
+    def wait_ready(self, timeout=None):
+        return self._ready.wait(timeout)
+
+    def is_ready(self):
+        return self._ready.is_set()
+
+    def status(self):
+        return {
+            'ready': self.is_ready(),
+            'loaded': sorted(self._models),
+            'pending': sorted(ad for ad in self._loaders if ad not in self._models and ad not in self._errors),
+            'retry_in_s': {ad: round(max(0.0, self.retry_after_s - (time.monotonic() - t)), 1) for ad, t in self._failed_at.items()},
+            'errors': dict(self._errors),
+            'load_s': {ad: round(s, 3) for ad, s in self._load_s.items()},
+            'warm_up_s': round(self._warm_up_s, 3) if self._warm_up_s is not None else None,
+            'ready_after_s': round(self._ready_after_s, 3) if self._ready_after_s is not None else None,
+        }
@@ -0,0 +1,204 @@
+import collections
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+from flask import g, has_request_context, request
+from loguru import logger
+
+from config import Config
+
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class LatencySummary:
+    """
+    Simge: Bir aşamanın süre dağılımı. Toplam sayı ve toplam süre baştan beri tutuluyor,
+    p50/p95/p99 ise son window ölçümden hesaplanıyor (sabit bellek, güncel dağılım).
+    """
+
+    def __init__(self, window=2048):
+        self._samples = collections.deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, seconds):
+        self._samples.append(seconds)
+        self.count += 1
+        self.total += seconds
+
+    def quantiles(self):
+        if not self._samples:
+            return {q: 0.0 for q in QUANTILES}
+        degerler = np.quantile(np.fromiter(self._samples, dtype=np.float64), QUANTILES)
+        return dict(zip(QUANTILES, degerler.tolist()))
+
+
+class MetricsRegistry:
+    """
+    Simge: Süreç içi metrik deposu: aşama süreleri (face login hattı), uç nokta başına
+    istek süreleri ve (uç nokta, yöntem, durum kodu) başına istek sayıları.
+    /metrics bunları Prometheus metin biçiminde, /api/admin/stats ise ms cinsinden özet olarak veriyor.
+    """
+
+    def __init__(self, window=2048):
+        self.window = window
+        self._lock = threading.Lock()
+        self._stages = {}
+        self._requests = {}
+        self._request_counts = collections.Counter()
+
+    def _summary(self, tablo, ad):
+        ozet = tablo.get(ad)
+        if ozet is None:
+            ozet = tablo[ad] = LatencySummary(self.window)
+        return ozet
+
+    def observe_stage(self, stage, seconds):
+        with self._lock:
+            self._summary(self._stages, stage).observe(seconds)
+
+    def observe_request(self, endpoint, method, status, seconds):
+        with self._lock:
+            self._summary(self._requests, endpoint).observe(seconds)
+            self._request_counts[(endpoint, method, status)] += 1
+
+    def reset(self):
+        """Simge: Tüm ölçümleri siler (ör. benchmark'ta kurulum sırasındaki ölçümler karışmasın)."""
+        with self._lock:
+            self._stages.clear()
+            self._requests.clear()
+            self._request_counts.clear()
+
+    def snapshot(self):
+        """Simge: Aşama başına sayı ve p50/p95/p99 (ms)."""
+        with self._lock:
+            return {ad: {'count': ozet.count, **{f"p{int(q * 100)}_ms": round(v * 1000, 3) for q, v in ozet.quantiles().items()}}
+                    for ad, ozet in sorted(self._stages.items())}
+
+    def render_prometheus(self, gauges=None):
+        """Simge: Tüm metrikleri Prometheus metin biçiminde (text/plain; version=0.0.4) döndürür."""
+        satirlar = []
+
+        def ozetler(metrik, aciklama, etiket, tablo):
+            satirlar.append(f"# HELP {metrik} {aciklama}")
+            satirlar.append(f"# TYPE {metrik} summary")
+            for ad, ozet in sorted(tablo.items()):
+                for q, v in ozet.quantiles().items():
+                    satirlar.append(f'{metrik}{{{etiket}="{_label(ad)}",quantile="{q}"}} {v:.6f}')
+                satirlar.append(f'{metrik}_sum{{{etiket}="{_label(ad)}"}} {ozet.total:.6f}')
+                satirlar.append(f'{metrik}_count{{{etiket}="{_label(ad)}"}} {ozet.count}')
+
+        with self._lock:
+            ozetler('facesecure_stage_duration_seconds', 'Face login hattındaki aşamaların süresi.', 'stage', self._stages)
+            ozetler('facesecure_http_request_duration_seconds', 'Uç nokta başına istek süresi.', 'endpoint', self._requests)
+            satirlar.append("# HELP facesecure_http_requests_total Uç nokta, yöntem ve durum koduna göre istek sayısı.")
+            satirlar.append("# TYPE facesecure_http_requests_total counter")
+            for (endpoint, method, status), sayi in sorted(self._request_counts.items()):
+                satirlar.append(f'facesecure_http_requests_total{{endpoint="{_label(endpoint)}",method="{method}",status="{status}"}} {sayi}')
+
+        for ad, deger in sorted((gauges or {}).items()):
+            satirlar.append(f"# TYPE {ad} gauge")
+            satirlar.append(f"{ad} {deger}")
+        return "\n".join(satirlar) + "\n"
+
+
+def _label(deger):
+    return str(deger).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def flatten_gauges(stats, prefix='facesecure'):
+    """
+    Simge: /api/admin/stats sözlüğündeki sayısal değerleri Prometheus gauge adlarına düzleştirir
+    (ör. {'inference': {'queue_depth': 3}} -> facesecure_inference_queue_depth 3). Metin alanlar atlanıyor.
+    """
+    gauges = {}
+    for anahtar, deger in (stats or {}).items():
+        ad = re.sub(r'[^a-zA-Z0-9_]', '_', f"{prefix}_{anahtar}")
+        if isinstance(deger, dict):
+            gauges.update(flatten_gauges(deger, ad))
+        elif isinstance(deger, bool):
+            gauges[ad] = int(deger)
+        elif isinstance(deger, (int, float)) and deger == deger:  # NaN değil
+            gauges[ad] = deger
+    return gauges
+
+
+metrics = MetricsRegistry(Config.METRICS_WINDOW)
+
+
+@contextmanager
+def timed(stage):
+    """
+    Simge: Bloğun ya da fonksiyonun süresini monotonik saatle ölçüp aşama metriğine ekler.
+    İstek içindeyse süre Server-Timing başlığı için de istek bağlamına yazılıyor.
+    `with timed('detect_faces'):` ya da `@timed('detect_faces')` olarak kullanılabilir.
+    """
+    baslangic = time.perf_counter()
+    try:
+        yield
+    finally:
+        sure = time.perf_counter() - baslangic
+        _record_stage(stage, sure)
+        toplanan = getattr(_collected, 'stages', None)
+        if toplanan is not None:
+            toplanan.append((stage, sure))
+
+
+def _record_stage(stage, sure):
+    metrics.observe_stage(stage, sure)
+    if has_request_context():
+        zamanlar = g.setdefault('server_timing', {})
+        zamanlar[stage] = zamanlar.get(stage, 0.0) + sure
+
+
+# collect_stages bloğu içindeyken bu thread'de ölçülen aşamalar
+_collected = threading.local()
+
+
+@contextmanager
+def collect_stages():
+    """
+    Simge: Blok içinde bu thread'de timed ile ölçülen aşamaları (ad, saniye) listesine de toplar.
+    Süreç havuzu işçileri ölçtükleri aşamaları sonuçla birlikte ana sürece bu listeyle gönderiyor,
+    ana süreçte record_stages ile kendi metriklerine (ve isteğin Server-Timing başlığına) ekleniyor.
+    """
+    onceki = getattr(_collected, 'stages', None)
+    _collected.stages = asamalar = []
+    try:
+        yield asamalar
+    finally:
+        _collected.stages = onceki
+
+
+def record_stages(asamalar):
+    """Simge: Başka bir süreçte ölçülmüş aşama sürelerini bu sürecin metriklerine ekler."""
+    for stage, sure in asamalar:
+        _record_stage(stage, sure)
+
+
+def init_app(app):
+    """Simge: Her isteğin süresini ve durum kodunu kaydeden, istenirse Server-Timing ekleyen kancalar."""
+
+    @app.before_request
+    def _start_timer():
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def _record_request(response):
+        baslangic = g.get('request_started')
+        if baslangic is None:
+            return response
+        sure = time.perf_counter() - baslangic
+        try:
+            metrics.observe_request(request.endpoint or 'unknown', request.method, response.status_code, sure)
+            if Config.SERVER_TIMING_ENABLED:
+                parcalar = [f"{ad};dur={s * 1000:.2f}" for ad, s in g.get('server_timing', {}).items()]
+                parcalar.append(f"total;dur={sure * 1000:.2f}")
+                response.headers['Server-Timing'] = ", ".join(parcalar)
+        except Exception as e:
+            logger.error(f"İstek metriği kaydedilirken hata: {e}")
+        return response
@@ -1,10 +1,18 @@
-from pymongo import MongoClient
+from pymongo import MongoClient, ASCENDING, DESCENDING
+from pymongo.errors import DuplicateKeyError
 from config import Config
 from loguru import logger
-import bcrypt
 import datetime
 import jwt
+import re
 from bson.objectid import ObjectId #ObjectId'yi burada import ettim fonksiyonların içinde değil
+from bson.binary import Binary
+import numpy as np
+from app.gallery import gallery_index, embeddings_to_matrix
+from app.cache import principal_cache, user_embedding_cache
+from app.prototypes import build_face_profile
+from app.writer import create_failed_login_writer
+from app.passwords import PasswordHasherBusy, password_hasher
 
 
 # MongoDB bağlantısı
@@ -18,6 +26,162 @@ except Exception as e:
 
 
 
+# Embedding'leri BSON double listesi yerine tek bir bitişik ikili blob olarak saklıyorum:
+# {"data": Binary, "shape": [n_poz, boyut], "dtype": "float32" | "float16"}
+EMBEDDING_STORAGE_DTYPES = ('float32', 'float16')
+
+def encode_face_embeddings(face_embeddings, dtype=None):
+    """
+    Simge: Poz embedding'lerini (liste ya da dizi) MongoDB'de saklanacak ikili forma çevirir.
+    """
+    dtype = dtype or Config.EMBEDDING_STORAGE_DTYPE
+    if dtype not in EMBEDDING_STORAGE_DTYPES:
+        raise ValueError(f"Desteklenmeyen embedding saklama tipi: {dtype}")
+    matris = np.ascontiguousarray(np.asarray(face_embeddings, dtype=dtype))
+    if matris.ndim == 1:
+        matris = matris.reshape(1, -1)
+    return {"data": Binary(matris.tobytes()), "shape": list(matris.shape), "dtype": dtype}
+
+def decode_face_embeddings(stored):
+    """
+    Simge: Saklanan embedding'leri (n_poz, boyut) NumPy dizisine çevirir.
+    İkili blob kopyalanmadan np.frombuffer ile görüntüleniyor (salt okunur).
+    Eski dokümanlardaki float listeleri de okunabiliyor. Bozuk veri (düzensiz liste,
+    boyutu uymayan blob vb.) uyarıyla boş matris olarak dönüyor; tek bir bozuk doküman
+    galeri kurulumunu durdurmasın, o kullanıcı galeriye eklenmeden atlanıyor.
+    """
+    if stored is None:
+        return np.empty((0, 0), dtype=np.float32)
+    try:
+        if isinstance(stored, dict):
+            return np.frombuffer(stored["data"], dtype=stored.get("dtype", "float32")).reshape(stored["shape"])
+        return np.asarray(stored, dtype=np.float32)
+    except (KeyError, TypeError, ValueError) as e:
+        logger.warning(f"decode_face_embeddings: Bozuk embedding verisi atlandı: {e}")
+        return np.empty((0, 0), dtype=np.float32)
+
+
+def face_profile_fields(face_embeddings):
+    """
+    Simge: Kayıt sonrası işlemenin MongoDB'ye yazılacak alanları: tekrarları atılmış
+    pozlar ve prototipler. Geçerli poz yoksa None döner. Merkez vektörü saklanmıyor,
+    galeri onu eşleştirmede kullandığı (gerekirse izdüşürülmüş) satırlardan hesaplıyor.
+    """
+    pozlar, _, prototipler = build_face_profile(face_embeddings)
+    if pozlar is None:
+        return None
+    return {
+        "face_embeddings": encode_face_embeddings(pozlar),
+        "face_prototypes": encode_face_embeddings(prototipler),
+    }
+
+def matching_embeddings(user):
+    """
+    Simge: Eşleştirmede kullanılacak vektörler. Prototipler açıksa ve dokümanda varsa
+    prototipler, yoksa (ör. henüz backfill edilmemiş eski kayıtlar) tüm pozlar.
+    """
+    if Config.GALLERY_USE_PROTOTYPES and user.get('face_prototypes') is not None:
+        return decode_face_embeddings(user['face_prototypes'])
+    return decode_face_embeddings(user.get('face_embeddings'))
+
+def cached_face_profile(username):
+    """
+    Simge: username_hint ile girişte önbellekteki poz matrisi ve önbellek nesli, (profil, nesil).
+    Profil yoksa çağıran 'matching' projeksiyonuyla dokümanı okuyup face_profile_from_document'a
+    bu nesli veriyor; okuma sırasında kullanıcı silinir ya da güncellenirse eski profil önbelleğe yazılmıyor.
+    User.get_face_profile (pymongo) ve asgi.AsyncUserStore (motor) aynı adımları kullanıyor.
+    """
+    nesil = user_embedding_cache.generation()
+    return user_embedding_cache.get_by_username(username), nesil
+
+def face_profile_from_document(user, generation):
+    # cached_face_profile'ın devamı: okunan dokümandan profil hesaplanıp önbelleğe yazılıyor.
+    if user is None:
+        return None
+    return user_embedding_cache.put(user['_id'], user['username'], embeddings_to_matrix(matching_embeddings(user)),
+                                    generation=generation)
+
+# Kullanım senaryosuna göre users koleksiyonundan okunan alanlar. Yüz verisi (blob'lar)
+# sadece eşleştirmede okunuyor; diğer tüm okumalar embedding'leri hiç indirmiyor.
+USER_PROJECTIONS = {
+    'exists': {"_id": 1},
+    'principal': {"username": 1, "role": 1},
+    'credentials': {"username": 1, "password": 1},
+    'listing': {"username": 1, "created_at": 1, "last_login": 1},
+    # face_centroid artık yazılmıyor ama eski dokümanlarda olabilir
+    'profile': {"face_embeddings": 0, "face_centroid": 0, "face_prototypes": 0, "password": 0},
+    'matching': {"username": 1, "face_embeddings": 1, "face_prototypes": 1},
+    'full': None,
+}
+
+def _projection(fields):
+    # fields bir senaryo adı ('credentials' vb.) ya da doğrudan bir projeksiyon sözlüğü olabilir.
+    return USER_PROJECTIONS[fields] if isinstance(fields, str) else fields
+
+
+def _ensure_ttl_index(collection, field, name, ttl_seconds):
+    """
+    Simge: field üzerinde tek bir azalan indeks: ttl_seconds > 0 ise TTL indeksi (name + '_ttl'),
+    değilse düz indeks (name). Aynı anahtarla farklı seçenekli bir indeks zaten varsa create_index
+    IndexOptionsConflict veriyor; saklama süresi değiştiyse collMod ile güncelliyorum, TTL açılıp
+    kapandıysa eski indeksi silip yenisini oluşturuyorum.
+    """
+    anahtar = [(field, DESCENDING)]
+    for ad, bilgi in collection.index_information().items():
+        if bilgi['key'] != anahtar:
+            continue
+        mevcut = bilgi.get('expireAfterSeconds')
+        if ttl_seconds > 0 and mevcut is not None:
+            if mevcut != ttl_seconds:
+                collection.database.command('collMod', collection.name,
+                                            index={'name': ad, 'expireAfterSeconds': ttl_seconds})
+                logger.info(f"{collection.name}.{ad} TTL süresi {mevcut} -> {ttl_seconds} sn olarak güncellendi.")
+            return
+        if ttl_seconds <= 0 and mevcut is None:
+            return
+        collection.drop_index(ad)
+        logger.info(f"{collection.name}.{ad} indeksi TTL ayarı değiştiği için yeniden oluşturuluyor.")
+    if ttl_seconds > 0:
+        collection.create_index(anahtar, name=f"{name}_ttl", expireAfterSeconds=ttl_seconds)
+    else:
+        collection.create_index(anahtar, name=name)
+
+
+def ensure_indexes(database=None):
+    """
+    Simge: Uygulama açılışında gereken indeksleri oluşturur (zaten varsa MongoDB dokunmuyor).
+    users.username tekil; failed_logins'te saklama süresi için timestamp üzerinde TTL ve
+    kullanıcı/IP bazında sorgular ve sayfalama için bileşik indeksler. Her indeks ayrı
+    deneniyor, biri oluşturulamazsa diğerleri yine oluşturuluyor.
+    """
+    database = database if database is not None else db
+    if database is None:
+        return False
+    indeksler = [
+        ("username_unique", lambda: database.users.create_index([("username", ASCENDING)], unique=True, name="username_unique")),
+        ("timestamp", lambda: _ensure_ttl_index(database.failed_logins, "timestamp", "timestamp",
+                                                Config.FAILED_LOGIN_RETENTION_DAYS * 86400)),
+        ("username_timestamp", lambda: database.failed_logins.create_index(
+            [("username", ASCENDING), ("timestamp", DESCENDING)], name="username_timestamp")),
+        # Yönetim panelindeki keyset sayfalama (timestamp, _id) sırasıyla ilerliyor.
+        ("timestamp_id", lambda: database.failed_logins.create_index(
+            [("timestamp", DESCENDING), ("_id", DESCENDING)], name="timestamp_id")),
+        ("ip_timestamp", lambda: database.failed_logins.create_index(
+            [("ip_address", ASCENDING), ("timestamp", DESCENDING)], name="ip_timestamp")),
+    ]
+    basarili = True
+    for ad, olustur in indeksler:
+        try:
+            olustur()
+        except Exception as e:
+            # Ör. mevcut tekrar eden kullanıcı adları tekil indeksi engelliyorsa uygulama yine açılsın.
+            logger.error(f"MongoDB indeksi '{ad}' oluşturulurken hata: {e}")
+            basarili = False
+    if basarili:
+        logger.info("MongoDB indeksleri hazır.")
+    return basarili
+
+
 class User:
     def __init__(self):
         # db'nin None olup olmadığını açıkça kontrol ediyorum.
@@ -30,39 +194,183 @@ class User:
             logger.error("MongoDB bağlantısı yok veya koleksiyon erişilemiyor, kullanıcı oluşturulamıyor.") 
             return None
 
-        hashed_password = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+        yuz_alanlari = face_profile_fields(face_embeddings)
+        if yuz_alanlari is None:
+            logger.error(f"Kullanıcı '{username}' için geçerli yüz verisi yok, kullanıcı oluşturulamıyor.")
+            return None
+
+        try:
+            hashed_password = password_hasher.hash(password)
+        except PasswordHasherBusy:
+            # Sunucu hatası değil; çağıran (kayıt rotası) 503 ile tekrar denenmesini istiyor.
+            raise
+        except Exception as e:
+            logger.error(f"Kullanıcı '{username}' için parola özetlenemedi: {e}")
+            return None
         user_data = {
             "username": username,
             "password": hashed_password,
-            "face_embeddings": face_embeddings, 
-            "created_at": datetime.datetime.now(),
+            **yuz_alanlari,
+            "created_at": datetime.datetime.now(datetime.timezone.utc),
             "last_login": None
         }
 
         try:
             result = self.collection.insert_one(user_data)
             logger.info(f"Kullanıcı '{username}' başarıyla oluşturuldu. ID: {result.inserted_id}")
+            gallery_index.add_user(result.inserted_id, username, matching_embeddings(user_data))
+            user_embedding_cache.invalidate_username(username)
             return str(result.inserted_id)
+        except DuplicateKeyError:
+            # Aynı kullanıcı adıyla eş zamanlı iki kayıt gelirse tekil indeks ikincisini reddediyor.
+            logger.warning(f"Kullanıcı adı '{username}' zaten mevcut, kullanıcı oluşturulamadı.")
+            return None
         except Exception as e:
             logger.error(f"Kullanıcı oluşturulurken beklenmedik bir hata oluştu: {e}")
             return None
 
-    def get_user_by_username(self, username):
-       
+    def get_user_by_username(self, username, fields='profile'):
+        # fields: USER_PROJECTIONS'taki senaryo adı ya da projeksiyon sözlüğü
         if self.collection is None: return None
-        return self.collection.find_one({"username": username})
+        return self.collection.find_one({"username": username}, _projection(fields))
 
-    def get_user_by_id(self, user_id):
+    def get_user_by_id(self, user_id, fields='profile'):
         # Koleksiyon yoksa direkt None döndür
         if self.collection is None: return None
         try:
-            return self.collection.find_one({"_id": ObjectId(user_id)})
+            return self.collection.find_one({"_id": ObjectId(user_id)}, _projection(fields))
         except Exception as e:
             logger.error(f"Kullanıcı ID '{user_id}' ile getirilirken hata: {e}")
             return None
 
+    def username_exists(self, username):
+        return self.get_user_by_username(username, 'exists') is not None
+
+    def list_users(self, username_prefix=None, after_id=None, limit=None):
+        """
+        Simge: Yönetim paneli listesi; embedding'ler ve parola özeti okunmuyor.
+        Sayfalama _id üzerinden keyset ile: after_id verilirse ondan sonraki kullanıcılar geliyor,
+        böylece derin sayfalarda skip() ile baştan taranmıyor. limit None ise tüm eşleşenler (dışa aktarma).
+        """
+        if self.collection is None: return []
+        sorgu = {}
+        if username_prefix:
+            # Başa sabitlenmiş regex username indeksini kullanabiliyor.
+            sorgu["username"] = {"$regex": "^" + re.escape(username_prefix)}
+        if after_id is not None:
+            sorgu["_id"] = {"$gt": ObjectId(after_id)}
+        imlec = self.collection.find(sorgu, USER_PROJECTIONS['listing']).sort("_id", ASCENDING)
+        return imlec.limit(limit) if limit else imlec.batch_size(1000)
+
+    def get_principal(self, user_id):
+        """
+        Simge: Yetkilendirme için token'daki kullanıcıyı çözer. Tüm dokümanı (embedding'ler dahil)
+        çekmek yerine sadece _id, username ve role alanlarını okuyorum, sonucu kısa süreli önbellekte tutuyorum.
+        """
+        user_id = str(user_id)
+        principal = principal_cache.get(user_id)
+        if principal is not None:
+            return principal
+        if self.collection is None: return None
+        try:
+            user = self.collection.find_one({"_id": ObjectId(user_id)}, USER_PROJECTIONS['principal'])
+        except Exception as e:
+            logger.error(f"Kullanıcı ID '{user_id}' için kimlik bilgisi getirilirken hata: {e}")
+            return None
+        if user is None:
+            return None
+        # Ayrı bir rol alanı olmayan kayıtlarda admin, ADMIN_USERNAME ile belirleniyor.
+        role = user.get('role') or ('admin' if user['username'] == Config.ADMIN_USERNAME else 'user')
+        principal = {'_id': user_id, 'username': user['username'], 'role': role}
+        principal_cache.put(user_id, principal)
+        return principal
+
+    def get_face_profile(self, username):
+        """
+        Simge: username_hint ile girişte kullanıcının normalize poz matrisini döndürür.
+        Her denemede embedding listelerini tekrar ayrıştırmamak için önbellekten okuyorum.
+        """
+        profil, nesil = cached_face_profile(username)
+        if profil is not None or self.collection is None:
+            return profil
+        return face_profile_from_document(self.collection.find_one({"username": username}, USER_PROJECTIONS['matching']), nesil)
+
+    def update_face_embeddings(self, user_id, face_embeddings):
+        # Embedding'ler değişince galeri ve önbellek de güncellenmeli.
+        if self.collection is None: return False
+        yuz_alanlari = face_profile_fields(face_embeddings)
+        if yuz_alanlari is None:
+            logger.error(f"Kullanıcı ID '{user_id}' için geçerli yüz verisi yok, güncellenmedi.")
+            return False
+        try:
+            user = self.collection.find_one_and_update(
+                {"_id": ObjectId(user_id)},
+                {"$set": yuz_alanlari},
+                projection={"username": 1}
+            )
+        except Exception as e:
+            logger.error(f"Kullanıcı ID '{user_id}' için yüz verileri güncellenirken hata: {e}")
+            return False
+        if user is None:
+            return False
+        gallery_index.add_user(user_id, user['username'], matching_embeddings(yuz_alanlari))
+        user_embedding_cache.invalidate(user_id)
+        return True
+
+    def load_face_embeddings(self, user_ids):
+        # Galeri float vektörleri tutmadığında adayların yeniden skorlanması için kullanılıyor.
+        if self.collection is None: return {}
+        try:
+            imlecler = self.collection.find({"_id": {"$in": [ObjectId(user_id) for user_id in user_ids]}}, USER_PROJECTIONS['matching'])
+            return {str(user['_id']): matching_embeddings(user) for user in imlecler}
+        except Exception as e:
+            logger.error(f"Yüz verileri toplu okunurken hata: {e}")
+            return {}
+
+    def iter_gallery_entries(self):
+        # Galeri indeksini kurmak için sadece gereken alanları çekiyorum.
+        if self.collection is None: return
+        for user in self.collection.find({}, USER_PROJECTIONS['matching']):
+            try:
+                face_embeddings = matching_embeddings(user)
+            except Exception as e:
+                # Tek bir bozuk doküman tüm galeriyi boş bırakmasın
+                logger.warning(f"Kullanıcı ID '{user.get('_id')}' yüz verisi okunamadı, galeriye eklenmedi: {e}")
+                continue
+            yield user['_id'], user.get('username'), face_embeddings
+
     def verify_password(self, stored_password_hash, provided_password):
-        return bcrypt.checkpw(provided_password.encode('utf-8'), stored_password_hash.encode('utf-8'))
+        # bcrypt havuzda çalışıyor; havuz doluysa PasswordHasherBusy çağırana (rotaya) geçiyor.
+        return password_hasher.verify(stored_password_hash, provided_password)
+
+    def rehash_password_if_needed(self, user_id, stored_password_hash, provided_password):
+        """
+        Simge: Parola BCRYPT_ROUNDS'tan farklı bir maliyetle saklanmışsa başarılı girişten sonra
+        yeni maliyetle özetleyip kaydeder. Özetleme havuzda arka planda yapılıyor, yanıt beklemiyor;
+        sadece boşta işçi varken kabul ediliyor (try_hash_async, slot beklemiyor ve gerçek parola
+        isteklerinin yerini almıyor), yoksa bu sefer atlanıyor, bir sonraki girişte tekrar deneniyor.
+        """
+        if self.collection is None or not password_hasher.needs_rehash(stored_password_hash):
+            return False
+        future = password_hasher.try_hash_async(provided_password)
+        if future is None:
+            return False
+
+        def kaydet(future):
+            try:
+                # Eski özet hâlâ yerindeyse değiştiriyorum (arada parola değişmiş olabilir).
+                sonuc = self.collection.update_one(
+                    {"_id": ObjectId(user_id), "password": stored_password_hash},
+                    {"$set": {"password": future.result()}}
+                )
+                if sonuc.modified_count:
+                    password_hasher.record_rehash()
+                    logger.info(f"Kullanıcı ID '{user_id}' parolası {password_hasher.rounds} maliyetiyle yeniden özetlendi.")
+            except Exception as e:
+                logger.error(f"Kullanıcı ID '{user_id}' parolası yeniden özetlenirken hata: {e}")
+
+        future.add_done_callback(kaydet)
+        return True
 
 
     def update_last_login(self, user_id):
@@ -71,7 +379,7 @@ class User:
         try:
             self.collection.update_one(
                 {"_id": ObjectId(user_id)},
-                {"$set": {"last_login": datetime.datetime.now()}}
+                {"$set": {"last_login": datetime.datetime.now(datetime.timezone.utc)}}
             )
         except Exception as e:
             logger.error(f"Kullanıcı ID '{user_id}' için son giriş zamanı güncellenirken hata: {e}")
@@ -83,16 +391,28 @@ class User:
             result = self.collection.delete_one({"_id": ObjectId(user_id)})
             if result.deleted_count == 1:
                 logger.info(f"Kullanıcı ID '{user_id}' başarıyla silindi.")
+                gallery_index.remove_user(user_id)
+                user_embedding_cache.invalidate(user_id)
+                principal_cache.pop(str(user_id))
                 return True
             return False
         except Exception as e:
             logger.error(f"Kullanıcı ID '{user_id}' silinirken hata: {e}")
             return False
 
+def _insert_failed_logins(documents):
+    db.failed_logins.insert_many(documents, ordered=False)
+
+# Süreç genelinde tek hatalı giriş yazıcısı (tek işçi thread'i, tek atexit kaydı); tüm FailedLogin
+# örnekleri (ASGI modu dahil) bunu paylaşıyor. Asenkron yazma kapalıysa None.
+failed_login_writer = create_failed_login_writer(_insert_failed_logins, Config) if db is not None else None
+
 class FailedLogin:
     def __init__(self):
         # db'nin None olup olmadığını açıkça kontrol ediyorum.
         self.collection = db.failed_logins if db is not None else None 
+        # Kayıtlar arka planda toplu yazılıyor; kapalıysa (None) eskisi gibi insert_one.
+        self.writer = failed_login_writer if self.collection is not None else None
 
     def log_attempt(self, username, ip_address):
         # Koleksiyon yoksa bir şey yapmıyorum.
@@ -100,14 +420,48 @@ class FailedLogin:
         log_data = {
             "username": username,
             "ip_address": ip_address,
-            "timestamp": datetime.datetime.now()
+            # TTL indeksi zamanı UTC olarak yorumluyor
+            "timestamp": datetime.datetime.now(datetime.timezone.utc)
         }
+        logger.warning(f"Hatalı giriş denemesi: Kullanıcı '{username}', IP: {ip_address}")
+        if self.writer is not None:
+            self.writer.write(log_data)
+            return
         try:
             self.collection.insert_one(log_data)
-            logger.warning(f"Hatalı giriş denemesi: Kullanıcı '{username}', IP: {ip_address}")
         except Exception as e:
             logger.error(f"Hatalı giriş loglanırken hata: {e}")
 
+    def stats(self):
+        return self.writer.stats() if self.writer is not None else None
+
+    def list_attempts(self, username=None, ip_address=None, since=None, until=None, before=None, limit=None):
+        """
+        Simge: Hatalı girişleri en yeniden eskiye döndürür. Filtreler: kullanıcı adı, IP ve
+        [since, until) zaman aralığı. Sayfalama (timestamp, _id) üzerinden keyset ile:
+        before=(timestamp, _id) verilirse o kayıttan daha eski olanlar geliyor.
+        limit None ise tüm eşleşenler (dışa aktarma için imleç doğrudan akıtılıyor).
+        """
+        if self.collection is None: return []
+        sorgu = {}
+        if username:
+            sorgu["username"] = username
+        if ip_address:
+            sorgu["ip_address"] = ip_address
+        if since is not None or until is not None:
+            sorgu["timestamp"] = {}
+            if since is not None:
+                sorgu["timestamp"]["$gte"] = since
+            if until is not None:
+                sorgu["timestamp"]["$lt"] = until
+        if before is not None:
+            zaman, son_id = before
+            # Aynı milisaniyedeki kayıtlar atlanmasın diye eşitlikte _id'ye bakıyorum.
+            sorgu["$or"] = [{"timestamp": {"$lt": zaman}}, {"timestamp": zaman, "_id": {"$lt": ObjectId(son_id)}}]
+        imlec = self.collection.find(sorgu, {"username": 1, "ip_address": 1, "timestamp": 1}).sort(
+            [("timestamp", DESCENDING), ("_id", DESCENDING)])
+        return imlec.limit(limit) if limit else imlec.batch_size(1000)
+
 
 
 def generate_token(user_id):
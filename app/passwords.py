@@ -0,0 +1,214 @@
+import atexit
+import collections
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+import bcrypt
+from loguru import logger
+
+from config import Config
+
+
+class PasswordHasherBusy(Exception):
+    """Parola işçileri ve kuyruğu dolu olduğunda fırlatılır, istek beklemeden reddedilir (503)."""
+
+
+def bcrypt_rounds(stored_hash):
+    """Simge: '$2b$12$...' biçimindeki bcrypt özetinin maliyet faktörü; çözülemezse None."""
+    try:
+        return int(stored_hash.split('$')[2])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+
+class PasswordHasher:
+    """
+    Simge: bcrypt özetleme ve doğrulamasını Waitress thread'lerinden ayrı, sınırlı bir
+    thread havuzunda çalıştırır. bcrypt GIL'i bırakıyor, yani işçiler gerçekten paralel;
+    aynı anda en fazla workers + queue_depth iş kabul ediliyor. Yer yoksa istek en fazla
+    admit_wait_s yer açılmasını bekliyor (kısa bir eşzamanlılık tepesinde meşru kullanıcılar
+    503 almasın diye), yine yer yoksa PasswordHasherBusy ile reddediliyor. Böylece parola
+    denemesi patlamasında en fazla bu kadar istek thread'i bcrypt'i bekliyor, geri kalanlar
+    yüz ile girişe kalıyor.
+    workers=0 ise iş çağıran thread'de yapılıyor (eski davranış, karşılaştırma için).
+    """
+
+    def __init__(self, rounds=12, workers=2, queue_depth=16, timeout_s=10.0, admit_wait_s=1.0, name='bcrypt'):
+        self.rounds = rounds
+        self.workers = max(0, workers)
+        self.queue_depth = max(0, queue_depth)
+        self.timeout_s = timeout_s
+        self.admit_wait_s = max(0.0, admit_wait_s)
+        self.name = name
+        self._executor = None
+        self._slots = threading.BoundedSemaphore(self.workers + self.queue_depth) if self.workers else None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._completed = 0
+        self._rejected = 0
+        self._rehashed = 0
+        self._wait_times = collections.deque(maxlen=1000)
+        self._run_times = collections.deque(maxlen=1000)
+
+    def _ensure_started(self):
+        # Havuzu ilk kullanımda açıyorum, import sırasında thread başlamasın.
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=f"{self.name}-worker")
+
+    def _run(self, submitted, fn, *args):
+        baslangic = time.monotonic()
+        try:
+            return fn(*args)
+        finally:
+            with self._lock:
+                self._wait_times.append(baslangic - submitted)
+                self._run_times.append(time.monotonic() - baslangic)
+                self._completed += 1
+
+    def submit(self, fn, *args):
+        """Simge: fn(*args)'ı havuza verir ve Future döndürür; yer yoksa PasswordHasherBusy."""
+        if not self.workers:
+            future = Future()
+            try:
+                future.set_result(self._run(time.monotonic(), fn, *args))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+        if not self._slots.acquire(timeout=self.admit_wait_s):
+            with self._lock:
+                self._rejected += 1
+            raise PasswordHasherBusy(f"{self.name} parola kuyruğu {self.admit_wait_s} sn boyunca dolu kaldı "
+                                     f"({self.workers + self.queue_depth}).")
+        with self._lock:
+            self._in_flight += 1
+        return self._start(fn, *args)
+
+    def try_submit(self, fn, *args):
+        """
+        Simge: Arka plan işleri (ör. yeniden özetleme) için submit. Hiç beklemiyor ve sadece boşta
+        işçi varken kabul ediyor, böylece gerçek parola isteklerinin kuyruk yerini almıyor.
+        Kabul edilmezse (ya da workers=0 ise, iş çağıranı bekletmesin diye) None döner.
+        """
+        if not self.workers:
+            return None
+        with self._lock:
+            if self._in_flight >= self.workers or not self._slots.acquire(blocking=False):
+                return None
+            self._in_flight += 1
+        return self._start(fn, *args)
+
+    def _start(self, fn, *args):
+        # Slot alınmış ve _in_flight artırılmış olarak çağrılıyor; slot iş bitince _release'te bırakılıyor.
+        self._ensure_started()
+        future = self._executor.submit(self._run, time.monotonic(), fn, *args)
+        future.add_done_callback(self._release)
+        return future
+
+    def _release(self, _future):
+        with self._lock:
+            self._in_flight -= 1
+        self._slots.release()
+
+    def _hashpw(self, password):
+        return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(self.rounds)).decode('utf-8')
+
+    @staticmethod
+    def _checkpw(stored_hash, password):
+        return bcrypt.checkpw(password.encode('utf-8'), stored_hash.encode('utf-8'))
+
+    def hash_async(self, password):
+        return self.submit(self._hashpw, password)
+
+    def try_hash_async(self, password):
+        """Simge: Boşta işçi varsa parolayı arka planda özetler (Future), yoksa None; hiç beklemiyor."""
+        return self.try_submit(self._hashpw, password)
+
+    def _result(self, future):
+        # Zaman aşımı da dolu kuyruk gibi ele alınıyor: istek 503 ile dönüyor.
+        try:
+            return future.result(timeout=self.timeout_s)
+        except FutureTimeout:
+            raise PasswordHasherBusy(f"{self.name} parola işlemi {self.timeout_s} sn içinde bitmedi.")
+
+    def hash(self, password):
+        """Simge: Parolayı BCRYPT_ROUNDS maliyetiyle özetler. Havuz doluysa PasswordHasherBusy."""
+        return self._result(self.hash_async(password))
+
+    def verify(self, stored_hash, password):
+        """Simge: Parolayı kayıtlı özetle karşılaştırır. Havuz doluysa PasswordHasherBusy."""
+        try:
+            return self._result(self.submit(self._checkpw, stored_hash, password))
+        except ValueError as e:
+            # Bozuk ya da bcrypt olmayan özet: giriş reddediliyor.
+            logger.error(f"PasswordHasher '{self.name}': geçersiz parola özeti: {e}")
+            return False
+
+    def needs_rehash(self, stored_hash):
+        """Simge: Kayıtlı özetin maliyeti BCRYPT_ROUNDS'tan farklıysa True."""
+        return bcrypt_rounds(stored_hash) != self.rounds
+
+    def record_rehash(self):
+        with self._lock:
+            self._rehashed += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'rounds': self.rounds,
+                'workers': self.workers,
+                'queue_depth': self.queue_depth,
+                'admit_wait_s': self.admit_wait_s,
+                'in_flight': self._in_flight,
+                'completed': self._completed,
+                'rejected': self._rejected,
+                'rehashed': self._rehashed,
+                'avg_wait_ms': round(_mean(self._wait_times) * 1000, 2),
+                'avg_hash_ms': round(_mean(self._run_times) * 1000, 2),
+            }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _mean(degerler):
+    return sum(degerler) / len(degerler) if degerler else 0.0
+
+
+def password_hash_limits(config, cores=None):
+    """
+    Simge: (workers, queue_depth). -1 verilen değerler WAITRESS_THREADS ve çekirdek sayısından
+    türetiliyor: en fazla WAITRESS_THREADS - 1 istek bcrypt bekleyebiliyor (en az bir thread yüz
+    ile girişe kalıyor), bunun çekirdek sayısı kadarı işçi, kalanı kuyruk.
+    """
+    cores = cores or os.cpu_count() or 1
+    sinir = max(1, config.WAITRESS_THREADS - 1)
+    workers = config.PASSWORD_HASH_WORKERS if config.PASSWORD_HASH_WORKERS >= 0 else min(cores, sinir)
+    queue_depth = config.PASSWORD_HASH_QUEUE_DEPTH if config.PASSWORD_HASH_QUEUE_DEPTH >= 0 else max(0, sinir - workers)
+    return workers, queue_depth
+
+
+def create_password_hasher(config):
+    """Simge: Config'teki ayarlarla parola havuzunu oluşturur (PASSWORD_HASH_WORKERS=0 ise istek thread'inde)."""
+    workers, queue_depth = password_hash_limits(config)
+    hasher = PasswordHasher(
+        rounds=config.BCRYPT_ROUNDS,
+        workers=workers,
+        queue_depth=queue_depth,
+        timeout_s=config.PASSWORD_HASH_TIMEOUT_S,
+        admit_wait_s=config.PASSWORD_HASH_ADMIT_WAIT_S,
+    )
+    if hasher.workers and hasher.workers + hasher.queue_depth >= config.WAITRESS_THREADS:
+        logger.warning(f"PASSWORD_HASH_WORKERS + PASSWORD_HASH_QUEUE_DEPTH ({hasher.workers + hasher.queue_depth}) "
+                       f"WAITRESS_THREADS'ten ({config.WAITRESS_THREADS}) küçük değil; parola patlamasında "
+                       f"tüm istek thread'leri bcrypt bekleyebilir.")
+    atexit.register(hasher.shutdown)
+    return hasher
+
+
+# Kayıt, parola ile giriş ve giriş sonrası yeniden özetleme bu havuzu paylaşıyor.
+password_hasher = create_password_hasher(Config)
@@ -0,0 +1,90 @@
+import datetime
+import os
+
+import numpy as np
+from loguru import logger
+
+from config import Config
+
+
+class PCAProjection:
+    """
+    Simge: Yüz embedding'leri için boyut indirgeme (PCA) izdüşümü.
+    Normalize embedding'lerin ikinci moment matrisinin en büyük
+    özvektörleri bileşen olarak alınıyor. Merkezleme yapmıyorum, çünkü eşleştirme
+    iç çarpım (kosinüs) üzerinden yapılıyor ve merkezlemesiz izdüşüm iç çarpımları
+    en iyi koruyan k boyutlu yaklaşım.
+    """
+
+    def __init__(self, components, version, explained_variance_ratio=None):
+        self.components = np.ascontiguousarray(components, dtype=np.float32)
+        self.version = str(version)
+        self.explained_variance_ratio = explained_variance_ratio
+
+    @property
+    def n_components(self):
+        return self.components.shape[0]
+
+    @property
+    def source_dim(self):
+        return self.components.shape[1]
+
+    @classmethod
+    def fit(cls, matrix, n_components, version=None, chunk_rows=65536):
+        matrix = np.asarray(matrix, dtype=np.float32)
+        if n_components > matrix.shape[1]:
+            raise ValueError(f"Bileşen sayısı ({n_components}) embedding boyutundan ({matrix.shape[1]}) büyük olamaz.")
+        # X^T X'i parça parça topluyorum, büyük galeride SVD'ye tüm matrisi vermemek için.
+        moment = np.zeros((matrix.shape[1], matrix.shape[1]), dtype=np.float64)
+        for bas in range(0, matrix.shape[0], chunk_rows):
+            parca = matrix[bas:bas + chunk_rows].astype(np.float64)
+            moment += parca.T @ parca
+        ozdegerler, ozvektorler = np.linalg.eigh(moment)
+        sira = np.argsort(ozdegerler)[::-1][:n_components]
+        oran = ozdegerler[sira] / ozdegerler.sum() if ozdegerler.sum() > 0 else None
+        if version is None:
+            version = f"{datetime.datetime.now().strftime('%Y%m%d%H%M%S')}-d{n_components}"
+        return cls(ozvektorler[:, sira].T, version, oran)
+
+    def project(self, matrix):
+        # İzdüşümden sonra tekrar L2 normalize ediyorum ki skorlar yine kosinüs olsun
+        # ve %70 eşiği indirgenmiş uzayda da aynı ölçekte kalsın.
+        izdusum = np.asarray(matrix, dtype=np.float32) @ self.components.T
+        norm = np.linalg.norm(izdusum, axis=-1, keepdims=True)
+        norm[norm == 0] = 1.0
+        return izdusum / norm
+
+    def retained_variance(self):
+        return float(self.explained_variance_ratio.sum()) if self.explained_variance_ratio is not None else None
+
+    def save(self, path=Config.PCA_MODEL_PATH):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            np.savez(f, components=self.components, version=np.array(self.version),
+                     explained_variance_ratio=self.explained_variance_ratio if self.explained_variance_ratio is not None else np.array([]))
+        logger.info(f"PCA izdüşümü kaydedildi: {path} (sürüm {self.version}, {self.n_components} boyut).")
+
+    @classmethod
+    def load(cls, path=Config.PCA_MODEL_PATH):
+        with np.load(path) as veri:
+            oran = veri['explained_variance_ratio']
+            return cls(veri['components'], veri['version'].item(), oran if oran.size else None)
+
+
+def load_projection(path=Config.PCA_MODEL_PATH):
+    """
+    Simge: PCA açıksa kayıtlı izdüşümü yükler. Kapalıysa ya da dosya yoksa None
+    döner ve eşleştirme embedding'lerin tam boyutunda devam eder.
+    """
+    if not Config.PCA_ENABLED:
+        return None
+    if not os.path.exists(path):
+        logger.warning(f"PCA açık ama izdüşüm dosyası bulunamadı ({path}), tam boyut kullanılacak.")
+        return None
+    try:
+        projection = PCAProjection.load(path)
+        logger.info(f"PCA izdüşümü yüklendi: sürüm {projection.version}, {projection.source_dim} -> {projection.n_components} boyut.")
+        return projection
+    except Exception as e:
+        logger.error(f"PCA izdüşümü yüklenirken hata: {e}")
+        return None
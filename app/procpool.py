@@ -0,0 +1,337 @@
+import atexit
+import itertools
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+from loguru import logger
+
+from config import Config
+from app.metrics import collect_stages, record_stages
+
+
+def parse_cpu_sets(spec, workers):
+    """
+    Simge: INFERENCE_POOL_CPU_PINNING değerinden işçi başına CPU kümesi listesi üretir.
+    - '' / 'none': sabitleme yok (None listesi)
+    - 'auto': kullanılabilir çekirdekler işçilere eşit parçalar halinde bölünür
+    - '0,1;2,3;4-7': işçi başına ';' ile ayrılmış açık liste (aralık yazılabilir)
+    """
+    spec = (spec or '').strip().lower()
+    if spec in ('', 'none'):
+        return [None] * workers
+    if spec == 'auto':
+        if not hasattr(os, 'sched_getaffinity'):
+            return [None] * workers
+        cekirdekler = sorted(os.sched_getaffinity(0))
+        parca = max(1, len(cekirdekler) // workers)
+        gruplar = [cekirdekler[j:j + parca] for j in range(0, parca * (len(cekirdekler) // parca), parca)]
+        return [set(gruplar[i % len(gruplar)]) for i in range(workers)]
+    kumeler = []
+    for grup in spec.split(';'):
+        kume = set()
+        for parca in grup.split(','):
+            bas, _, son = parca.strip().partition('-')
+            kume.update(range(int(bas), int(son or bas) + 1))
+        kumeler.append(kume)
+    return [kumeler[i % len(kumeler)] for i in range(workers)]
+
+
+def _worker_main(worker_id, slot_names, task_queue, result_queue, cpus, threads):
+    # İşçi süreci (spawn ile başlıyor). TensorFlow/OpenMP thread sayıları import'tan önce ayarlanmalı.
+    if threads:
+        for degisken in ('OMP_NUM_THREADS', 'TF_NUM_INTRAOP_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS'):
+            os.environ[degisken] = str(threads)
+        os.environ['TF_NUM_INTEROP_THREADS'] = '1'
+        cv2.setNumThreads(threads)
+    # İşçi içinde istekler arası mikro-toplama yok, her görev doğrudan modele gidiyor
+    # (app.utils henüz import edilmedi, batcher bu ayara göre oluşturuluyor).
+    Config.INFERENCE_BATCHING_ENABLED = False
+    if cpus and hasattr(os, 'sched_setaffinity'):
+        try:
+            os.sched_setaffinity(0, cpus)
+        except OSError as e:
+            logger.warning(f"Çıkarım işçisi {worker_id}: CPU sabitleme başarısız ({sorted(cpus)}): {e}")
+
+    if threads:
+        try:
+            import tensorflow as tf
+            tf.config.threading.set_intra_op_parallelism_threads(threads)
+            tf.config.threading.set_inter_op_parallelism_threads(1)
+        except Exception as e:
+            logger.warning(f"Çıkarım işçisi {worker_id}: TensorFlow thread sayısı ayarlanamadı: {e}")
+
+    from app.utils import embed_single_face, model_manager
+
+    slotlar = []
+    for ad in slot_names:
+        # Bölgeyi ana süreç oluşturup siliyor; spawn ile başlayan işçi ana sürecin kaynak takipçisini paylaşıyor.
+        slotlar.append(shared_memory.SharedMemory(name=ad))
+
+    hazir = model_manager.load_all()
+    result_queue.put(('ready', worker_id, hazir, model_manager.status()))
+
+    while True:
+        gorev = task_queue.get()
+        if gorev is None:
+            break
+        task_id, slot, shape = gorev
+        try:
+            # İşçide ölçülen aşamalar (detect_faces, facenet, ...) bu sürecin metriklerinde kalmasın,
+            # sonuçla birlikte ana sürece gidiyor.
+            with collect_stages() as asamalar:
+                frame = np.ndarray(shape, dtype=np.uint8, buffer=slotlar[slot].buf)
+                embedding, hata = embed_single_face(frame)
+                del frame  # bölgeye referans kalmasın, ana süreç slotu tekrar kullanacak
+            result_queue.put(('result', worker_id, task_id,
+                              embedding.astype(np.float32) if embedding is not None else None, hata, asamalar))
+        except Exception as e:
+            logger.error(f"Çıkarım işçisi {worker_id}: görev işlenirken hata: {e}")
+            result_queue.put(('result', worker_id, task_id, None, 'embedding', []))
+
+    for shm in slotlar:
+        shm.close()
+
+
+class InferencePool:
+    """
+    Simge: Yüz algılama + kırpma + ön işleme + FaceNet hattını ayrı süreçlerde çalıştıran havuz.
+    Waitress thread'leri tek yorumlayıcıyı ve tek TF oturumunu paylaştığı için çekirdek sayısıyla
+    ölçeklenmiyordu; burada her işçi süreci kendi MediaPipe dedektörünü ve FaceNet modelini tutuyor.
+    Çözülmüş kareler pickle edilmeden paylaşımlı bellek (shared_memory) slotlarına kopyalanıyor,
+    işçiye sadece (görev no, slot, boyut) gidiyor; geri sadece embedding vektörü dönüyor.
+    Slotlar bittiğinde submit en fazla INFERENCE_TIMEOUT_S bekliyor (geri basınç), sonra 'busy'.
+    Görevler en az bekleyen işi olan işçiye veriliyor; ölen işçinin görevleri hata ile bitiriliyor
+    ve işçi yeniden başlatılıyor.
+    """
+
+    def __init__(self, workers=2, slots_per_worker=2, slot_bytes=8 * 1024 * 1024, cpu_sets=None,
+                 threads_per_worker=1, timeout_s=10.0, name='inference-pool'):
+        self.workers = max(1, workers)
+        self.slot_bytes = slot_bytes
+        self.cpu_sets = cpu_sets or [None] * self.workers
+        self.threads_per_worker = threads_per_worker
+        self.timeout_s = timeout_s
+        self.name = name
+        self.slot_count = self.workers * max(1, slots_per_worker)
+        self._ctx = multiprocessing.get_context('spawn')
+        self._lock = threading.Lock()
+        self._started = False
+        self._closing = False
+        self._slots = []
+        self._free_slots = queue.Queue()
+        self._task_ids = itertools.count()
+        self._pending = {}  # görev no -> (future, slot, işçi no)
+        self._procs = [None] * self.workers
+        self._task_queues = [None] * self.workers
+        self._ready = [False] * self.workers
+        self._worker_status = [None] * self.workers
+        self._outstanding = [0] * self.workers
+        self._done = [0] * self.workers
+        self._restarts = 0
+        self._busy = 0
+        self._result_queue = None
+        self._dispatcher = None
+
+    def _start_worker(self, i):
+        self._task_queues[i] = self._ctx.Queue()
+        self._ready[i] = False
+        proc = self._ctx.Process(
+            target=_worker_main,
+            args=(i, [shm.name for shm in self._slots], self._task_queues[i], self._result_queue,
+                  self.cpu_sets[i], self.threads_per_worker),
+            name=f"{self.name}-{i}", daemon=True)
+        proc.start()
+        self._procs[i] = proc
+
+    def start(self):
+        """Simge: Paylaşımlı bellek slotlarını ve işçi süreçlerini başlatır (birden fazla çağrıda bir kere)."""
+        with self._lock:
+            if self._started:
+                return
+            self._result_queue = self._ctx.Queue()
+            for i in range(self.slot_count):
+                self._slots.append(shared_memory.SharedMemory(create=True, size=self.slot_bytes))
+                self._free_slots.put(i)
+            for i in range(self.workers):
+                self._start_worker(i)
+            self._dispatcher = threading.Thread(target=self._dispatch, name=f"{self.name}-dispatcher", daemon=True)
+            self._dispatcher.start()
+            self._started = True
+        atexit.register(self.shutdown)
+        logger.info(f"InferencePool '{self.name}': {self.workers} işçi, {self.slot_count} slot x "
+                    f"{self.slot_bytes // (1024 * 1024)} MB, işçi başına {self.threads_per_worker} thread başlatıldı.")
+
+    def _fit(self, frame):
+        # Slota sığmayan kareyi en-boy oranını koruyarak küçültüyorum.
+        if frame.nbytes <= self.slot_bytes:
+            return frame
+        olcek = (self.slot_bytes / frame.nbytes) ** 0.5
+        h, w = frame.shape[:2]
+        return cv2.resize(frame, (max(1, int(w * olcek)), max(1, int(h * olcek))), interpolation=cv2.INTER_AREA)
+
+    def submit(self, frame):
+        """
+        Simge: BGR kareyi işçilere gönderir; sonucu (embedding, hata_kodu) olarak veren Future döndürür.
+        Slot boşalmazsa Future hemen (None, 'busy') ile tamamlanıyor.
+        """
+        self.start()
+        future = Future()
+        try:
+            slot = self._free_slots.get(timeout=self.timeout_s)
+        except queue.Empty:
+            with self._lock:
+                self._busy += 1
+            future.set_result((None, 'busy'))
+            return future
+        frame = np.ascontiguousarray(self._fit(frame), dtype=np.uint8)
+        np.ndarray(frame.shape, dtype=np.uint8, buffer=self._slots[slot].buf)[...] = frame
+        task_id = next(self._task_ids)
+        with self._lock:
+            isci = min(range(self.workers), key=lambda i: (self._outstanding[i], not self._ready[i]))
+            self._outstanding[isci] += 1
+            self._pending[task_id] = (future, slot, isci)
+            self._task_queues[isci].put((task_id, slot, frame.shape))
+        return future
+
+    def embed(self, frame):
+        """Simge: Karedeki tek yüzün embedding'i: (embedding, None) ya da (None, hata_kodu)."""
+        try:
+            return self._result(self.submit(frame))
+        except Exception as e:
+            logger.error(f"InferencePool '{self.name}': sonuç alınamadı: {e}")
+            return None, 'embedding'
+
+    def embed_many(self, frames):
+        """Simge: Kareleri aynı anda işçilere dağıtır; sonuçlar giriş sırasıyla (embedding, hata_kodu)."""
+        futures = [self.submit(frame) for frame in frames]
+        sonuclar = []
+        for future in futures:
+            try:
+                sonuclar.append(self._result(future))
+            except Exception as e:
+                logger.error(f"InferencePool '{self.name}': sonuç alınamadı: {e}")
+                sonuclar.append((None, 'embedding'))
+        return sonuclar
+
+    def _result(self, future):
+        # Sonucu bekleyen (istek) thread'inde işçinin ölçtüğü aşamaları metriklere ekliyorum,
+        # böylece Server-Timing başlığında da görünüyorlar.
+        sonuc = future.result(timeout=self.timeout_s * 2)
+        record_stages(getattr(future, 'stages', ()))
+        return sonuc
+
+    def _finish(self, task_id, sonuc, asamalar=()):
+        with self._lock:
+            kayit = self._pending.pop(task_id, None)
+            if kayit is None:
+                return
+            future, slot, isci = kayit
+            self._outstanding[isci] -= 1
+            self._done[isci] += 1
+        self._free_slots.put(slot)
+        if not future.done():
+            future.stages = asamalar
+            future.set_result(sonuc)
+
+    def _check_workers(self):
+        for i, proc in enumerate(self._procs):
+            if self._closing or proc is None or proc.is_alive():
+                continue
+            logger.error(f"InferencePool '{self.name}': işçi {i} beklenmedik şekilde kapandı (çıkış kodu {proc.exitcode}), yeniden başlatılıyor.")
+            with self._lock:
+                kayip = [task_id for task_id, (_, _, isci) in self._pending.items() if isci == i]
+                self._restarts += 1
+            for task_id in kayip:
+                self._finish(task_id, (None, 'embedding'))
+            self._start_worker(i)
+
+    def _dispatch(self):
+        son_kontrol = time.monotonic()
+        while not self._closing:
+            if time.monotonic() - son_kontrol >= 1.0:
+                self._check_workers()
+                son_kontrol = time.monotonic()
+            try:
+                mesaj = self._result_queue.get(timeout=1.0)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                return
+            if mesaj[0] == 'ready':
+                _, isci, hazir, durum = mesaj
+                self._ready[isci] = hazir
+                self._worker_status[isci] = durum
+                logger.info(f"InferencePool '{self.name}': işçi {isci} {'hazır' if hazir else 'modelleri yükleyemedi'}.")
+            elif mesaj[0] == 'result':
+                _, _, task_id, embedding, hata, asamalar = mesaj
+                self._finish(task_id, (embedding, hata), asamalar)
+
+    def is_ready(self):
+        return self._started and all(self._ready)
+
+    def status(self):
+        """Simge: /readyz için işçilerin model durumu (tek süreçteki model_manager.status() karşılığı)."""
+        return {
+            'ready': self.is_ready(),
+            'workers': [{'ready': self._ready[i], 'alive': self._procs[i] is not None and self._procs[i].is_alive(),
+                         'models': self._worker_status[i]} for i in range(self.workers)],
+        }
+
+    def stats(self):
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'ready_workers': sum(self._ready),
+                'threads_per_worker': self.threads_per_worker,
+                'cpu_sets': [sorted(k) if k else None for k in self.cpu_sets],
+                'slots': self.slot_count,
+                'free_slots': self._free_slots.qsize(),
+                'in_flight': len(self._pending),
+                'outstanding': list(self._outstanding),
+                'completed': list(self._done),
+                'busy_rejections': self._busy,
+                'restarts': self._restarts,
+            }
+
+    def shutdown(self, timeout=5.0):
+        with self._lock:
+            if not self._started or self._closing:
+                return
+            self._closing = True
+        for task_queue in self._task_queues:
+            task_queue.put(None)
+        for proc in self._procs:
+            proc.join(timeout)
+            if proc.is_alive():
+                proc.terminate()
+        for shm in self._slots:
+            shm.close()
+            shm.unlink()
+        logger.info(f"InferencePool '{self.name}' durduruldu.")
+
+
+def create_inference_pool(config):
+    """Simge: INFERENCE_MODE='process' ise çıkarım havuzunu oluşturur (süreçler start() ile başlar), değilse None."""
+    if config.INFERENCE_MODE != 'process':
+        if config.INFERENCE_MODE != 'thread':
+            logger.warning(f"Bilinmeyen INFERENCE_MODE '{config.INFERENCE_MODE}', 'thread' kullanılacak.")
+        return None
+    workers = config.INFERENCE_POOL_WORKERS or max(1, (os.cpu_count() or 2) // max(1, config.INFERENCE_POOL_THREADS_PER_WORKER))
+    return InferencePool(
+        workers=workers,
+        slots_per_worker=config.INFERENCE_POOL_SLOTS_PER_WORKER,
+        slot_bytes=config.INFERENCE_POOL_SLOT_MB * 1024 * 1024,
+        cpu_sets=parse_cpu_sets(config.INFERENCE_POOL_CPU_PINNING, workers),
+        threads_per_worker=config.INFERENCE_POOL_THREADS_PER_WORKER,
+        timeout_s=config.INFERENCE_TIMEOUT_S,
+    )
+
+
+inference_pool = create_inference_pool(Config)
@@ -0,0 +1,64 @@
+import numpy as np
+
+from config import Config
+from app.gallery import centroid_of, embeddings_to_matrix
+
+
+def _similarity_to_cosine(similarity):
+    # calculate_similarity'nin 0-100 ölçeğinden kosinüse: cos = 2 * (s / 100) - 1
+    return 2.0 * (similarity / 100.0) - 1.0
+
+
+def deduplicate_poses(matrix, max_similarity=None):
+    """
+    Simge: Birbirine max_similarity'den (0-100 ölçeği) daha benzer pozlardan sadece ilkini tutar.
+    Kayıt sırasında art arda çekilen karelerin çoğu neredeyse aynı, bunları saklamak
+    sadece eşleştirme işini artırıyor. matrix satırları normalize olmalı.
+    """
+    if max_similarity is None:
+        max_similarity = Config.POSE_DEDUP_SIMILARITY
+    if matrix.shape[0] < 2 or max_similarity >= 100:
+        return matrix
+    esik = _similarity_to_cosine(max_similarity)
+    benzerlikler = matrix @ matrix.T
+    tutulan = []
+    for i in range(matrix.shape[0]):
+        if not tutulan or benzerlikler[i, tutulan].max() <= esik:
+            tutulan.append(i)
+    return matrix[tutulan]
+
+
+def select_prototypes(matrix, n_prototypes=None, merkez=None):
+    """
+    Simge: En uzak nokta seçimiyle birbirinden farklı n_prototypes poz seçer.
+    İlk prototip merkeze en yakın poz, sonrakiler her adımda seçilmişlere en az
+    benzeyen poz. Böylece az sayıda satırla farklı açılar/ifadeler temsil ediliyor.
+    """
+    if n_prototypes is None:
+        n_prototypes = Config.PROTOTYPES_PER_USER
+    if n_prototypes <= 0 or matrix.shape[0] <= n_prototypes:
+        return matrix
+    if merkez is None:
+        merkez = centroid_of(matrix)
+    secilen = [int(np.argmax(matrix @ merkez))]
+    en_yakin = matrix @ matrix[secilen[0]]  # her pozun seçilmişlere en yüksek benzerliği
+    for _ in range(n_prototypes - 1):
+        en_yakin[secilen] = np.inf
+        aday = int(np.argmin(en_yakin))
+        secilen.append(aday)
+        en_yakin = np.maximum(en_yakin, matrix @ matrix[aday])
+    return matrix[sorted(secilen)]
+
+
+def build_face_profile(face_embeddings, dim=None):
+    """
+    Simge: Kayıt sonrası işleme. Pozları normalize edip neredeyse aynı olanları atar,
+    kalan pozlardan merkez vektörünü ve prototipleri hesaplar.
+    (pozlar, merkez, prototipler) döndürür; geçerli poz yoksa (None, None, None).
+    """
+    matris = embeddings_to_matrix(face_embeddings, dim)
+    if matris.shape[0] == 0:
+        return None, None, None
+    pozlar = deduplicate_poses(matris)
+    merkez = centroid_of(pozlar)
+    return pozlar, merkez, select_prototypes(pozlar, merkez=merkez)
@@ -0,0 +1,136 @@
+import numpy as np
+
+
+# Skorlama sırasında geçici float dizileri küçük tutmak için kodları parça parça işliyorum.
+_CHUNK_ROWS = 65536
+
+
+class ScalarQuantizer:
+    """
+    Simge: Vektör başına ölçekli int8 nicemleme.
+    Her satır max|x|/127 ölçeğiyle int8'e yuvarlanıyor; d boyutlu bir poz
+    4d bayt yerine d + 4 bayt tutuyor (512 boyutta 2048 yerine 516). Benzerlik kodlar üzerinden
+    (kod · sorgu) * ölçek olarak hesaplanıyor.
+    """
+    name = 'int8'
+
+    def train(self, matrix):
+        return self  # eğitim gerektirmiyor
+
+    def encode(self, matrix):
+        matrix = np.asarray(matrix, dtype=np.float32)
+        scales = np.abs(matrix).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        codes = np.clip(np.rint(matrix / scales[:, None]), -127, 127).astype(np.int8)
+        return codes, scales.astype(np.float32)
+
+    def decode(self, codes, scales):
+        return codes.astype(np.float32) * scales[:, None]
+
+    def scores(self, codes, scales, query):
+        sonuc = np.empty(codes.shape[0], dtype=np.float32)
+        for bas in range(0, codes.shape[0], _CHUNK_ROWS):
+            parca = codes[bas:bas + _CHUNK_ROWS]
+            sonuc[bas:bas + parca.shape[0]] = (parca.astype(np.float32) @ query) * scales[bas:bas + parca.shape[0]]
+        return sonuc
+
+    @staticmethod
+    def bytes_per_vector(dim):
+        return dim + 4
+
+
+def _kmeans(matrix, n_clusters, n_iter=15, seed=0):
+    """Öklid k-means; PQ kod kitaplarını alt uzaylarda eğitmek için."""
+    rng = np.random.default_rng(seed)
+    n_clusters = min(n_clusters, matrix.shape[0])
+    centroids = matrix[rng.choice(matrix.shape[0], n_clusters, replace=False)].copy()
+    for _ in range(n_iter):
+        atamalar = _nearest(matrix, centroids)
+        toplamlar = np.zeros_like(centroids)
+        np.add.at(toplamlar, atamalar, matrix)
+        sayilar = np.bincount(atamalar, minlength=n_clusters)
+        bos = sayilar == 0
+        centroids[~bos] = toplamlar[~bos] / sayilar[~bos, None]
+        if np.any(bos):
+            centroids[bos] = matrix[rng.choice(matrix.shape[0], int(bos.sum()), replace=False)]
+    return centroids
+
+
+def _nearest(matrix, centroids):
+    # ||x - c||^2 = ||x||^2 - 2 x.c + ||c||^2, ||x||^2 argmin'i etkilemiyor.
+    c_norm = (centroids ** 2).sum(axis=1)
+    atamalar = np.empty(matrix.shape[0], dtype=np.int64)
+    for bas in range(0, matrix.shape[0], _CHUNK_ROWS):
+        parca = matrix[bas:bas + _CHUNK_ROWS]
+        atamalar[bas:bas + parca.shape[0]] = np.argmin(c_norm - 2 * parca @ centroids.T, axis=1)
+    return atamalar
+
+
+class ProductQuantizer:
+    """
+    Simge: Ürün nicemleme (PQ). Embedding boyutu n_subspaces alt uzaya bölünüyor, her alt
+    uzayda codebook_size merkezli bir kod kitabı eğitiliyor ve her poz alt uzay
+    başına 1 baytlık merkez numarasıyla tutuluyor (ör. 16 alt uzay = 16 bayt).
+    Sorguda her alt uzay için sorgu·merkez tablosu bir kere hesaplanıp skorlar
+    tablo toplamıyla (ADC) bulunuyor.
+    """
+    name = 'pq'
+
+    def __init__(self, n_subspaces=16, codebook_size=256, n_iter=15, sample_size=50000):
+        if codebook_size > 256:
+            raise ValueError("PQ kod kitabı en fazla 256 merkezli olabilir (uint8 kod).")
+        self.n_subspaces = n_subspaces
+        self.codebook_size = codebook_size
+        self.n_iter = n_iter
+        self.sample_size = sample_size
+        self.codebooks = None
+
+    def train(self, matrix, seed=0):
+        matrix = np.asarray(matrix, dtype=np.float32)
+        if matrix.shape[1] % self.n_subspaces != 0:
+            raise ValueError(f"Boyut ({matrix.shape[1]}) alt uzay sayısına ({self.n_subspaces}) bölünemiyor.")
+        rng = np.random.default_rng(seed)
+        if matrix.shape[0] > self.sample_size:
+            matrix = matrix[rng.choice(matrix.shape[0], self.sample_size, replace=False)]
+        alt_boyut = matrix.shape[1] // self.n_subspaces
+        self.codebooks = np.stack([
+            _pad_codebook(_kmeans(matrix[:, m * alt_boyut:(m + 1) * alt_boyut], self.codebook_size, self.n_iter, seed + m), self.codebook_size)
+            for m in range(self.n_subspaces)
+        ]).astype(np.float32)
+        return self
+
+    @property
+    def trained(self):
+        return self.codebooks is not None
+
+    def encode(self, matrix):
+        matrix = np.asarray(matrix, dtype=np.float32)
+        alt_boyut = self.codebooks.shape[2]
+        codes = np.empty((matrix.shape[0], self.n_subspaces), dtype=np.uint8)
+        for m in range(self.n_subspaces):
+            codes[:, m] = _nearest(matrix[:, m * alt_boyut:(m + 1) * alt_boyut], self.codebooks[m])
+        return codes, None
+
+    def decode(self, codes, scales=None):
+        return np.concatenate([self.codebooks[m][codes[:, m]] for m in range(self.n_subspaces)], axis=1)
+
+    def scores(self, codes, scales, query):
+        alt_boyut = self.codebooks.shape[2]
+        # (n_subspaces, codebook_size) iç çarpım tablosu
+        tablo = np.einsum('mkd,md->mk', self.codebooks, query.reshape(self.n_subspaces, alt_boyut))
+        sonuc = np.empty(codes.shape[0], dtype=np.float32)
+        alt_uzaylar = np.arange(self.n_subspaces)
+        for bas in range(0, codes.shape[0], _CHUNK_ROWS):
+            parca = codes[bas:bas + _CHUNK_ROWS]
+            sonuc[bas:bas + parca.shape[0]] = tablo[alt_uzaylar, parca].sum(axis=1)
+        return sonuc
+
+    def bytes_per_vector(self, dim):
+        return self.n_subspaces
+
+
+def _pad_codebook(centroids, size):
+    # Eğitim verisi codebook_size'dan azsa tablo boyutu sabit kalsın diye son merkezi tekrarlıyorum.
+    if centroids.shape[0] >= size:
+        return centroids
+    return np.concatenate([centroids, np.repeat(centroids[-1:], size - centroids.shape[0], axis=0)])
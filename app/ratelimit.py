@@ -0,0 +1,269 @@
+import datetime
+import math
+import re
+import threading
+import time
+
+from loguru import logger
+from pymongo import ReturnDocument
+
+
+class MemoryRateLimitStore:
+    """
+    Simge: Süreç içi sayaç deposu (varsayılan). Sayaçlar kayan pencere sayacı
+    (sliding window counter) yöntemiyle tutuluyor: her anahtar için içinde bulunulan ve
+    bir önceki sabit pencerenin sayısı saklanıyor, tahmini sayı
+    şimdiki + önceki * (önceki pencereden kalan oran). Anahtar başına iki sayı tuttuğu
+    için her isteğin zamanını saklayan kayan log'a göre bellek sabit kalıyor.
+    Birden fazla süreç (ör. birkaç Waitress örneği) sayaçları paylaşacaksa MongoRateLimitStore kullanılmalı.
+    """
+    name = 'memory'
+
+    def __init__(self, prune_every=1000):
+        self._lock = threading.Lock()
+        self._counters = {}  # anahtar -> [pencere_no, şimdiki, önceki]
+        self._locks = {}  # anahtar -> (bitiş zamanı, sebep)
+        self._prune_every = prune_every
+        self._ops = 0
+
+    @staticmethod
+    def _estimate(kayit, pencere_no, oran):
+        if kayit is None:
+            return 0.0
+        kayit_no, simdiki, onceki = kayit
+        if kayit_no == pencere_no:
+            return simdiki + onceki * (1 - oran)
+        if kayit_no == pencere_no - 1:
+            return simdiki * (1 - oran)
+        return 0.0
+
+    def _prune(self, now, window_s):
+        # Eski pencerede kalmış sayaçları ve süresi dolmuş kilitleri temizliyorum.
+        pencere_no = int(now // window_s)
+        self._counters = {k: v for k, v in self._counters.items() if v[0] >= pencere_no - 1}
+        self._locks = {k: v for k, v in self._locks.items() if v[0] > now}
+
+    def incr(self, key, window_s, now):
+        pencere_no, oran = int(now // window_s), (now % window_s) / window_s
+        with self._lock:
+            self._ops += 1
+            if self._ops % self._prune_every == 0:
+                self._prune(now, window_s)
+            kayit = self._counters.get(key)
+            if kayit is None or kayit[0] < pencere_no - 1:
+                kayit = [pencere_no, 0, 0]
+            elif kayit[0] == pencere_no - 1:
+                kayit = [pencere_no, 0, kayit[1]]
+            kayit[1] += 1
+            self._counters[key] = kayit
+            return self._estimate(kayit, pencere_no, oran)
+
+    def peek(self, key, window_s, now):
+        with self._lock:
+            return self._estimate(self._counters.get(key), int(now // window_s), (now % window_s) / window_s)
+
+    def reset(self, key):
+        with self._lock:
+            self._counters.pop(key, None)
+
+    def lock(self, key, until, reason):
+        with self._lock:
+            self._locks[key] = (until, reason)
+
+    def locked_until(self, key, now):
+        with self._lock:
+            kilit = self._locks.get(key)
+            return kilit[0] if kilit is not None and kilit[0] > now else None
+
+    def unlock(self, key):
+        with self._lock:
+            return self._locks.pop(key, None) is not None
+
+    def lockouts(self, now):
+        with self._lock:
+            return [{'key': k, 'until': until, 'reason': reason}
+                    for k, (until, reason) in self._locks.items() if until > now]
+
+
+def _utc(ts):
+    # TTL indeksi için epoch saniyesinden UTC datetime
+    return datetime.datetime.utcfromtimestamp(ts)
+
+
+class MongoRateLimitStore:
+    """
+    Simge: Sayaçları ve kilitleri MongoDB'de tutan paylaşımlı depo; birden fazla süreç
+    aynı limitleri uyguluyor. Pencere sayaçları atomik $inc ile güncelleniyor, eski
+    dokümanlar expires_at üzerindeki TTL indeksiyle siliniyor.
+    """
+    name = 'mongo'
+
+    def __init__(self, collection):
+        self.collection = collection
+        try:
+            self.collection.create_index("expires_at", expireAfterSeconds=0, name="expires_at_ttl")
+            self.collection.create_index("lock_until", name="lock_until")
+        except Exception as e:
+            logger.error(f"Oran sınırlayıcı indeksleri oluşturulurken hata: {e}")
+
+    @staticmethod
+    def _expires(pencere_no, window_s):
+        # Sayaç bir sonraki pencerede "önceki" olarak okunacağı için iki pencere saklanıyor.
+        return _utc((pencere_no + 2) * window_s)
+
+    def _count(self, key, pencere_no):
+        kayit = self.collection.find_one({"_id": f"{key}:{pencere_no}"}, {"count": 1})
+        return kayit["count"] if kayit else 0
+
+    def incr(self, key, window_s, now):
+        pencere_no, oran = int(now // window_s), (now % window_s) / window_s
+        kayit = self.collection.find_one_and_update(
+            {"_id": f"{key}:{pencere_no}"},
+            {"$inc": {"count": 1}, "$setOnInsert": {"expires_at": self._expires(pencere_no, window_s)}},
+            upsert=True, return_document=ReturnDocument.AFTER, projection={"count": 1})
+        return kayit["count"] + self._count(key, pencere_no - 1) * (1 - oran)
+
+    def peek(self, key, window_s, now):
+        pencere_no, oran = int(now // window_s), (now % window_s) / window_s
+        return self._count(key, pencere_no) + self._count(key, pencere_no - 1) * (1 - oran)
+
+    def reset(self, key):
+        self.collection.delete_many({"_id": {"$regex": f"^{re.escape(key)}:\\d+$"}})
+
+    def lock(self, key, until, reason):
+        self.collection.update_one(
+            {"_id": f"lock:{key}"},
+            {"$set": {"key": key, "lock_until": until, "reason": reason, "expires_at": _utc(until)}},
+            upsert=True)
+
+    def locked_until(self, key, now):
+        kayit = self.collection.find_one({"_id": f"lock:{key}"}, {"lock_until": 1})
+        return kayit["lock_until"] if kayit and kayit["lock_until"] > now else None
+
+    def unlock(self, key):
+        return self.collection.delete_one({"_id": f"lock:{key}"}).deleted_count == 1
+
+    def lockouts(self, now):
+        return [{'key': k['key'], 'until': k['lock_until'], 'reason': k['reason']}
+                for k in self.collection.find({"lock_until": {"$gt": now}}, {"key": 1, "lock_until": 1, "reason": 1})]
+
+
+class LoginRateLimiter:
+    """
+    Simge: Giriş uç noktalarının önündeki oran sınırlayıcı. İki tür sayaç var:
+    - IP başına istek sayısı: pencere içinde ip_requests'i aşan istekler görüntü çözme ve
+      çıkarım yapılmadan 429 ile reddediliyor.
+    - IP ve kullanıcı adı başına hatalı giriş sayısı: ip_failures / username_failures aşılırsa
+      IP ya da kullanıcı adı lockout_s saniye kilitleniyor. Başarılı girişte kullanıcı adının
+      hatalı giriş sayacı sıfırlanıyor.
+    Zaman kaynağı (clock) test ve benchmark'larda değiştirilebilsin diye parametre.
+    """
+
+    def __init__(self, store, window_s=60, ip_requests=30, ip_failures=20, username_failures=5,
+                 lockout_s=300, clock=time.time):
+        self.store = store
+        self.window_s = window_s
+        self.ip_requests = ip_requests
+        self.ip_failures = ip_failures
+        self.username_failures = username_failures
+        self.lockout_s = lockout_s
+        self.clock = clock
+        self._stats_lock = threading.Lock()
+        self.allowed = 0
+        self.rejected = 0
+        self.lockouts_started = 0
+
+    def _reject(self, retry_after):
+        with self._stats_lock:
+            self.rejected += 1
+        return max(1, math.ceil(retry_after))
+
+    def check(self, ip_address, username=None):
+        """
+        Simge: İsteğin işlenip işlenmeyeceğine karar verir. İzin verilirse None,
+        reddedilirse kaç saniye sonra tekrar denenebileceğini döndürür.
+        """
+        now = self.clock()
+        try:
+            for key in (f"ip:{ip_address}", f"user:{username}" if username else None):
+                if key is None:
+                    continue
+                until = self.store.locked_until(key, now)
+                if until is not None:
+                    return self._reject(until - now)
+            if self.ip_requests > 0 and self.store.incr(f"req:{ip_address}", self.window_s, now) > self.ip_requests:
+                # Pencerenin tamamı beklenmeden tahmini sayı limitin altına inebiliyor,
+                # yine de istemciye güvenli tarafta kalan pencere süresini bildiriyorum.
+                return self._reject(self.window_s - now % self.window_s)
+        except Exception as e:
+            # Depo (ör. MongoDB) erişilemezse girişleri kilitlemek yerine izin veriyorum.
+            logger.error(f"Oran sınırlayıcı kontrolünde hata: {e}")
+        with self._stats_lock:
+            self.allowed += 1
+        return None
+
+    def record_failure(self, ip_address, username=None):
+        now = self.clock()
+        try:
+            hedefler = [(f"ip:{ip_address}", self.ip_failures)]
+            if username and username != "UNKNOWN":
+                hedefler.append((f"user:{username}", self.username_failures))
+            for key, limit in hedefler:
+                if limit > 0 and self.store.incr(f"fail:{key}", self.window_s, now) >= limit:
+                    if self.store.locked_until(key, now) is None:
+                        self.store.lock(key, now + self.lockout_s, f"{self.window_s} sn içinde {limit} hatalı giriş")
+                        with self._stats_lock:
+                            self.lockouts_started += 1
+                        logger.warning(f"Oran sınırlayıcı: '{key}' {self.lockout_s} sn kilitlendi.")
+        except Exception as e:
+            logger.error(f"Oran sınırlayıcı hatalı giriş kaydında hata: {e}")
+
+    def record_success(self, ip_address, username):
+        try:
+            self.store.reset(f"fail:user:{username}")
+        except Exception as e:
+            logger.error(f"Oran sınırlayıcı sayacı sıfırlanırken hata: {e}")
+
+    def lockouts(self):
+        now = self.clock()
+        return sorted(({**k, 'retry_after': max(1, math.ceil(k['until'] - now))} for k in self.store.lockouts(now)),
+                      key=lambda k: k['until'], reverse=True)
+
+    def unlock(self, key):
+        self.store.reset(f"fail:{key}")
+        return self.store.unlock(key)
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                'store': self.store.name,
+                'window_s': self.window_s,
+                'limits': {'ip_requests': self.ip_requests, 'ip_failures': self.ip_failures,
+                           'username_failures': self.username_failures, 'lockout_s': self.lockout_s},
+                'allowed': self.allowed,
+                'rejected': self.rejected,
+                'lockouts_started': self.lockouts_started,
+            }
+
+
+def create_login_limiter(config, database=None):
+    """
+    Simge: Config'e göre giriş oran sınırlayıcısını oluşturur. Kapalıysa None döner.
+    RATE_LIMIT_STORE='mongo' ama bağlantı yoksa süreç içi depoya düşüyorum.
+    """
+    if not config.RATE_LIMIT_ENABLED:
+        return None
+    if config.RATE_LIMIT_STORE == 'mongo' and database is not None:
+        store = MongoRateLimitStore(database.rate_limits)
+    else:
+        if config.RATE_LIMIT_STORE != 'memory':
+            logger.warning(f"Oran sınırlayıcı deposu '{config.RATE_LIMIT_STORE}' kullanılamıyor, süreç içi depo kullanılacak.")
+        store = MemoryRateLimitStore()
+    return LoginRateLimiter(
+        store,
+        window_s=config.RATE_LIMIT_WINDOW_S,
+        ip_requests=config.RATE_LIMIT_IP_REQUESTS,
+        ip_failures=config.RATE_LIMIT_IP_FAILURES,
+        username_failures=config.RATE_LIMIT_USERNAME_FAILURES,
+        lockout_s=config.RATE_LIMIT_LOCKOUT_S,
+    )
@@ -1,14 +1,28 @@
-from flask import Blueprint, render_template, request, jsonify, Response, redirect, url_for
-from app.models import User, FailedLogin, generate_token, decode_token
-from app.utils import detect_faces, get_face_embedding, calculate_similarity, get_face_roi, draw_annotations
+from flask import Blueprint, render_template, request, jsonify, Response, redirect, url_for, g, stream_with_context
+from app.models import User, FailedLogin, generate_token, decode_token, db
+from app.utils import detect_faces, embed_single_face, get_face_embeddings_batch, single_face_roi, draw_annotations, embedding_batcher, model_manager, release_face_detector, TRACKING_CONFIDENCE
+from app.gallery import gallery_index
+from app.pca import load_projection
+from app.cache import principal_cache, user_embedding_cache
+from app.ratelimit import create_login_limiter
+from app.uploads import decode_image, request_field, request_image_bytes, request_image_list
+from app.metrics import flatten_gauges, metrics, timed
+from app.passwords import PasswordHasherBusy, password_hasher
+from app.procpool import inference_pool
+from app.stream import FrameBroadcaster, StreamProcessor, open_video_source
+from app.tracking import TemplateTracker
 from config import Config
+from contextlib import closing
 from functools import wraps
+from bson.objectid import ObjectId
+from bson.errors import InvalidId
 from loguru import logger
-import cv2
 import numpy as np
-import base64
+import datetime
+import hmac
+import pymongo
+import json
 import os
-import time
 
 main_bp = Blueprint('main', __name__)
 auth_bp = Blueprint('auth', __name__)
@@ -16,74 +30,102 @@ admin_bp = Blueprint('admin', __name__)
 
 user_model = User()
 failed_login_model = FailedLogin()
+login_limiter = create_login_limiter(Config, db)
 
 
+def _resolve_principal():
+    token = None
+    # Token'ı Authorization başlığından 'Bearer <token>' formatında aldım.
+    parcalar = request.headers.get('Authorization', '').split(" ")
+    if len(parcalar) == 2:
+        token = parcalar[1]
+
+    if not token:
+        logger.warning("Token eksik! Yetkisiz API erişim denemesi.")
+        return None, ('Token eksik!', 401)
+
+    try:
+        current_user_id = decode_token(token)
+        if not current_user_id:
+            logger.warning("Geçersiz veya süresi dolmuş token ile API erişim denemesi.")
+            return None, ('Token geçersiz veya süresi dolmuş!', 401)
+
+        current_user = user_model.get_principal(current_user_id)
+        if not current_user:
+            logger.warning(f"Token'daki kullanıcı ID ({current_user_id}) ile kullanıcı bulunamadı.")
+            return None, ('Kullanıcı bulunamadı!', 401)
+    except Exception as e:
+        logger.error(f"Token doğrulama hatası: {e}")
+        return None, ('Yetkilendirme hatası!', 401)
+    return current_user, None
+
+def current_principal():
+    """
+    Simge: İsteğin kimliğini (_id, username, role) döndürür. Token istek başına bir kez
+    çözülüp sonuç flask.g'de tutuluyor, aynı istekte tekrar çağrılırsa MongoDB'ye gidilmiyor.
+    (kimlik, None) ya da (None, (mesaj, durum_kodu)) döner.
+    """
+    if 'auth' not in g:
+        g.auth = _resolve_principal()
+    return g.auth
+
 # Her API isteğinde geçerli bir JWT token bekliyor
 def token_required(f):
     @wraps(f)
     def decorated(*args, **kwargs):
-        token = None
-        # Token'ı Authorization başlığından 'Bearer <token>' formatında aldım.
-        if 'Authorization' in request.headers:
-            token = request.headers['Authorization'].split(" ")[1]
-        
-        if not token:
-            logger.warning("Token eksik! Yetkisiz API erişim denemesi.")
-            return jsonify({'message': 'Token eksik!'}), 401
-        
-        try:
-            current_user_id = decode_token(token)
-            if not current_user_id:
-                logger.warning("Geçersiz veya süresi dolmuş token ile API erişim denemesi.")
-                return jsonify({'message': 'Token geçersiz veya süresi dolmuş!'}), 401
-            
-            current_user = user_model.get_user_by_id(current_user_id)
-            if not current_user:
-                logger.warning(f"Token'daki kullanıcı ID ({current_user_id}) ile kullanıcı bulunamadı.")
-                return jsonify({'message': 'Kullanıcı bulunamadı!'}), 401
-        except Exception as e:
-            logger.error(f"Token doğrulama hatası: {e}")
-            return jsonify({'message': 'Yetkilendirme hatası!'}), 401
-        
+        current_user, hata = current_principal()
+        if hata:
+            return jsonify({'message': hata[0]}), hata[1]
         return f(current_user, *args, **kwargs)
     return decorated
 
 # sadece admin yetkisi olan kullanıcıların erişebileceği API'ler için.
-#
+# Token kontrolünü de kendisi yapıyor, token_required ile üst üste kullanılmamalı.
 def admin_required(f):
     @wraps(f)
     def decorated(*args, **kwargs):
-        token = None
-        if 'Authorization' in request.headers:
-            token = request.headers['Authorization'].split(" ")[1]
-        
-        if not token:
-            logger.warning("Admin yetkisi için token eksik!")
-            return jsonify({'message': 'Token eksik!'}), 401
-        
-        try:
-            current_user_id = decode_token(token)
-            if not current_user_id:
-                logger.warning("Geçersiz veya süresi dolmuş token ile admin erişim denemesi.")
-                return jsonify({'message': 'Token geçersiz veya süresi dolmuş!'}), 401
-            
-            current_user = user_model.get_user_by_id(current_user_id)
-            if not current_user:
-                logger.warning(f"Admin yetkisi kontrolü için kullanıcı ID ({current_user_id}) bulunamadı.")
-                return jsonify({'message': 'Kullanıcı bulunamadı!'}), 401
-
-            # Simge: Basit bir admin kontrolü yapmak için
-            if current_user['username'] != Config.ADMIN_USERNAME:
-                logger.warning(f"Yetkisiz admin erişim denemesi: Kullanıcı '{current_user['username']}'.")
-                return jsonify({'message': 'Yönetici yetkisi gerekli!'}), 403
-
-        except Exception as e:
-            logger.error(f"Admin yetki doğrulama hatası: {e}")
-            return jsonify({'message': 'Yetkilendirme hatası!'}), 401
+        current_user, hata = current_principal()
+        if hata:
+            return jsonify({'message': hata[0]}), hata[1]
+
+        # Simge: Basit bir admin kontrolü yapmak için
+        if current_user['role'] != 'admin':
+            logger.warning(f"Yetkisiz admin erişim denemesi: Kullanıcı '{current_user['username']}'.")
+            return jsonify({'message': 'Yönetici yetkisi gerekli!'}), 403
         return f(current_user, *args, **kwargs)
     return decorated
 
 
+# Giriş uç noktalarını oran sınırlayıcının arkasına alıyor. Kontrol, görüntü çözme ve
+# çıkarımdan önce yapılıyor; reddedilen istek MongoDB'ye de yazılmıyor.
+def rate_limited(username_field):
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            if login_limiter is not None:
+                bekle = login_limiter.check(request.remote_addr, request_field(request, username_field))
+                if bekle is not None:
+                    logger.warning(f"Oran sınırı aşıldı, istek reddedildi. IP: {request.remote_addr}")
+                    response = jsonify({'message': 'Çok fazla giriş denemesi. Lütfen daha sonra tekrar deneyin.', 'retry_after': bekle})
+                    response.headers['Retry-After'] = str(bekle)
+                    return response, 429
+            return f(*args, **kwargs)
+        return decorated
+    return decorator
+
+def _login_failed(username, ip_address):
+    # Hatalı girişi hem loga yazıyor hem oran sınırlayıcının sayaçlarına işliyor.
+    # Sadece gerçek eşleşmeme (yanlış parola, eşik altında yüz) için çağrılıyor.
+    with timed('failed_login_write'):
+        failed_login_model.log_attempt(username, ip_address)
+    if login_limiter is not None:
+        login_limiter.record_failure(ip_address, username)
+
+def _login_succeeded(username, ip_address):
+    if login_limiter is not None:
+        login_limiter.record_success(ip_address, username)
+
+
 # --- Ana Sayfa ve Kullanıcı Arayüzü Rotaları ---
 
 @main_bp.route('/')
@@ -111,19 +153,85 @@ def admin_page():
 
 # --- Kimlik Doğrulama API Rotaları ---
 
+# Tek yüz hattının hata kodlarına (app.utils.single_face_roi / embed_single_face) karşılık gelen mesaj ve durum kodu
+FACE_ERRORS = {
+    'no_face': ('Yüz algılanmadı.', 400),
+    'multiple_faces': ('Birden fazla yüz algılandı. Lütfen sadece bir yüzünüzün ekranda olduğundan emin olun.', 400),
+    'roi': ('Yüz bölgesi işlenirken hata.', 500),
+    'embedding': ('Yüz özellik çıkarımında hata.', 500),
+    'busy': ('Sunucu şu anda yoğun, lütfen biraz sonra tekrar deneyin.', 503),
+}
+
+
+def embed_frame(frame):
+    """
+    Simge: Karedeki tek yüzün embedding'ini çıkarır: (embedding, None) ya da (None, hata_kodu).
+    INFERENCE_MODE='process' ise iş süreç havuzundaki işçilerde, değilse bu süreçte yapılıyor.
+    """
+    if inference_pool is not None:
+        with timed('inference_pool'):
+            return inference_pool.embed(frame)
+    return embed_single_face(frame)
+
+
+# Yüz ile girişte eşik altında kalınca dönen mesaj (asgi.py'deki async uç nokta da kullanıyor)
+FACE_NO_MATCH_MESSAGE = f'Yüz eşleşmesi bulunamadı. Benzerlik eşiği %{Config.DETECTION_CONFIDENCE*100} altında kaldı.'
+
+
+def best_face_match(anlik_yuz_embedding, username_hint, profil):
+    """
+    Simge: Yüz ile girişte eşiği geçen en iyi eşleşme: (kullanıcı, benzerlik yüzdesi) ya da (None, eşik).
+    username_hint varsa sadece o kullanıcının profili (profil, çağıran tarafından okunuyor),
+    yoksa bellekteki galeri aranıyor.
+    """
+    en_iyi_eslesen_kullanici = None
+    en_yuksek_benzerlik = Config.DETECTION_CONFIDENCE * 100
+    if username_hint:
+        if profil is not None:
+            with timed('similarity'):
+                benzerlik_orani = gallery_index.best_similarity(profil['matrix'], anlik_yuz_embedding)
+            if benzerlik_orani > en_yuksek_benzerlik:
+                en_yuksek_benzerlik = benzerlik_orani
+                en_iyi_eslesen_kullanici = profil
+    else:
+        # İpucu yoksa MongoDB'yi taramak yerine bellekteki galeride tek matris çarpımıyla arıyorum.
+        with timed('similarity'):
+            adaylar = gallery_index.search(anlik_yuz_embedding, k=1)
+        for user_id, username, benzerlik_orani in adaylar:
+            if benzerlik_orani > en_yuksek_benzerlik:
+                en_yuksek_benzerlik = benzerlik_orani
+                en_iyi_eslesen_kullanici = {'_id': user_id, 'username': username}
+    return en_iyi_eslesen_kullanici, en_yuksek_benzerlik
+
+
+def face_login_success(kullanici, benzerlik, token):
+    return {
+        'message': 'Giriş başarılı!',
+        'token': token,
+        'username': kullanici['username'],
+        'similarity': round(benzerlik, 2)
+    }
+
+
+def _password_busy_response():
+    # Parola havuzu dolu: istemci kısa süre sonra tekrar denemeli (sunucu hatası değil).
+    response = jsonify({'message': 'Sunucu şu anda yoğun, lütfen biraz sonra tekrar deneyin.'})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
 @auth_bp.route('/register', methods=['POST'])
 @admin_required # Yeni kullanıcı ekleme sadece admin yetkisiyle yapılmalı
 def register(current_user):
     data = request.get_json()
     username = data.get('username')
     password = data.get('password')
-    face_embeddings = data.get('face_embeddings') # 128 boyutlu
+    face_embeddings = data.get('face_embeddings') # poz başına bir FaceNet embedding'i
 
     if not username or not password or not face_embeddings:
         logger.warning("Kullanıcı kaydı için eksik bilgi alındı.")
         return jsonify({'message': 'Kullanıcı adı, parola ve yüz verileri gerekli!'}), 400
 
-    if user_model.get_user_by_username(username):
+    if user_model.username_exists(username):
         logger.warning(f"Kullanıcı adı '{username}' zaten mevcut, kayıt başarısız.")
         return jsonify({'message': 'Bu kullanıcı adı zaten mevcut.'}), 409
 
@@ -131,11 +239,20 @@ def register(current_user):
         logger.error("Geçersiz yüz verisi formatı alındı.")
         return jsonify({'message': 'Geçersiz yüz verisi formatı.'}), 400
 
-   
-    
-    face_embeddings_np = [np.array(e, dtype=np.float32).tolist() for e in face_embeddings]
+    # Embedding'ler listeye geri çevrilmeden float32 matris olarak saklanıyor.
+    try:
+        face_embeddings_np = np.asarray(face_embeddings, dtype=np.float32)
+    except (TypeError, ValueError):
+        face_embeddings_np = None
+    if face_embeddings_np is None or face_embeddings_np.ndim != 2:
+        logger.error("Geçersiz yüz verisi formatı alındı.")
+        return jsonify({'message': 'Geçersiz yüz verisi formatı.'}), 400
 
-    user_id = user_model.create_user(username, password, face_embeddings_np)
+    try:
+        user_id = user_model.create_user(username, password, face_embeddings_np)
+    except PasswordHasherBusy as e:
+        logger.warning(f"Kullanıcı '{username}' kaydı: {e}")
+        return _password_busy_response()
     if user_id:
         logger.info(f"Yeni kullanıcı '{username}' başarıyla kaydedildi.")
         return jsonify({'message': 'Kullanıcı başarıyla kaydedildi!', 'user_id': user_id}), 201
@@ -143,6 +260,7 @@ def register(current_user):
     return jsonify({'message': 'Kullanıcı kaydedilirken bir hata oluştu.'}), 500
 
 @auth_bp.route('/login/password', methods=['POST'])
+@rate_limited('username')
 def login_with_password():
     data = request.get_json()
     username = data.get('username')
@@ -150,182 +268,282 @@ def login_with_password():
     ip_address = request.remote_addr #  Kim nereden giriş yapmaya çalışıyor
 
     if not username or not password:
-        failed_login_model.log_attempt(username, ip_address)
         return jsonify({'message': 'Kullanıcı adı ve parola gerekli!'}), 400
 
-    user = user_model.get_user_by_username(username)
-    if user and user_model.verify_password(user['password'], password):
-        token = generate_token(user['_id'])
-        user_model.update_last_login(user['_id'])
+    with timed('user_fetch'):
+        user = user_model.get_user_by_username(username, 'credentials')
+    try:
+        with timed('password_check'):
+            parola_dogru = bool(user) and user_model.verify_password(user['password'], password)
+    except PasswordHasherBusy as e:
+        # Deneme sayılmıyor: parola sunucu meşgul olduğu için kontrol edilemedi.
+        logger.warning(f"login_with_password: {e} İstek reddedildi. IP: {ip_address}")
+        return _password_busy_response()
+    if parola_dogru:
+        user_model.rehash_password_if_needed(user['_id'], user['password'], password)
+        with timed('token'):
+            token = generate_token(user['_id'])
+        with timed('mongo_write'):
+            user_model.update_last_login(user['_id'])
+        _login_succeeded(username, ip_address)
         logger.info(f"Kullanıcı '{username}' parola ile başarıyla giriş yaptı. IP: {ip_address}")
         return jsonify({'message': 'Giriş başarılı!', 'token': token, 'username': user['username']}), 200
     else:
-        failed_login_model.log_attempt(username, ip_address)
+        _login_failed(username, ip_address)
         logger.warning(f"Kullanıcı '{username}' parola ile giriş yapamadı. IP: {ip_address}")
         return jsonify({'message': 'Geçersiz kullanıcı adı veya parola.'}), 401
 
 @auth_bp.route('/login/face', methods=['POST'])
+@rate_limited('username_hint')
 def login_with_face():
-    data = request.get_json()
-    image_data = data.get('image')
-    username_hint = data.get('username_hint') #arama hızladır
+    # Görüntü multipart 'image' alanı, ham gövde (octet-stream/JPEG/PNG/WebP) ya da JSON data URL olarak gelebilir.
+    image_bytes = request_image_bytes(request)
+    username_hint = request_field(request, 'username_hint') #arama hızladır
     ip_address = request.remote_addr
 
-    if not image_data:
-        failed_login_model.log_attempt("UNKNOWN", ip_address)
+    if image_bytes is None:
         return jsonify({'message': 'Görüntü verisi gerekli!'}), 400
 
     try:
-        # Base64'ten görüntüyü çöz
-        encoded_data = image_data.split(',')[1]
-        nparr = np.frombuffer(base64.b64decode(encoded_data), np.uint8)
-        frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        frame = decode_image(image_bytes, Config.DECODE_TARGET_SIDE)
 
-        if frame is None or frame.size == 0 or frame.shape[0] == 0 or frame.shape[1] == 0: # Boş geçersiz frame kontrolü 
+        if frame is None: # Boş geçersiz frame kontrolü 
             logger.warning(f"login_with_face: Geçersiz görüntü formatı veya boş kare. IP: {ip_address}") 
-            failed_login_model.log_attempt("UNKNOWN", ip_address)
             return jsonify({'message': 'Geçersiz görüntü formatı!'}), 400
 
-        yuzler = detect_faces(frame)
-
-        if len(yuzler) == 0:
-            failed_login_model.log_attempt("UNKNOWN", ip_address)
-            logger.warning(f"Yüz algılanmadı. Giriş reddedildi. IP: {ip_address}") 
-            return jsonify({'message': 'Yüz algılanmadı.'}), 400
-        elif len(yuzler) > 1:
-            failed_login_model.log_attempt("UNKNOWN", ip_address)
-            logger.warning(f"Birden fazla yüz algılandı. Giriş reddedildi. IP: {ip_address}")
-            return jsonify({'message': 'Birden fazla yüz algılandı. Lütfen sadece bir yüzünüzün ekranda olduğundan emin olun.'}), 400
-
-        # Algılanan tek yüzü işle
-        (x, y, w, h) = yuzler[0]
-        yuz_bolgesi = get_face_roi(frame, (x, y, w, h)) 
-        
-        if yuz_bolgesi is None: # Kırpılan yüz bölgesi boş gelirse hata ver.
-            logger.warning(f"login_with_face: Yüz bölgesi kırpma sonrası boş. IP: {ip_address}")
-            failed_login_model.log_attempt("UNKNOWN", ip_address)
-            return jsonify({'message': 'Yüz bölgesi işlenirken hata.'}), 500
-
-        anlik_yuz_embedding = get_face_embedding(yuz_bolgesi) 
-
-        if anlik_yuz_embedding is None:
-            failed_login_model.log_attempt("UNKNOWN", ip_address)
-            logger.error(f"Yüz özellik çıkarımında hata. IP: {ip_address}")
-            return jsonify({'message': 'Yüz özellik çıkarımında hata.'}), 500
-
-        # Tüm kayıtlı kullanıcıları gez ve benzerlik kontrolü yap
-        eslesen_kullanicilar = [] 
+        anlik_yuz_embedding, hata = embed_frame(frame)
+
+        if hata:
+            # Yüz bulunamadı/birden fazla yüz gibi hat hataları deneme sayılmıyor (paylaşılan kiosk
+            # IP'si kilitlenmesin); sadece parola/yüz eşleşmemesi hatalı giriş olarak kaydediliyor.
+            mesaj, durum = FACE_ERRORS[hata]
+            logger.warning(f"login_with_face: {mesaj} Giriş reddedildi. IP: {ip_address}")
+            return jsonify({'message': mesaj}), durum
+
+        profil = None
         if username_hint:
-            kullanici = user_model.get_user_by_username(username_hint) 
-            if kullanici: eslesen_kullanicilar.append(kullanici)
-        else:
-            if user_model.collection:
-                eslesen_kullanicilar = list(user_model.collection.find({}))
-
-        en_iyi_eslesen_kullanici = None 
-        en_yuksek_benzerlik = Config.DETECTION_CONFIDENCE * 100 
-
-        for kullanici_verisi in eslesen_kullanicilar: 
-            for kaydedilmis_embedding_listesi in kullanici_verisi.get('face_embeddings', []): 
-                kaydedilmis_embedding = np.array(kaydedilmis_embedding_listesi, dtype=np.float32) 
-                benzerlik_orani = calculate_similarity(anlik_yuz_embedding, kaydedilmis_embedding) 
-                if benzerlik_orani > en_yuksek_benzerlik:
-                    en_yuksek_benzerlik = benzerlik_orani
-                    en_iyi_eslesen_kullanici = kullanici_verisi
-                    
+            # Kullanıcının normalize poz matrisi önbellekten geliyor, tüm pozlar tek çarpımla karşılaştırılıyor.
+            with timed('gallery_fetch'):
+                profil = user_model.get_face_profile(username_hint)
+        en_iyi_eslesen_kullanici, en_yuksek_benzerlik = best_face_match(anlik_yuz_embedding, username_hint, profil)
+
         if en_iyi_eslesen_kullanici:
-            token = generate_token(en_iyi_eslesen_kullanici['_id'])
-            user_model.update_last_login(en_iyi_eslesen_kullanici['_id'])
+            with timed('token'):
+                token = generate_token(en_iyi_eslesen_kullanici['_id'])
+            with timed('mongo_write'):
+                user_model.update_last_login(en_iyi_eslesen_kullanici['_id'])
+            _login_succeeded(en_iyi_eslesen_kullanici['username'], ip_address)
             logger.info(f"Kullanıcı '{en_iyi_eslesen_kullanici['username']}' yüz ile başarıyla giriş yaptı. Benzerlik: {en_yuksek_benzerlik:.2f}%. IP: {ip_address}")
-            return jsonify({
-                'message': 'Giriş başarılı!',
-                'token': token,
-                'username': en_iyi_eslesen_kullanici['username'],
-                'similarity': round(en_yuksek_benzerlik, 2)
-            }), 200
+            return jsonify(face_login_success(en_iyi_eslesen_kullanici, en_yuksek_benzerlik, token)), 200
         else:
-            failed_login_model.log_attempt(username_hint or "UNKNOWN", ip_address)
+            _login_failed(username_hint or "UNKNOWN", ip_address)
             logger.warning(f"Yüz tanıma ile giriş başarısız. IP: {ip_address}. En yüksek benzerlik: {en_yuksek_benzerlik:.2f}%")
-            return jsonify({'message': f'Yüz eşleşmesi bulunamadı. Benzerlik eşiği %{Config.DETECTION_CONFIDENCE*100} altında kaldı.'}), 401
+            return jsonify({'message': FACE_NO_MATCH_MESSAGE}), 401
 
     except Exception as e:
         logger.error(f"Yüzle giriş sırasında beklenmedik bir hata oluştu: {e}. IP: {ip_address}") 
-        failed_login_model.log_attempt("UNKNOWN", ip_address)
         return jsonify({'message': 'Sunucu hatası.'}), 500
 
 
 # Sadece embedding çıkaracak, giriş yapmayacak.
 @main_bp.route('/api/utils/extract_embedding', methods=['POST'])
 def extract_embedding_api():
-    data = request.get_json()
-    image_data = data.get('image')
+    image_bytes = request_image_bytes(request)
     ip_address = request.remote_addr
 
-    if not image_data:
+    if image_bytes is None:
         logger.warning(f"Embedding çıkarımı için görüntü verisi eksik. IP: {ip_address}")
         return jsonify({'message': 'Görüntü verisi gerekli!'}), 400
 
     try:
-        encoded_data = image_data.split(',')[1]
-        nparr = np.frombuffer(base64.b64decode(encoded_data), np.uint8)
-        frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        frame = decode_image(image_bytes, Config.DECODE_TARGET_SIDE)
 
         if frame is None:
             logger.warning(f"extract_embedding_api: Geçersiz görüntü formatı veya boş kare. IP: {ip_address}") 
             return jsonify({'message': 'Geçersiz görüntü formatı!'}), 400
 
-        yuzler = detect_faces(frame)
+        anlik_yuz_embedding, hata = embed_frame(frame)
 
-        if len(yuzler) == 0:
-            logger.warning(f"Embedding çıkarımı için yüz algılanmadı. IP: {ip_address}")
-            return jsonify({'message': 'Yüz algılanmadı.'}), 400
-        elif len(yuzler) > 1:
-            logger.warning(f"Embedding çıkarımı için birden fazla yüz algılandı. IP: {ip_address}")
-            return jsonify({'message': 'Birden fazla yüz algılandı. Lütfen sadece bir yüzünüzün ekranda olduğundan emin olun.'}), 400
+        if hata:
+            mesaj, durum = FACE_ERRORS[hata]
+            logger.warning(f"extract_embedding_api: {mesaj} IP: {ip_address}")
+            return jsonify({'message': mesaj}), durum
 
+        logger.info(f"Yüz embedding'i başarıyla çıkarıldı. IP: {ip_address}")
+        return jsonify({'embedding': anlik_yuz_embedding.tolist()}), 200 # Embedding'i liste olarak döndür
 
-        (x, y, w, h) = yuzler[0]
-        yuz_bolgesi = get_face_roi(frame, (x, y, w, h))
-        
-        if yuz_bolgesi is None: #Kırpılan yüz bölgesi boş gelirse hata ver.
-            logger.warning(f"extract_embedding_api: Yüz bölgesi kırpma sonrası boş. IP: {ip_address}")
-            return jsonify({'message': 'Yüz bölgesi işlenirken hata.'}), 500
+    except Exception as e:
+        logger.error(f"Embedding çıkarımı sırasında beklenmedik bir hata oluştu: {e}. IP: {ip_address}")
+        return jsonify({'message': 'Sunucu hatası.'}), 500
 
-        anlik_yuz_embedding = get_face_embedding(yuz_bolgesi)
 
-        if anlik_yuz_embedding is None:
-            logger.error(f"Embedding çıkarımında hata. IP: {ip_address}")
-            return jsonify({'message': 'Yüz özellik çıkarımında hata.'}), 500
+def _frame_from_bytes(image_bytes):
+    """
+    Simge: Sıkıştırılmış görüntü baytlarını kareye çözer.
+    (frame, None) ya da hata durumunda (None, hata_mesaji) döndürüyor.
+    """
+    if image_bytes is None:
+        return None, 'Görüntü verisi gerekli!'
+    frame = decode_image(image_bytes, Config.DECODE_TARGET_SIDE)
+    if frame is None:
+        return None, 'Geçersiz görüntü formatı!'
+    return frame, None
 
-        logger.info(f"Yüz embedding'i başarıyla çıkarıldı. IP: {ip_address}")
-        return jsonify({'embedding': anlik_yuz_embedding.tolist()}), 200 # Embedding'i liste olarak döndür
 
+# Kayıtta poz çekilirken hızlı kontrol: karede tam bir yüz var mı. FaceNet çalıştırılmıyor,
+# embedding'ler kayıt gönderilirken tüm pozlar için tek istekte çıkarılıyor.
+@main_bp.route('/api/utils/check_face', methods=['POST'])
+def check_face_api():
+    ip_address = request.remote_addr
+    frame, hata = _frame_from_bytes(request_image_bytes(request))
+    if hata:
+        return jsonify({'ok': False, 'message': hata}), 400
+    try:
+        if inference_pool is not None:
+            # Süreç havuzu modunda modeller bu süreçte yüklü değil; kontrol işçide tam hatla yapılıyor.
+            with timed('inference_pool'):
+                _, yuz_hatasi = inference_pool.embed(frame)
+        else:
+            _, yuz_hatasi = single_face_roi(frame)
     except Exception as e:
-        logger.error(f"Embedding çıkarımı sırasında beklenmedik bir hata oluştu: {e}. IP: {ip_address}")
+        logger.error(f"Poz kontrolü sırasında beklenmedik bir hata oluştu: {e}. IP: {ip_address}")
+        return jsonify({'ok': False, 'message': 'Sunucu hatası.'}), 500
+    if yuz_hatasi:
+        mesaj, durum = FACE_ERRORS[yuz_hatasi]
+        return jsonify({'ok': False, 'message': mesaj}), durum
+    return jsonify({'ok': True}), 200
+
+
+def _embed_frames_local(kareler):
+    # Bu süreçte: yüz bölgeleri tek tek kırpılıp embedding'ler tek FaceNet çağrısıyla çıkarılıyor.
+    ciktilar, yuz_bolgeleri, indeksler = [None] * len(kareler), [], []
+    for j, frame in enumerate(kareler):
+        yuz_bolgesi, hata = single_face_roi(frame)
+        if hata:
+            ciktilar[j] = (None, hata)
+        else:
+            yuz_bolgeleri.append(yuz_bolgesi)
+            indeksler.append(j)
+    for j, embedding in zip(indeksler, get_face_embeddings_batch(yuz_bolgeleri)):
+        ciktilar[j] = (embedding, None) if embedding is not None else (None, 'embedding')
+    return ciktilar
+
+
+# Kayıttaki tüm pozlar için embedding'leri tek model çağrısıyla çıkarır.
+# Bir görüntüde hata olursa sadece o görüntünün sonucunda hata mesajı döner, istek başarısız olmaz.
+@main_bp.route('/api/utils/extract_embeddings', methods=['POST'])
+def extract_embeddings_batch_api():
+    # Görüntüler multipart'ta aynı 'images' adıyla birden fazla dosya ya da JSON'da data URL listesi olarak gelebilir.
+    images = request_image_list(request)
+    ip_address = request.remote_addr
+
+    if not images:
+        logger.warning(f"Toplu embedding çıkarımı için görüntü listesi eksik. IP: {ip_address}")
+        return jsonify({'message': 'Görüntü listesi gerekli!'}), 400
+
+    if len(images) > Config.EMBEDDING_BATCH_MAX_IMAGES:
+        logger.warning(f"Toplu embedding isteğinde çok fazla görüntü ({len(images)}). IP: {ip_address}")
+        return jsonify({'message': f'En fazla {Config.EMBEDDING_BATCH_MAX_IMAGES} görüntü gönderilebilir.'}), 413
+
+    try:
+        sonuclar = [None] * len(images)
+        kareler, indeksler = [], []
+        for i, image_bytes in enumerate(images):
+            frame, hata = _frame_from_bytes(image_bytes)
+            if hata:
+                sonuclar[i] = {'message': hata}
+            else:
+                kareler.append(frame)
+                indeksler.append(i)
+
+        if inference_pool is not None:
+            # Süreç havuzunda görüntüler işçilere aynı anda dağıtılıyor.
+            with timed('inference_pool'):
+                ciktilar = inference_pool.embed_many(kareler)
+        else:
+            ciktilar = _embed_frames_local(kareler)
+
+        for i, (embedding, hata) in zip(indeksler, ciktilar):
+            if hata:
+                sonuclar[i] = {'message': FACE_ERRORS[hata][0]}
+            else:
+                sonuclar[i] = {'embedding': embedding.tolist()}
+
+        basarili = sum(1 for sonuc in sonuclar if 'embedding' in sonuc)
+        logger.info(f"Toplu embedding çıkarımı: {basarili}/{len(images)} görüntü başarılı. IP: {ip_address}")
+        return jsonify({'results': sonuclar}), 200
+
+    except Exception as e:
+        logger.error(f"Toplu embedding çıkarımı sırasında beklenmedik bir hata oluştu: {e}. IP: {ip_address}")
         return jsonify({'message': 'Sunucu hatası.'}), 500
 
 
 # --- Yönetim Paneli API Rotaları ---
 
+def _page_limit():
+    # limit parametresi yoksa varsayılan sayfa boyutu, varsa [1, ADMIN_PAGE_SIZE_MAX] aralığına sıkıştırılıyor.
+    try:
+        limit = int(request.args.get('limit', Config.ADMIN_PAGE_SIZE))
+    except ValueError:
+        return None
+    return max(1, min(limit, Config.ADMIN_PAGE_SIZE_MAX))
+
+def _as_utc(zaman):
+    # MongoDB tarihleri saat dilimsiz UTC olarak döndürüyor; yanıtlarda dilimi açıkça yazıyorum.
+    # Tüm zaman damgaları (created_at, last_login, failed_logins.timestamp) UTC yazılıyor; eski
+    # sürümlerin yerel saatle yazdıkları tools/migrate_timestamps.py ile çevriliyor.
+    return zaman.replace(tzinfo=datetime.timezone.utc) if zaman.tzinfo is None else zaman
+
+def _parse_time(deger):
+    # ISO 8601; kayıtlar UTC tutuluyor, saat dilimi verilmemişse UTC kabul ediyorum.
+    zaman = datetime.datetime.fromisoformat(deger)
+    return zaman.astimezone(datetime.timezone.utc) if zaman.tzinfo else zaman.replace(tzinfo=datetime.timezone.utc)
+
+def _ndjson_response(satirlar, dosya_adi):
+    # Satırlar imleçten geldikçe yazılıyor, tüm sonuç bellekte listeye toplanmıyor.
+    def generate():
+        for satir in satirlar:
+            yield json.dumps(satir, ensure_ascii=False) + "\n"
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson',
+                    headers={'Content-Disposition': f'attachment; filename={dosya_adi}'})
+
+def _user_row(user):
+    return {
+        'id': str(user['_id']),
+        'username': user['username'],
+        'created_at': _as_utc(user['created_at']).isoformat() if 'created_at' in user else 'N/A',
+        'last_login': _as_utc(user['last_login']).isoformat() if 'last_login' in user and user['last_login'] else 'N/A'
+    }
+
+def _attempt_row(attempt):
+    return {
+        'username': attempt['username'],
+        'ip_address': attempt['ip_address'],
+        'timestamp': _as_utc(attempt['timestamp']).isoformat()
+    }
+
 @admin_bp.route('/users', methods=['GET'])
-@token_required 
 @admin_required
 def get_users(current_user):
-    users = []
-    if user_model.collection:
-        # MongoDB'den tüm kullanıcıları çek
-        for user in user_model.collection.find({}, {"username": 1, "created_at": 1, "last_login": 1}): 
-            users.append({
-                'id': str(user['_id']),
-                'username': user['username'],
-                'created_at': user['created_at'].isoformat() if 'created_at' in user else 'N/A',
-                'last_login': user['last_login'].isoformat() if 'last_login' in user and user['last_login'] else 'N/A'
-            })
+    # ?username=<önek>&limit=<n>&cursor=<son kullanıcı ID> ya da ?format=ndjson ile tümünü dışa aktarma
+    username_prefix = request.args.get('username') or None
+    if request.args.get('format') == 'ndjson':
+        logger.info(f"Admin '{current_user['username']}' kullanıcı listesini dışa aktardı.")
+        return _ndjson_response((_user_row(user) for user in user_model.list_users(username_prefix)), 'users.ndjson')
+
+    limit = _page_limit()
+    if limit is None:
+        return jsonify({'message': 'Geçersiz limit.'}), 400
+    try:
+        # Bir fazlasını çekip sonraki sayfa olup olmadığını anlıyorum.
+        users = [_user_row(user) for user in user_model.list_users(username_prefix, request.args.get('cursor') or None, limit + 1)]
+    except InvalidId:
+        return jsonify({'message': 'Geçersiz sayfa imleci.'}), 400
+    next_cursor = users[limit - 1]['id'] if len(users) > limit else None
     logger.info(f"Admin '{current_user['username']}' kullanıcı listesini görüntüledi.")
-    return jsonify(users), 200
+    return jsonify({'items': users[:limit], 'next_cursor': next_cursor}), 200
 
 @admin_bp.route('/users/<user_id>', methods=['DELETE'])
-@token_required 
 @admin_required # Sadece adminler kullanıcı silebilir.
 def delete_user_api(current_user, user_id): 
     if user_model.delete_user(user_id):
@@ -335,53 +553,180 @@ def delete_user_api(current_user, user_id):
     return jsonify({'message': 'Kullanıcı silinirken hata oluştu veya kullanıcı bulunamadı.'}), 404
 
 @admin_bp.route('/failed_logins', methods=['GET'])
-@token_required 
 @admin_required # Sadece adminler hatalı giriş loglarını görebilmeli.
 def get_failed_logins(current_user):
-    failed_attempts = []
-    if failed_login_model.collection:
-       
-        for attempt in failed_login_model.collection.find({}).sort("timestamp", -1): 
-            failed_attempts.append({
-                'username': attempt['username'],
-                'ip_address': attempt['ip_address'],
-                'timestamp': attempt['timestamp'].isoformat()
-            })
+    # Filtreler: ?username=&ip=&since=&until= (ISO 8601), sayfalama: ?limit=&cursor=, dışa aktarma: ?format=ndjson
+    try:
+        filtreler = {
+            'username': request.args.get('username') or None,
+            'ip_address': request.args.get('ip') or None,
+            'since': _parse_time(request.args['since']) if request.args.get('since') else None,
+            'until': _parse_time(request.args['until']) if request.args.get('until') else None,
+        }
+    except ValueError:
+        return jsonify({'message': 'Geçersiz tarih formatı (ISO 8601 bekleniyor).'}), 400
+
+    if request.args.get('format') == 'ndjson':
+        logger.info(f"Admin '{current_user['username']}' hatalı giriş loglarını dışa aktardı.")
+        return _ndjson_response((_attempt_row(attempt) for attempt in failed_login_model.list_attempts(**filtreler)), 'failed_logins.ndjson')
+
+    limit = _page_limit()
+    if limit is None:
+        return jsonify({'message': 'Geçersiz limit.'}), 400
+    before = None
+    if request.args.get('cursor'):
+        # İmleç: "<son kaydın zamanı>|<son kaydın ID'si>"
+        try:
+            zaman, son_id = request.args['cursor'].split('|')
+            before = (_parse_time(zaman), ObjectId(son_id))
+        except (ValueError, InvalidId):
+            return jsonify({'message': 'Geçersiz sayfa imleci.'}), 400
+
+    attempts = list(failed_login_model.list_attempts(**filtreler, before=before, limit=limit + 1))
+    next_cursor = None
+    if len(attempts) > limit:
+        son = attempts[limit - 1]
+        next_cursor = f"{_as_utc(son['timestamp']).isoformat()}|{son['_id']}"
     logger.info(f"Admin '{current_user['username']}' hatalı giriş loglarını görüntüledi.")
-    return jsonify(failed_attempts), 200
+    return jsonify({'items': [_attempt_row(attempt) for attempt in attempts[:limit]], 'next_cursor': next_cursor}), 200
 
 
+# Oran sınırlayıcının şu an kilitli tuttuğu IP ve kullanıcı adları
+@admin_bp.route('/lockouts', methods=['GET'])
+@admin_required
+def get_lockouts(current_user):
+    if login_limiter is None:
+        return jsonify({'enabled': False, 'items': []}), 200
+    return jsonify({'enabled': True, 'items': login_limiter.lockouts()}), 200
+
+@admin_bp.route('/lockouts/<path:key>', methods=['DELETE'])
+@admin_required
+def delete_lockout(current_user, key):
+    if login_limiter is not None and login_limiter.unlock(key):
+        logger.info(f"Admin '{current_user['username']}' '{key}' kilidini kaldırdı.")
+        return jsonify({'message': 'Kilit kaldırıldı.'}), 200
+    return jsonify({'message': 'Kilit bulunamadı.'}), 404
+
+# Bu modülün dışında kurulan bileşenlerin sayaçları (ör. ASGI modundaki uç nokta sınırları): ad -> stats fonksiyonu
+component_stats_providers = {}
+
+
+def _component_stats():
+    # Alt sistemlerin (çıkarım kuyruğu vb.) anlık sayaçları; /api/admin/stats ve /metrics ortak kullanıyor.
+    return {
+        'inference': embedding_batcher.stats() if embedding_batcher is not None else None,
+        'user_embedding_cache': user_embedding_cache.stats(),
+        'principal_cache': principal_cache.stats(),
+        'failed_login_writer': failed_login_model.stats(),
+        'rate_limiter': login_limiter.stats() if login_limiter is not None else None,
+        'gallery': gallery_index.stats(),
+        'video_feed': video_broadcaster.stats(),
+        'models': model_manager.status(),
+        'inference_pool': inference_pool.stats() if inference_pool is not None else None,
+        'password_hasher': password_hasher.stats(),
+        **{ad: stats() for ad, stats in component_stats_providers.items()},
+    }
+
+@admin_bp.route('/stats', methods=['GET'])
+@admin_required
+def get_stats(current_user):
+    stats = _component_stats()
+    stats['latency'] = metrics.snapshot()
+    return jsonify(stats), 200
+
+# Canlılık: süreç ayakta ve istek işleyebiliyor (modelleri beklemiyor)
+@main_bp.route('/healthz', methods=['GET'])
+def healthz():
+    return jsonify({'status': 'ok'}), 200
+
+def _database_reachable():
+    # MongoClient bağlantıyı tembel kuruyor, db nesnesinin varlığı sunucunun ayakta olduğunu göstermiyor.
+    if db is None:
+        return False
+    try:
+        with pymongo.timeout(Config.READYZ_MONGO_TIMEOUT_MS / 1000):
+            db.command('ping')
+        return True
+    except Exception as e:
+        logger.warning(f"readyz: MongoDB'ye ulaşılamıyor: {e}")
+        return False
+
+# Hazır olma: modeller yüklenip ısıtıldı ve MongoDB ping'e cevap veriyor; değilse 503 (yük dengeleyici trafik göndermesin)
+@main_bp.route('/readyz', methods=['GET'])
+def readyz():
+    # Süreç havuzu modunda modeller bu süreçte değil işçilerde yükleniyor.
+    if inference_pool is not None:
+        models = inference_pool.status()
+    else:
+        if not model_manager.is_ready() and Config.MODEL_PRELOAD:
+            # Yükleme hata aldıysa bekleme süresi dolunca arka planda yeniden deneniyor.
+            model_manager.preload()
+        models = model_manager.status()
+    veritabani = _database_reachable()
+    hazir = models['ready'] and veritabani
+    return jsonify({'ready': hazir, 'database': veritabani, 'models': models}), 200 if hazir else 503
+
+# Prometheus için metin biçiminde metrikler: aşama süreleri (p50/p95/p99), uç nokta başına
+# istek sayıları/süreleri ve alt sistem sayaçları (gauge olarak). Sayaçlar admin paneliyle
+# aynı bilgileri içerdiği için METRICS_TOKEN ya da admin token'ı isteniyor.
+@main_bp.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    if not Config.METRICS_ENABLED:
+        return jsonify({'message': 'Bulunamadı.'}), 404
+    if Config.METRICS_TOKEN and hmac.compare_digest(request.headers.get('Authorization', ''), f"Bearer {Config.METRICS_TOKEN}"):
+        return _render_metrics()
+    return _admin_metrics()
+
+@admin_required
+def _admin_metrics(current_user):
+    return _render_metrics()
+
+def _render_metrics():
+    try:
+        gauges = flatten_gauges(_component_stats())
+    except Exception as e:
+        logger.error(f"Metrikler için alt sistem sayaçları okunurken hata: {e}")
+        gauges = {}
+    return Response(metrics.render_prometheus(gauges), mimetype='text/plain; version=0.0.4')
+
+# PCA izdüşümü yeniden eğitildiğinde (yeni sürüm) galeriyi MongoDB'deki tam boyutlu
+# embedding'lerden yeni izdüşümle tekrar kurar.
+@admin_bp.route('/gallery/rebuild', methods=['POST'])
+@admin_required
+def rebuild_gallery(current_user):
+    gallery_index.build(user_model.iter_gallery_entries(), projection=load_projection())
+    logger.info(f"Admin '{current_user['username']}' galeri indeksini yeniden oluşturdu.")
+    return jsonify({'message': 'Galeri yeniden oluşturuldu.', 'gallery': gallery_index.stats()}), 200
+
+
+
+# Tüm /video_feed izleyicileri tek kamera ve tek algılama thread'ini paylaşıyor.
+# Algılama VIDEO_DETECT_EVERY_N karede bir yapılıyor, aradaki karelerde kutular izleniyor.
+def _stream_detect_faces(frame):
+    # Akış algılamaları yüz ile girişin detect_faces aşamasına karışmasın diye ayrı aşama adı
+    with timed('stream_detect_faces'):
+        return detect_faces(frame)
+
+video_broadcaster = FrameBroadcaster(
+    lambda: open_video_source(Config.VIDEO_SOURCE),
+    StreamProcessor(_stream_detect_faces, draw_annotations,
+                    detect_every=Config.VIDEO_DETECT_EVERY_N,
+                    jpeg_quality=Config.VIDEO_JPEG_QUALITY,
+                    output_max_side=Config.VIDEO_OUTPUT_MAX_SIDE,
+                    tracker=TemplateTracker(min_confidence=TRACKING_CONFIDENCE)),
+    target_fps=Config.VIDEO_TARGET_FPS,
+    # Her izleyici döngüsünde yeni yakalama thread'i açılıyor; dedektörü thread'le birlikte kapanıyor.
+    on_thread_exit=release_face_detector,
+)
+
 
 @main_bp.route('/video_feed')
 def video_feed():
     def generate_frames():
-        cap = cv2.VideoCapture(0) 
-        if not cap.isOpened():
-            logger.error("Kamera açılamadı! Lütfen kamera bağlantısını veya izinleri kontrol edin.")
-            #Kamera açılmazsa döngüye girmesin diye buradan çıkıyorum.
-            return
-
-        while True:
-            success, frame = cap.read()
-            if not success:
-                logger.error("Kamera karesi okunamadı! Belki kamera bağlantısı kesildi?")
-                break # Kare okunamıyorsa döngüyü kır.
-            else:
-                yuzler = detect_faces(frame) #Yüzleri algıla
-                # Algılanan yüzlerin etrafına kutular çizmek için
-                frame = draw_annotations(frame, yuzler) 
-
-                # Görüntüyü JPEG formatına kodlayıp byte'a çeviriyorum.
-            
-                ret, buffer = cv2.imencode('.jpg', frame)
-                frame = buffer.tobytes()
+        # İstemci bağlantıyı kesince üreteç kapanıyor, closing ile izleyici aboneliği de bitiyor.
+        with closing(video_broadcaster.frames()) as kareler:
+            for frame in kareler:
                 yield (b'--frame\r\n'
                        b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
-            
-            # Çok hızlı frame gönderememek için küçük bir gecikme ekledim,
-           
-            time.sleep(0.01) 
-
-        cap.release()
 
     return Response(generate_frames(), mimetype='multipart/x-mixed-replace; boundary=frame')
\ No newline at end of file
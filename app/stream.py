@@ -0,0 +1,406 @@
+import asyncio
+import collections
+import threading
+import time
+
+import cv2
+import numpy as np
+from loguru import logger
+
+from app.tracking import TemplateTracker
+
+
+class RateMeter:
+    """Simge: Son window_s saniyedeki olay sayısından saniye başına hız hesaplar (FPS metrikleri için)."""
+
+    def __init__(self, window_s=5.0):
+        self.window_s = window_s
+        self._events = collections.deque()
+
+    def mark(self, now=None):
+        now = time.monotonic() if now is None else now
+        self._events.append(now)
+        self._trim(now)
+
+    def _trim(self, now):
+        while self._events and self._events[0] < now - self.window_s:
+            self._events.popleft()
+
+    def rate(self, now=None):
+        now = time.monotonic() if now is None else now
+        self._trim(now)
+        if len(self._events) < 2:
+            return 0.0
+        return (len(self._events) - 1) / max(now - self._events[0], 1e-6)
+
+
+class SyntheticSource:
+    """
+    Simge: cv2.VideoCapture ile aynı arayüzde (isOpened/read/release) kamera yerine
+    kullanılabilen sentetik kaynak. Kareler fps hızında, ekranda dolaşan yüze benzer
+    bir elipsle üretiliyor; frames verilirse o kadar kareden sonra read() False döner.
+    Test ve benchmark'larda gerçek kamera olmadan /video_feed'i çalıştırmak için.
+    """
+
+    def __init__(self, width=640, height=480, fps=30, frames=None):
+        self.width = width
+        self.height = height
+        self.interval = 1.0 / fps if fps and fps > 0 else 0.0
+        self.frames = frames
+        self._index = 0
+        self._next_at = time.monotonic()
+        self._opened = True
+        y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+        self._background = (127 + 60 * np.sin(x / 23.0) * np.cos(y / 31.0)).astype(np.uint8)
+
+    def isOpened(self):
+        return self._opened
+
+    def read(self):
+        if not self._opened or (self.frames is not None and self._index >= self.frames):
+            return False, None
+        if self.interval:
+            # Gerçek kamera gibi bir sonraki karenin zamanına kadar bekliyorum
+            bekle = self._next_at - time.monotonic()
+            if bekle > 0:
+                time.sleep(bekle)
+            self._next_at = max(self._next_at, time.monotonic() - self.interval) + self.interval
+        kare = cv2.cvtColor(self._background, cv2.COLOR_GRAY2BGR)
+        aci = self._index / 30.0
+        merkez = (int(self.width * (0.5 + 0.25 * np.cos(aci))), int(self.height * (0.5 + 0.15 * np.sin(aci))))
+        cv2.ellipse(kare, merkez, (self.width // 10, self.height // 6), 0, 0, 360, (150, 180, 220), -1)
+        self._index += 1
+        return True, kare
+
+    def release(self):
+        self._opened = False
+
+
+def open_video_source(spec):
+    """
+    Simge: VIDEO_SOURCE ayarından kare kaynağını açar:
+    - '0', '1', ...: kamera indeksi
+    - 'synthetic' ya da 'synthetic:640x480@30': SyntheticSource
+    - diğer her şey: video dosyası yolu ya da akış URL'si (cv2.VideoCapture)
+    """
+    spec = str(spec).strip()
+    if spec.startswith('synthetic'):
+        width, height, fps = 640, 480, 30
+        _, _, ayar = spec.partition(':')
+        if ayar:
+            boyut, _, hiz = ayar.partition('@')
+            if boyut:
+                width, height = (int(v) for v in boyut.lower().split('x'))
+            if hiz:
+                fps = float(hiz)
+        return SyntheticSource(width, height, fps)
+    if spec.isdigit():
+        capture = cv2.VideoCapture(int(spec))
+        # Yayın hızı kameradan düşükken sürücü tamponunda bayat kare birikmesin
+        capture.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        return capture
+    return cv2.VideoCapture(spec)
+
+
+def _resize_max_side(frame, max_side):
+    h, w = frame.shape[:2]
+    if not max_side or max_side <= 0 or max(h, w) <= max_side:
+        return frame, 1.0
+    olcek = max_side / max(h, w)
+    return cv2.resize(frame, (max(1, round(w * olcek)), max(1, round(h * olcek))), interpolation=cv2.INTER_AREA), olcek
+
+
+class StreamProcessor:
+    """
+    Simge: Canlı yayın karesini işleyip JPEG'e çeviren adım (FrameBroadcaster'ın process'i).
+    Kare önce çıktı çözünürlüğüne (output_max_side) küçültülüyor. Yüz algılama sadece
+    detect_every karede bir tam karede yapılıyor, aradaki karelerde kutular TemplateTracker ile
+    küçük karede taşınıyor; izleyici güveni düşerse (yüz kayboldu/hızlı hareket) o karede
+    hemen yeniden algılanıyor. detect_every=1 her karede algılama (eski davranış).
+    """
+
+    def __init__(self, detect, draw, detect_every=5, jpeg_quality=80, output_max_side=640, tracker=None):
+        self.detect = detect
+        self.draw = draw
+        self.detect_every = max(1, detect_every)
+        self.jpeg_quality = jpeg_quality
+        self.output_max_side = output_max_side
+        self.tracker = tracker if tracker is not None else TemplateTracker()
+        self._lock = threading.Lock()
+        self._frame_no = 0
+        self._boxes = []
+        self._detection_rate = RateMeter()
+        self.detections = 0
+        self.tracked_frames = 0
+        self.track_lost = 0
+
+    def _detect(self, frame, cikti, olcek):
+        # Algılama tam karede (detect_faces kendi içinde DETECTION_MAX_SIDE'a küçültüyor),
+        # kutular çıktı karesinin koordinatlarına çevriliyor.
+        kutular = [tuple(int(round(v * olcek)) for v in kutu) for kutu in self.detect(frame)]
+        if self.detect_every > 1:
+            self.tracker.start(cikti, kutular)
+        self.detections += 1
+        self._detection_rate.mark()
+        return kutular
+
+    def __call__(self, frame):
+        with self._lock:
+            cikti, olcek = _resize_max_side(frame, self.output_max_side)
+            if self._frame_no % self.detect_every == 0:
+                self._boxes = self._detect(frame, cikti, olcek)
+            elif self.tracker.active:
+                kutular = self.tracker.update(cikti)
+                if kutular is None:
+                    self.track_lost += 1
+                    kutular = self._detect(frame, cikti, olcek)
+                else:
+                    self.tracked_frames += 1
+                self._boxes = kutular
+            self._frame_no += 1
+            cikti = self.draw(cikti, self._boxes)
+            ret, buffer = cv2.imencode('.jpg', cikti, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+            return buffer.tobytes() if ret else None
+
+    def reset(self):
+        # Kaynak yeniden açılınca eski kutular taşınmasın
+        with self._lock:
+            self._frame_no = 0
+            self._boxes = []
+            self.tracker.reset()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'detect_every': self.detect_every,
+                'jpeg_quality': self.jpeg_quality,
+                'output_max_side': self.output_max_side,
+                'detections': self.detections,
+                'tracked_frames': self.tracked_frames,
+                'track_lost': self.track_lost,
+                'tracking_confidence': round(self.tracker.last_confidence, 3) if self.tracker.last_confidence is not None else None,
+                'detection_fps': round(self._detection_rate.rate(), 2),
+            }
+
+
+class FrameBroadcaster:
+    """
+    Simge: /video_feed için tek yakalama/işleme thread'i. Kaynaktan okunan her kare
+    process ile işlenip (algılama + çizim + JPEG) son kare olarak yayınlanıyor; kaç izleyici
+    olursa olsun kamera bir kere açılıyor ve her kare bir kere işleniyor.
+    İzleyiciler kuyruk tutmuyor: her biri en son yayınlanan kareyi alıyor, yavaş izleyici
+    aradaki kareleri atlıyor. Thread ilk izleyiciyle başlıyor, son izleyici ayrılınca
+    kaynağı kapatıp duruyor. Kaynak açılamaz ya da kare okunamazsa izleyicilerin akışı bitiyor.
+
+    Yayın hızı uyarlamalı: kareler target_fps'i aşmayacak aralıkla alınıyor, en hızlı
+    izleyici bir kareyi göndermek için bundan uzun süre harcıyorsa (yavaş bağlantı) aralık
+    o süreye uzatılıyor; kimsenin alamayacağı kareler için algılama ve JPEG yapılmıyor.
+    İşleme target_fps'e yetişemiyorsa bekleme olmadan CPU'nun izin verdiği hızda gidiyor.
+
+    Her yeniden başlamada yeni bir thread açıldığı için thread'e bağlı kaynaklar (ör. thread
+    başına yüz dedektörü) thread çıkarken on_thread_exit ile bırakılıyor.
+    """
+
+    def __init__(self, source_factory, process, name='video', target_fps=15, wait_timeout_s=5.0, on_thread_exit=None):
+        self.source_factory = source_factory
+        self.process = process
+        self.on_thread_exit = on_thread_exit
+        self.name = name
+        self.target_fps = target_fps
+        self.wait_timeout_s = wait_timeout_s
+        self._cond = threading.Condition()
+        self._thread = None
+        self._running = False
+        self._subscribers = 0
+        self._drain = {}  # izleyici -> kare başına gönderim süresi (EMA, sn)
+        self._async_waiters = {}  # async izleyici -> (event loop, asyncio.Event)
+        self._frame = None
+        self._seq = 0
+        self._starts = 0
+        self._captured = 0
+        self._published = 0
+        self._last_process_ms = 0.0
+        self._cpu_ms = None  # kare başına CPU süresi (EMA, ms)
+        self._interval = 0.0
+        self._publish_rate = RateMeter()
+
+    def _ensure_started_locked(self):
+        # Çalışan thread son izleyici ayrıldığı an kaynağı kapatıyor olabilir; _running
+        # sadece thread gerçekten çıkarken kilit altında False yapılıyor, o yüzden ona bakıyorum.
+        if self._running:
+            return
+        self._running = True
+        self._frame = None
+        self._starts += 1
+        self._thread = threading.Thread(target=self._worker, name=f"{self.name}-capture", daemon=True)
+        self._thread.start()
+
+    def _frame_interval_locked(self):
+        # Hedef FPS aralığı ile en hızlı izleyicinin kare gönderme süresinden büyük olanı
+        hedef = 1.0 / self.target_fps if self.target_fps and self.target_fps > 0 else 0.0
+        if self._drain:
+            hedef = max(hedef, min(self._drain.values()))
+        return hedef
+
+    def _run_source(self):
+        # İzleyici kalmayınca True, kaynak hatasında False döner.
+        source = self.source_factory()
+        try:
+            if source is None or not source.isOpened():
+                logger.error(f"FrameBroadcaster '{self.name}': video kaynağı açılamadı! Kamera bağlantısını veya izinleri kontrol edin.")
+                return False
+            logger.info(f"FrameBroadcaster '{self.name}': video kaynağı açıldı.")
+            reset = getattr(self.process, 'reset', None)
+            if reset is not None:
+                reset()
+            while True:
+                with self._cond:
+                    if self._subscribers == 0:
+                        return True
+                    aralik = self._interval = self._frame_interval_locked()
+                baslangic = time.monotonic()
+                success, frame = source.read()
+                if not success:
+                    logger.error(f"FrameBroadcaster '{self.name}': kare okunamadı! Kaynak kapanmış ya da bağlantı kesilmiş olabilir.")
+                    return False
+                cpu, duvar = time.thread_time(), time.perf_counter()
+                jpeg = self.process(frame)
+                sure_ms, cpu_ms = (time.perf_counter() - duvar) * 1000, (time.thread_time() - cpu) * 1000
+                with self._cond:
+                    self._captured += 1
+                    self._last_process_ms = sure_ms
+                    self._cpu_ms = cpu_ms if self._cpu_ms is None else 0.9 * self._cpu_ms + 0.1 * cpu_ms
+                    if jpeg is not None:
+                        self._frame = jpeg
+                        self._seq += 1
+                        self._published += 1
+                        self._publish_rate.mark()
+                        self._cond.notify_all()
+                        self._wake_async_locked()
+                bekle = baslangic + aralik - time.monotonic()
+                if bekle > 0:
+                    time.sleep(bekle)
+        finally:
+            if source is not None:
+                source.release()
+                logger.info(f"FrameBroadcaster '{self.name}': video kaynağı kapatıldı.")
+
+    def _worker(self):
+        try:
+            while True:
+                try:
+                    devam = self._run_source()
+                except Exception as e:
+                    logger.error(f"FrameBroadcaster '{self.name}': kare işlenirken hata: {e}")
+                    devam = False
+                with self._cond:
+                    # Kaynak kapatılırken yeni izleyici geldiyse kaynağı tekrar açıyorum.
+                    if not devam or self._subscribers == 0:
+                        self._running = False
+                        self._frame = None
+                        self._cond.notify_all()
+                        self._wake_async_locked()
+                        return
+        finally:
+            if self.on_thread_exit is not None:
+                try:
+                    self.on_thread_exit()
+                except Exception as e:
+                    logger.error(f"FrameBroadcaster '{self.name}': thread kapanışında hata: {e}")
+
+    def _wake_async_locked(self):
+        # Condition sadece thread'leri uyandırıyor; async izleyicilere kendi event loop'ları üzerinden haber veriyorum.
+        for loop, olay in self._async_waiters.values():
+            loop.call_soon_threadsafe(olay.set)
+
+    def _record_drain_locked(self, izleyici, sure):
+        onceki = self._drain.get(izleyici)
+        self._drain[izleyici] = sure if onceki is None else 0.8 * onceki + 0.2 * sure
+
+    def frames(self):
+        """
+        Simge: İzleyici için JPEG kare üreteci. Her adımda görmediği en son kareyi veriyor;
+        üreteç kapatılınca (istemci bağlantıyı kesince) izleyici sayısı düşüyor.
+        yield'den dönüşe kadar geçen süre istemcinin kareyi alma süresi, yayın hızı buna göre ayarlanıyor.
+        """
+        izleyici = object()
+        with self._cond:
+            self._subscribers += 1
+            self._ensure_started_locked()
+        son_seq = None
+        try:
+            while True:
+                with self._cond:
+                    self._cond.wait_for(lambda: not self._running or (self._frame is not None and self._seq != son_seq),
+                                        timeout=self.wait_timeout_s)
+                    if not self._running:
+                        return
+                    if self._frame is None or self._seq == son_seq:
+                        continue
+                    son_seq, jpeg = self._seq, self._frame
+                gonderim = time.monotonic()
+                yield jpeg
+                with self._cond:
+                    self._record_drain_locked(izleyici, time.monotonic() - gonderim)
+        finally:
+            with self._cond:
+                self._subscribers -= 1
+                self._drain.pop(izleyici, None)
+
+    async def aframes(self):
+        """
+        Simge: frames()'in asyncio karşılığı (ASGI modundaki /video_feed için). Bekleme sırasında
+        thread tutmuyor: yakalama thread'i yeni kare yayınlayınca izleyicinin event loop'una haber veriyor.
+        """
+        izleyici = object()
+        olay = asyncio.Event()
+        with self._cond:
+            self._subscribers += 1
+            self._async_waiters[izleyici] = (asyncio.get_running_loop(), olay)
+            self._ensure_started_locked()
+        son_seq = None
+        try:
+            while True:
+                with self._cond:
+                    if not self._running:
+                        return
+                    yeni = self._frame is not None and self._seq != son_seq
+                    if yeni:
+                        son_seq, jpeg = self._seq, self._frame
+                    else:
+                        # Kilit altında temizliyorum; sonraki yayın olayı mutlaka tekrar kuruyor.
+                        olay.clear()
+                if not yeni:
+                    try:
+                        await asyncio.wait_for(olay.wait(), self.wait_timeout_s)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                gonderim = time.monotonic()
+                yield jpeg
+                with self._cond:
+                    self._record_drain_locked(izleyici, time.monotonic() - gonderim)
+        finally:
+            with self._cond:
+                self._subscribers -= 1
+                self._drain.pop(izleyici, None)
+                self._async_waiters.pop(izleyici, None)
+
+    def stats(self):
+        with self._cond:
+            stats = {
+                'running': self._running,
+                'subscribers': self._subscribers,
+                'starts': self._starts,
+                'frames_captured': self._captured,
+                'frames_published': self._published,
+                'target_fps': self.target_fps,
+                'fps': round(self._publish_rate.rate(), 2),
+                'frame_interval_ms': round(self._interval * 1000, 3),
+                'last_process_ms': round(self._last_process_ms, 3),
+                'cpu_ms_per_frame': round(self._cpu_ms, 3) if self._cpu_ms is not None else None,
+            }
+        process_stats = getattr(self.process, 'stats', None)
+        if process_stats is not None:
+            stats['processing'] = process_stats()
+        return stats
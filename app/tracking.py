@@ -0,0 +1,81 @@
+import cv2
+
+
+class TemplateTracker:
+    """
+    Simge: Algılamalar arasındaki karelerde yüz kutularını taşıyan ucuz izleyici.
+    Algılama anında her yüzün gri tonlu şablonu alınıyor; sonraki karelerde kutunun
+    etrafındaki arama bölgesinde normalize çapraz korelasyonla (TM_CCOEFF_NORMED) aranıyor.
+    Şablon ve arama bölgesi uzun kenarı template_side piksel olacak ölçeğe indirildiği için
+    maliyet yüzün karedeki boyutundan bağımsız. Bir yüzün eşleşme skoru min_confidence'ın
+    altına düşerse izleme kaybedilmiş sayılıyor ve update None döndürüyor (yeniden algılama gerekli).
+    Şablon güncellenmiyor, kayma birikmesin diye her algılamada baştan alınıyor.
+    """
+
+    def __init__(self, min_confidence=0.5, template_side=32, search_scale=2.0):
+        self.min_confidence = min_confidence
+        self.template_side = template_side
+        self.search_scale = search_scale
+        self._tracks = []  # (kutu, şablon, ölçek)
+        self.last_confidence = None
+
+    @property
+    def active(self):
+        return bool(self._tracks)
+
+    def _gray(self, frame, x, y, w, h, olcek):
+        bolge = frame[y:y + h, x:x + w]
+        if bolge.size == 0:
+            return None
+        kucuk = cv2.resize(bolge, (max(1, round(w * olcek)), max(1, round(h * olcek))), interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(kucuk, cv2.COLOR_BGR2GRAY) if kucuk.ndim == 3 else kucuk
+
+    @staticmethod
+    def _clip(frame, x, y, w, h):
+        fh, fw = frame.shape[:2]
+        x0, y0 = max(0, x), max(0, y)
+        x1, y1 = min(fw, x + w), min(fh, y + h)
+        return x0, y0, x1 - x0, y1 - y0
+
+    def start(self, frame, boxes):
+        """Simge: Algılanan kutularla izlemeyi baştan başlatır."""
+        self._tracks = []
+        self.last_confidence = None
+        for box in boxes:
+            x, y, w, h = self._clip(frame, *box)
+            if w <= 0 or h <= 0:
+                continue
+            olcek = min(1.0, self.template_side / max(w, h))
+            sablon = self._gray(frame, x, y, w, h, olcek)
+            if sablon is not None:
+                self._tracks.append(((x, y, w, h), sablon, olcek))
+
+    def update(self, frame):
+        """
+        Simge: Kutuları yeni kareye taşır. Tüm yüzler bulunduysa kutu listesini,
+        biri bile kaybedildiyse None döndürür.
+        """
+        if not self._tracks:
+            return None
+        yeni, skorlar = [], []
+        for (x, y, w, h), sablon, olcek in self._tracks:
+            pay_x, pay_y = int(w * (self.search_scale - 1) / 2), int(h * (self.search_scale - 1) / 2)
+            ax, ay, aw, ah = self._clip(frame, x - pay_x, y - pay_y, w + 2 * pay_x, h + 2 * pay_y)
+            bolge = self._gray(frame, ax, ay, aw, ah, olcek) if aw > 0 and ah > 0 else None
+            if bolge is None or bolge.shape[0] < sablon.shape[0] or bolge.shape[1] < sablon.shape[1]:
+                self._tracks = []
+                return None
+            _, skor, _, konum = cv2.minMaxLoc(cv2.matchTemplate(bolge, sablon, cv2.TM_CCOEFF_NORMED))
+            skorlar.append(skor)
+            if skor < self.min_confidence:
+                self.last_confidence = skor
+                self._tracks = []
+                return None
+            yeni.append(((ax + int(round(konum[0] / olcek)), ay + int(round(konum[1] / olcek)), w, h), sablon, olcek))
+        self._tracks = yeni
+        self.last_confidence = min(skorlar)
+        return [kutu for kutu, _, _ in yeni]
+
+    def reset(self):
+        self._tracks = []
+        self.last_confidence = None
@@ -0,0 +1,145 @@
+import base64
+import binascii
+
+import cv2
+import numpy as np
+
+from app.metrics import timed
+
+
+# Ham gövde olarak kabul edilen görüntü türleri (gövde doğrudan cv2.imdecode'a veriliyor)
+IMAGE_MIMETYPES = ('application/octet-stream', 'image/jpeg', 'image/png', 'image/webp')
+
+# JPEG'i libjpeg'in DCT ölçeklemesiyle küçük çözen bayraklar (ölçek -> bayrak)
+_REDUCED_FLAGS = ((8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4), (2, cv2.IMREAD_REDUCED_COLOR_2))
+# Boyut bilgisi taşımayan SOF dışı işaretler (DHT, JPG, DAC)
+_JPEG_NON_SOF = (0xC4, 0xC8, 0xCC)
+
+
+def request_field(req, name):
+    """
+    Simge: İstekteki metin alanını biçime göre okur: JSON gövdesi, multipart form alanı
+    ya da ham görüntü gövdesiyle gelen isteklerde sorgu parametresi (?username_hint=...).
+    """
+    if req.is_json:
+        data = req.get_json(silent=True)
+        return data.get(name) if isinstance(data, dict) else None
+    if req.mimetype == 'multipart/form-data':
+        return req.form.get(name)
+    return req.args.get(name)
+
+
+def data_url_bytes(image_data):
+    """Simge: Base64 data URL'deki görüntüyü bayt dizisine çevirir; geçersizse None."""
+    if not image_data or not isinstance(image_data, str) or ',' not in image_data:
+        return None
+    try:
+        with timed('base64_decode'):
+            return np.frombuffer(base64.b64decode(image_data.split(',', 1)[1]), np.uint8)
+    except (binascii.Error, ValueError):
+        return None
+
+
+def _file_bytes(dosya):
+    veri = dosya.read() if dosya else b''
+    return np.frombuffer(veri, np.uint8) if veri else None
+
+
+def request_image_bytes(req, field='image'):
+    """
+    Simge: Tek görüntülük isteklerde görüntünün sıkıştırılmış baytlarını döndürür.
+    Desteklenen biçimler:
+    - multipart/form-data: 'image' dosya alanı
+    - application/octet-stream, image/jpeg, image/png, image/webp: gövdenin kendisi
+    - application/json: {"image": "data:image/jpeg;base64,..."} (eski biçim)
+    İkili biçimlerde base64 çözme ve JSON ayrıştırma yok; baytlar np.frombuffer ile
+    kopyalanmadan cv2.imdecode'a gidiyor.
+    """
+    if req.mimetype == 'multipart/form-data':
+        return _file_bytes(req.files.get(field))
+    if req.mimetype in IMAGE_MIMETYPES:
+        veri = req.get_data(cache=False)
+        return np.frombuffer(veri, np.uint8) if veri else None
+    data = req.get_json(silent=True)
+    return data_url_bytes(data.get(field)) if isinstance(data, dict) else None
+
+
+def request_image_list(req, field='images'):
+    """
+    Simge: Toplu isteklerde görüntü listesini döndürür: multipart'ta aynı adla gönderilmiş
+    dosyalar, JSON'da data URL listesi. Liste yoksa None; listede çözülemeyen öğeler None.
+    """
+    if req.mimetype == 'multipart/form-data':
+        dosyalar = req.files.getlist(field)
+        return [_file_bytes(dosya) for dosya in dosyalar] if dosyalar else None
+    data = req.get_json(silent=True)
+    images = data.get(field) if isinstance(data, dict) else None
+    if not isinstance(images, list):
+        return None
+    return [data_url_bytes(image_data) for image_data in images]
+
+
+def jpeg_size(buffer):
+    """
+    Simge: JPEG başlığındaki SOF segmentinden (genişlik, yükseklik) okur, görüntüyü çözmeden.
+    JPEG değilse ya da başlık bozuksa None.
+    """
+    veri = memoryview(buffer).cast('B')  # kopyalamadan bayt bayt okuma
+    if len(veri) < 4 or veri[0] != 0xFF or veri[1] != 0xD8:
+        return None
+    i = 2
+    while i + 9 < len(veri):
+        if veri[i] != 0xFF:
+            return None
+        isaret = veri[i + 1]
+        if isaret == 0xFF:  # dolgu baytı
+            i += 1
+            continue
+        if 0xD0 <= isaret <= 0xD9 or isaret == 0x01:  # uzunluk alanı olmayan işaretler
+            i += 2
+            continue
+        uzunluk = int.from_bytes(veri[i + 2:i + 4], 'big')
+        if 0xC0 <= isaret <= 0xCF and isaret not in _JPEG_NON_SOF:
+            yukseklik = int.from_bytes(veri[i + 5:i + 7], 'big')
+            genislik = int.from_bytes(veri[i + 7:i + 9], 'big')
+            return (genislik, yukseklik) if genislik and yukseklik else None
+        i += 2 + uzunluk
+    return None
+
+
+def reduced_decode_scale(size, target_side):
+    """
+    Simge: Uzun kenarı target_side'ın altına düşmeden uygulanabilecek en büyük JPEG
+    küçültme oranını (8, 4, 2) döndürür; küçültme gerekmiyorsa 1.
+    """
+    if not size or not target_side or target_side <= 0:
+        return 1
+    uzun_kenar = max(size)
+    for olcek, _ in _REDUCED_FLAGS:
+        if uzun_kenar // olcek >= target_side:
+            return olcek
+    return 1
+
+
+def decode_image(buffer, target_side=None):
+    """
+    Simge: Sıkıştırılmış görüntüyü (JPEG/PNG/WebP) BGR kareye çözer; çözülemezse None.
+    target_side verilirse ve JPEG bunun en az iki katı büyüklükteyse kare
+    cv2.IMREAD_REDUCED_COLOR_* ile doğrudan 1/2, 1/4 ya da 1/8 boyutta çözülüyor
+    (uzun kenar target_side'ın altına inmeden). Tam boyutlu kare hiç oluşmadığı için
+    hem çözme süresi hem bellek düşüyor.
+    """
+    if buffer is None or buffer.size == 0:
+        return None
+    bayrak = cv2.IMREAD_COLOR
+    if target_side:
+        olcek = reduced_decode_scale(jpeg_size(buffer), target_side)
+        bayrak = dict(_REDUCED_FLAGS).get(olcek, cv2.IMREAD_COLOR)
+    try:
+        with timed('imdecode'):
+            frame = cv2.imdecode(buffer, bayrak)
+    except cv2.error:
+        return None
+    if frame is None or frame.size == 0:
+        return None
+    return frame
@@ -1,26 +1,114 @@
 import cv2
-import mediapipe as mp
 import numpy as np
-from keras_facenet import FaceNet 
 from loguru import logger
+from config import Config
+from app.inference import InferenceBusy, create_batcher
+from app.lifecycle import ModelManager
+from app.metrics import timed
 import os
+import threading
+import weakref
+from concurrent.futures import TimeoutError as FutureTimeoutError
 
-# FaceNet modeli
-try:
-    facenet_model = FaceNet() 
+
+def _load_facenet():
+    # TensorFlow ve keras_facenet burada, ilk kullanımda ya da ön yükleme thread'inde import ediliyor.
+    from keras_facenet import FaceNet
+    model = FaceNet()
     logger.info("FaceNet modeli başarıyla yüklendi (keras-facenet).")
-except Exception as e:
-    logger.error(f"FaceNet modeli yüklenirken hata: {e}") 
-    facenet_model = None
+    return model
+
+def _load_face_detection():
+    import mediapipe as mp
+    return mp.solutions.face_detection
+
+def _warm_up(manager):
+    # İlk gerçek istek graf izleme / TFLite kurulum maliyetini ödemesin diye sahte girdiyle bir kere çalıştırıyorum.
+    manager.get('facenet').embeddings(np.zeros((1, 160, 160, 3), dtype=np.float32))
+    get_face_detector().process(np.zeros((128, 128, 3), dtype=np.uint8))
+
+# FaceNet ve MediaPipe import sırasında değil ilk kullanımda (ya da create_app'teki ön yüklemeyle) yükleniyor.
+model_manager = ModelManager({'facenet': _load_facenet, 'face_detection': _load_face_detection}, warm_up=_warm_up,
+                             retry_after_s=Config.MODEL_RETRY_AFTER_S)
 
-mp_face_detection = mp.solutions.face_detection
-mp_face_mesh = mp.solutions.face_mesh
-mp_drawing = mp.solutions.drawing_utils
+
+def _run_facenet_batch(face_batch):
+    # Mikro-toplama işçisi tarafından çağrılıyor: (n, 160, 160, 3) -> (n, embedding boyutu)
+    return model_manager.get('facenet').embeddings(face_batch)
+
+# Eşzamanlı login isteklerinin tekil yüzlerini tek ileri geçişte toplayan zamanlayıcı
+embedding_batcher = create_batcher(_run_facenet_batch, Config)
 
 # Yüz algılama için
 DETECTION_CONFIDENCE = 0.70 
-TRACKING_CONFIDENCE = 0.5 
+TRACKING_CONFIDENCE = 0.5 # canlı yayında izleyicinin (TemplateTracker) yeniden algılamaya düştüğü eşleşme skoru
+
+# MediaPipe FaceDetection her oluşturulduğunda TFLite grafiğini baştan kuruyor.
+# Bu yüzden her iş parçacığı (Waitress thread'i) kendi dedektörünü bir kere oluşturup
+# sonraki isteklerde tekrar kullanıyor. Nesneler thread'ler arasında paylaşılmıyor,
+# çünkü process() aynı anda iki thread'den çağrılmaya uygun değil.
+# Dedektör thread'in threading.local'indeki bir tutucuda duruyor; thread bitince tutucu
+# toplanıyor ve weakref.finalize dedektörü kapatıyor (ön yükleme thread'i, executor ve
+# yayın thread'leri bittiğinde dedektörleri bellekte kalmıyor).
+_detector_local = threading.local()
+_detector_finalizers = {}
+_detectors_lock = threading.Lock()
+
+
+class _DetectorHolder:
+    __slots__ = ('detector', 'finalizer', '__weakref__')
+
+
+def _close_detector(anahtar, detector, thread_name):
+    with _detectors_lock:
+        _detector_finalizers.pop(anahtar, None)
+    try:
+        detector.close()
+        logger.info(f"MediaPipe yüz dedektörü kapatıldı (thread: {thread_name}).")
+    except Exception as e:
+        logger.error(f"Yüz dedektörü kapatılırken hata: {e}")
 
+def get_face_detector():
+    """
+    Simge: Çağıran thread'e ait FaceDetection örneğini döndürür, yoksa ilk kullanımda oluşturur.
+    """
+    holder = getattr(_detector_local, 'holder', None)
+    if holder is None or not holder.finalizer.alive:
+        mp_face_detection = model_manager.get('face_detection')
+        if mp_face_detection is None:
+            raise RuntimeError("MediaPipe yüz algılama modeli yüklenemedi.")
+        holder = _DetectorHolder()
+        holder.detector = mp_face_detection.FaceDetection(min_detection_confidence=DETECTION_CONFIDENCE)
+        thread_name = threading.current_thread().name
+        holder.finalizer = weakref.finalize(holder, _close_detector, id(holder), holder.detector, thread_name)
+        with _detectors_lock:
+            _detector_finalizers[id(holder)] = holder.finalizer
+        _detector_local.holder = holder
+        logger.info(f"MediaPipe yüz dedektörü oluşturuldu (thread: {thread_name}).")
+    return holder.detector
+
+def release_face_detector():
+    """
+    Simge: Çağıran thread'in dedektörünü hemen kapatır (ör. yayın thread'i çıkarken).
+    Thread bir daha algılama yaparsa get_face_detector yeni örnek oluşturur.
+    """
+    holder = _detector_local.__dict__.pop('holder', None)
+    if holder is not None:
+        holder.finalizer()
+
+def close_face_detectors():
+    """
+    Simge: Hâlâ açık olan tüm dedektörleri kapatır. Kapanışta weakref.finalize'ın atexit
+    desteğiyle de çağrılıyor; sonrasında get_face_detector çağrılırsa thread'ler yeni örnek oluşturur.
+    """
+    with _detectors_lock:
+        kapatilacaklar = list(_detector_finalizers.values())
+    for finalizer in kapatilacaklar:
+        finalizer()
+    if kapatilacaklar:
+        logger.info(f"{len(kapatilacaklar)} yüz dedektörü kapatıldı.")
+
+@timed('preprocess_face')
 def preprocess_face(image, required_size=(160, 160)):
     """
     Simge: Yüz görüntüsünü FaceNet modelinin beklediği formata getiriyor.
@@ -48,9 +136,12 @@ def preprocess_face(image, required_size=(160, 160)):
 
 def get_face_embedding(face_image):
     """
-    Simge: Verilen yüz görüntüsünden 128 boyutlu benzersiz bir "yüz imzası" çıkarır.
+    Simge: Verilen yüz görüntüsünden benzersiz bir "yüz imzası" çıkarır (varsayılan FaceNet modelinde 512 boyutlu).
     Bu imza, diğer yüzlerle karşılaştırmak için kullanılacak.
+    Mikro-toplama kuyruğu doluysa ya da sonuç INFERENCE_TIMEOUT_S içinde gelmezse None değil
+    InferenceBusy fırlatıyor; aşırı yük model hatası (500) değil 'busy' (503) olarak dönmeli.
     """
+    facenet_model = model_manager.get('facenet')
     if facenet_model is None:
         logger.error("get_face_embedding: FaceNet modeli yüklenemedi. Embedding çıkarılamıyor.")
         return None
@@ -62,38 +153,103 @@ def get_face_embedding(face_image):
         return None
 
     try:
-        embedding = facenet_model.embeddings(on_islenmis_yuz)[0] 
+        if embedding_batcher is not None:
+            # Diğer thread'lerin istekleriyle birlikte toplu işlenmesi için kuyruğa bırakıyorum.
+            with timed('facenet'):
+                future = embedding_batcher.submit(on_islenmis_yuz[0])
+                try:
+                    embedding = future.result(timeout=Config.INFERENCE_TIMEOUT_S)
+                except FutureTimeoutError:
+                    future.cancel()  # henüz toplanmadıysa işçi bu yüzü hiç işlemiyor
+                    raise InferenceBusy(f"FaceNet sonucu {Config.INFERENCE_TIMEOUT_S} sn içinde gelmedi.")
+        else:
+            with timed('facenet'):
+                embedding = facenet_model.embeddings(on_islenmis_yuz)[0]
         
       
         embedding_norm = embedding / np.linalg.norm(embedding) 
         return embedding_norm
+    except InferenceBusy:
+        raise
     except Exception as e:
         logger.error(f"get_face_embedding: Embedding çıkarımı sırasında hata: {e}")
         return None
 
-def detect_faces(frame):
+def get_face_embeddings_batch(face_images):
+    """
+    Simge: Birden fazla yüz görüntüsü için embedding'leri tek bir FaceNet çağrısıyla çıkarır.
+    Kayıt sırasında her poz için modeli ayrı ayrı çağırmak yerine 160x160 kırpımları
+    tek tensörde birleştiriyorum. Dönen liste girişle aynı sırada, işlenemeyen
+    görüntülerin yerinde None var.
+    """
+    sonuclar = [None] * len(face_images)
+    facenet_model = model_manager.get('facenet')
+    if facenet_model is None:
+        logger.error("get_face_embeddings_batch: FaceNet modeli yüklenemedi. Embedding çıkarılamıyor.")
+        return sonuclar
+
+    on_islenmis_yuzler, indeksler = [], []
+    for i, face_image in enumerate(face_images):
+        on_islenmis_yuz = preprocess_face(face_image)
+        if on_islenmis_yuz is None:
+            logger.warning(f"get_face_embeddings_batch: {i}. görüntü boş veya geçersiz, atlandı.")
+            continue
+        on_islenmis_yuzler.append(on_islenmis_yuz[0])
+        indeksler.append(i)
+
+    if not on_islenmis_yuzler:
+        return sonuclar
+
+    try:
+        with timed('facenet_batch'):
+            embeddings = facenet_model.embeddings(np.stack(on_islenmis_yuzler))
+        for i, embedding in zip(indeksler, embeddings):
+            sonuclar[i] = embedding / np.linalg.norm(embedding)
+    except Exception as e:
+        logger.error(f"get_face_embeddings_batch: Toplu embedding çıkarımı sırasında hata: {e}")
+    return sonuclar
+
+def detection_frame(frame, max_side):
+    """
+    Simge: Algılama için uzun kenarı max_side'ı geçmeyecek şekilde küçültülmüş kareyi döndürür.
+    MediaPipe kareyi zaten kendi giriş boyutuna (128x128) indirdiği için tam çözünürlükte
+    renk dönüşümü ve ölçekleme yapmak boşa CPU; INTER_AREA ile küçültüp RGB dönüşümünü
+    küçük kare üzerinde yapıyorum. Küçültme gerekmiyorsa kare aynen döner.
+    """
+    h, w = frame.shape[:2]
+    if not max_side or max_side <= 0 or max(h, w) <= max_side:
+        return frame
+    olcek = max_side / max(h, w)
+    return cv2.resize(frame, (max(1, round(w * olcek)), max(1, round(h * olcek))), interpolation=cv2.INTER_AREA)
+
+def detect_faces(frame, max_side=None):
     """
     Simge: Kamera görüntüsündeki yüzleri algılar ve her yüzün konumunu (bounding box) döndürür.
     MediaPipe'ın hızlı ve doğru yüz algılama yeteneğini kullanıyorum.
+    Algılama DETECTION_MAX_SIDE'a küçültülmüş karede yapılıyor; MediaPipe kutuları oransal
+    döndürdüğü için koordinatlar doğrudan verilen karenin boyutlarına çevriliyor,
+    kırpma (get_face_roi) tam çözünürlüklü kareden yapılabiliyor.
     """
     algilanan_yuzler = [] 
-    
+
     # Görüntünün boş olup olmadığını kontrol et. BoşsaOpenCV hatası vermeden boş liste döndür.
     if frame is None or frame.size == 0 or frame.shape[0] == 0 or frame.shape[1] == 0: 
         logger.warning("detect_faces: Görüntü boş veya geçersiz, yüz algılanamadı.")
         return []
 
+    if max_side is None:
+        max_side = Config.DETECTION_MAX_SIDE
+
     try:
-        h, w, _ = frame.shape 
-        with mp_face_detection.FaceDetection(min_detection_confidence=DETECTION_CONFIDENCE) as face_detection:
-            results = face_detection.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
-            if results.detections:
-                for detection in results.detections:
-                    bboxC = detection.location_data.relative_bounding_box
-                    ih, iw, _ = frame.shape
-                    x, y, genislik, yukseklik = int(bboxC.xmin * iw), int(bboxC.ymin * ih), \
-                                             int(bboxC.width * iw), int(bboxC.height * ih)
-                    algilanan_yuzler.append((x, y, genislik, yukseklik)) 
+        ih, iw = frame.shape[:2]
+        face_detection = get_face_detector()
+        results = face_detection.process(cv2.cvtColor(detection_frame(frame, max_side), cv2.COLOR_BGR2RGB))
+        if results.detections:
+            for detection in results.detections:
+                bboxC = detection.location_data.relative_bounding_box
+                x, y, genislik, yukseklik = int(bboxC.xmin * iw), int(bboxC.ymin * ih), \
+                                         int(bboxC.width * iw), int(bboxC.height * ih)
+                algilanan_yuzler.append((x, y, genislik, yukseklik)) 
         return algilanan_yuzler
     except Exception as e:
         logger.error(f"detect_faces: Yüz algılama sırasında hata: {e}")
@@ -123,16 +279,24 @@ def calculate_similarity(embedding1, embedding2):
         logger.error(f"calculate_similarity: Benzerlik hesaplama sırasında hata: {e}")
         return 0.0
 
-def get_face_roi(frame, bbox):
+@timed('get_face_roi')
+def get_face_roi(frame, bbox, margin=None):
     """
     Simge: Ana görüntüden sadece yüz bölgesini (Region of Interest) kırpar.
     Bu kırpılan bölge FaceNet modeline verilecek.
+    margin (varsayılan FACE_ROI_MARGIN) kutuyu her kenardan genişlik/yüksekliğin bu oranı kadar büyütüyor.
     """
     x, y, w, h = bbox
-    
-    
-    if y < 0: y = 0
-    if x < 0: x = 0
+
+    if margin is None:
+        margin = Config.FACE_ROI_MARGIN
+    if margin:
+        dx, dy = int(round(w * margin)), int(round(h * margin))
+        x, y, w, h = x - dx, y - dy, w + 2 * dx, h + 2 * dy
+
+    # Kare dışına taşan kısmı kırpıyorum (sol/üstte taşma varsa genişlik de o kadar azalıyor)
+    if y < 0: h, y = h + y, 0
+    if x < 0: w, x = w + x, 0
     if y + h > frame.shape[0]: h = frame.shape[0] - y
     if x + w > frame.shape[1]: w = frame.shape[1] - x
 
@@ -147,6 +311,41 @@ def get_face_roi(frame, bbox):
         logger.error(f"get_face_roi: Yüz bölgesi kırpma sırasında hata: {e}")
         return None
 
+def single_face_roi(frame):
+    """
+    Simge: Karede tam bir yüz varsa yüz bölgesini döndürür: (yuz_bolgesi, None) ya da
+    (None, hata_kodu). Hata kodları: 'no_face', 'multiple_faces', 'roi'.
+    """
+    with timed('detect_faces'):
+        yuzler = detect_faces(frame)
+    if len(yuzler) == 0:
+        return None, 'no_face'
+    if len(yuzler) > 1:
+        return None, 'multiple_faces'
+    yuz_bolgesi = get_face_roi(frame, yuzler[0])
+    if yuz_bolgesi is None:
+        return None, 'roi'
+    return yuz_bolgesi, None
+
+def embed_single_face(frame):
+    """
+    Simge: Karedeki tek yüzün normalize embedding'i: (embedding, None) ya da (None, hata_kodu).
+    single_face_roi'nin kodlarına ek olarak 'embedding' (FaceNet hatası) ve 'busy' (mikro-toplama
+    kuyruğu dolu ya da zaman aşımı, süreç havuzundaki 'busy' ile aynı). Süreç havuzundaki
+    işçiler de (app.procpool) aynı fonksiyonu çalıştırıyor.
+    """
+    yuz_bolgesi, hata = single_face_roi(frame)
+    if hata:
+        return None, hata
+    try:
+        embedding = get_face_embedding(yuz_bolgesi)
+    except InferenceBusy as e:
+        logger.warning(f"embed_single_face: Çıkarım kapasitesi dolu: {e}")
+        return None, 'busy'
+    if embedding is None:
+        return None, 'embedding'
+    return embedding, None
+
 def draw_annotations(frame, faces):
     """
     Simge: Algılanan yüzlerin etrafına yeşil dikdörtgenler çizer.
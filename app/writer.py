@@ -0,0 +1,208 @@
+import atexit
+import queue
+import threading
+import time
+
+from loguru import logger
+
+
+OVERFLOW_POLICIES = ('drop', 'block')
+
+# Kuyruk dolunca her düşürülen kayıtta log basmamak için uyarıyı bu aralıkla tekrarlıyorum.
+_DROP_LOG_EVERY = 1000
+
+
+class BatchedInsertWriter:
+    """
+    Simge: İstek thread'inde tek tek insert_one yapmak yerine dokümanları sınırlı bir
+    kuyruğa bırakan arka plan yazıcısı. İşçi thread kuyruktaki dokümanları max_batch_size'a
+    ulaşana ya da ilk dokümanın üzerinden flush_ms geçene kadar toplayıp tek insert_many
+    ile yazıyor. Kapanışta kuyrukta kalanlar yazılıyor.
+
+    Kuyruk dolarsa overflow politikası uygulanıyor: 'drop' dokümanı düşürüp sayıyor,
+    'block' kuyrukta yer açılmasını en fazla block_timeout_s bekliyor, yine yer yoksa düşürüyor.
+    Düşürülen ve yazılamayan kayıtlar sayaçlarda ve logda görünüyor.
+    """
+
+    def __init__(self, insert_many, max_batch_size=100, flush_ms=500, queue_depth=10000,
+                 overflow='drop', block_timeout_s=1.0, name='writer'):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Bilinmeyen overflow politikası: {overflow}")
+        self.insert_many = insert_many
+        self.max_batch_size = max(1, max_batch_size)
+        self.flush_interval = max(0, flush_ms) / 1000.0
+        self.overflow = overflow
+        self.block_timeout = block_timeout_s
+        self.name = name
+        self._queue = queue.Queue(maxsize=queue_depth)
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._enqueued = 0
+        self._written = 0
+        self._batches = 0
+        self._dropped = 0
+        self._blocked = 0
+        self._failed = 0
+        self._last_batch_ms = 0.0
+
+    def _ensure_started(self):
+        # İşçi thread'i ilk kayıtta başlatıyorum, import sırasında thread açılmasın.
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._worker, name=f"{self.name}-writer", daemon=True)
+                self._thread.start()
+
+    def write(self, document):
+        """
+        Simge: Dokümanı yazılmak üzere kuyruğa ekler. Kuyruğa girdiyse True, overflow
+        politikası gereği düşürüldüyse False döner; istek thread'i MongoDB'yi beklemiyor.
+        """
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(document)
+        except queue.Full:
+            if self.overflow == 'block':
+                with self._stats_lock:
+                    self._blocked += 1
+                try:
+                    self._queue.put(document, timeout=self.block_timeout)
+                except queue.Full:
+                    return self._drop()
+            else:
+                return self._drop()
+        with self._stats_lock:
+            self._enqueued += 1
+        return True
+
+    def _drop(self):
+        with self._stats_lock:
+            self._dropped += 1
+            dusen = self._dropped
+        if dusen == 1 or dusen % _DROP_LOG_EVERY == 0:
+            logger.warning(f"BatchedInsertWriter '{self.name}': kuyruk dolu ({self._queue.maxsize}), "
+                           f"kayıt düşürüldü (toplam {dusen}).")
+        return False
+
+    def flush(self, timeout=5.0):
+        """
+        Simge: O ana kadar kuyruğa giren her şeyin yazılmasını bekler. Yazıldıysa True döner.
+        """
+        if self._thread is None or not self._thread.is_alive():
+            return self._queue.empty()
+        tamam = threading.Event()
+        try:
+            self._queue.put(tamam, timeout=timeout)
+        except queue.Full:
+            return False
+        return tamam.wait(timeout)
+
+    def _collect(self, ilk):
+        batch, isaretler, kapanis = [], [], False
+        son_tarih = time.monotonic() + self.flush_interval
+        item = ilk
+        while True:
+            if item is None:
+                kapanis = True
+            elif isinstance(item, threading.Event):
+                # flush() isteği: beklemeden o ana kadar toplananları yaz
+                isaretler.append(item)
+            else:
+                batch.append(item)
+            if kapanis or isaretler or len(batch) >= self.max_batch_size:
+                break
+            kalan = son_tarih - time.monotonic()
+            try:
+                item = self._queue.get_nowait() if kalan <= 0 else self._queue.get(timeout=kalan)
+            except queue.Empty:
+                break
+        return batch, isaretler, kapanis
+
+    def _write_batch(self, batch):
+        baslangic = time.monotonic()
+        for deneme in range(2):
+            try:
+                self.insert_many(batch)
+                break
+            except Exception as e:
+                if deneme == 1:
+                    logger.error(f"BatchedInsertWriter '{self.name}': {len(batch)} kayıt yazılamadı: {e}")
+                    with self._stats_lock:
+                        self._failed += len(batch)
+                    return
+                logger.warning(f"BatchedInsertWriter '{self.name}': toplu yazma başarısız, tekrar deneniyor: {e}")
+        with self._stats_lock:
+            self._written += len(batch)
+            self._batches += 1
+            self._last_batch_ms = (time.monotonic() - baslangic) * 1000
+
+    def _worker(self):
+        while True:
+            batch, isaretler, kapanis = self._collect(self._queue.get())
+            if kapanis:
+                # Kapanışta kuyrukta kalanları da alıp yazıyorum.
+                while True:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if isinstance(item, threading.Event):
+                        isaretler.append(item)
+                    elif item is not None:
+                        batch.append(item)
+            for bas in range(0, len(batch), self.max_batch_size):
+                self._write_batch(batch[bas:bas + self.max_batch_size])
+            for isaret in isaretler:
+                isaret.set()
+            if kapanis:
+                return
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                'queue_depth': self._queue.qsize(),
+                'queue_capacity': self._queue.maxsize,
+                'overflow_policy': self.overflow,
+                'enqueued': self._enqueued,
+                'written': self._written,
+                'batches': self._batches,
+                'avg_batch_size': round(self._written / self._batches, 2) if self._batches else 0.0,
+                'last_batch_ms': round(self._last_batch_ms, 3),
+                'dropped': self._dropped,
+                'blocked': self._blocked,
+                'failed': self._failed,
+            }
+
+    def shutdown(self, timeout=5.0):
+        if self._thread is None or not self._thread.is_alive():
+            return
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            logger.warning(f"BatchedInsertWriter '{self.name}': kuyruk dolu, kapanış işareti bırakılamadı.")
+            return
+        self._thread.join(timeout)
+        logger.info(f"BatchedInsertWriter '{self.name}' durduruldu ({self._written} kayıt yazıldı, {self._dropped} düşürüldü).")
+
+
+def create_failed_login_writer(insert_many, config):
+    """Simge: Config'teki ayarlarla hatalı giriş yazıcısını oluşturur; asenkron yazma kapalıysa None döner."""
+    if not config.FAILED_LOGIN_ASYNC:
+        return None
+    overflow = config.FAILED_LOGIN_OVERFLOW
+    if overflow not in OVERFLOW_POLICIES:
+        logger.warning(f"Bilinmeyen FAILED_LOGIN_OVERFLOW '{overflow}', 'drop' kullanılacak.")
+        overflow = 'drop'
+    writer = BatchedInsertWriter(
+        insert_many,
+        max_batch_size=config.FAILED_LOGIN_BATCH_SIZE,
+        flush_ms=config.FAILED_LOGIN_FLUSH_MS,
+        queue_depth=config.FAILED_LOGIN_QUEUE_DEPTH,
+        overflow=overflow,
+        block_timeout_s=config.FAILED_LOGIN_BLOCK_TIMEOUT_S,
+        name='failed_logins',
+    )
+    atexit.register(writer.shutdown)
+    return writer
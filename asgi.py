@@ -0,0 +1,20 @@
+from main import create_server_app  # Flask uygulaması ve varsayılan admin kontrolü main.py'de
+from app.asgi import create_asgi_app
+from config import Config
+from loguru import logger
+
+
+def create_app():
+    """
+    Simge: Görüntü uç noktalarını asyncio ile sunan ASGI uygulaması (diğer yollar Flask'a gidiyor).
+    Uygulama import sırasında kurulmuyor; INFERENCE_MODE=process'te spawn ile başlayan işçiler
+    bu modülü tekrar import ettiğinde Flask uygulaması, admin kontrolü ve havuz yeniden kurulmasın.
+    Çalıştırma: python asgi.py  ya da  uvicorn --factory asgi:create_app --port 5000
+    """
+    return create_asgi_app(create_server_app())
+
+
+if __name__ == '__main__':
+    import uvicorn
+    logger.info(f"Uvicorn (ASGI) sunucusu başlatılıyor. Dinlenen port: {Config.FLASK_PORT}")
+    uvicorn.run(create_app(), host="0.0.0.0", port=Config.FLASK_PORT)
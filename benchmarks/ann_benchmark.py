@@ -0,0 +1,90 @@
+"""
+Simge: Galeri arama motorları için recall / gecikme ölçümü.
+Sentetik 128 boyutlu embedding'lerle (her kullanıcı bir kimlik merkezi etrafında
+birkaç poz) tam tarama ile IVF'i farklı nprobe değerlerinde ve iki aşamalı
+merkez ön filtresini farklı kısa liste boyutlarında karşılaştırır.
+
+Kullanım:
+    python benchmarks/ann_benchmark.py --users 100000 --poses 10 --queries 500
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.ann import ExactSearch, IVFSearch  # noqa: E402
+from app.gallery import GalleryIndex  # noqa: E402
+
+
+def synthetic_gallery(n_users, n_poses, dim=128, pose_noise=0.35, seed=0):
+    rng = np.random.default_rng(seed)
+    merkezler = rng.normal(size=(n_users, dim)).astype(np.float32)
+    merkezler /= np.linalg.norm(merkezler, axis=1, keepdims=True)
+    pozlar = merkezler[:, None, :] + pose_noise * rng.normal(size=(n_users, n_poses, dim)).astype(np.float32) / np.sqrt(dim)
+    return merkezler, pozlar
+
+
+def synthetic_queries(merkezler, n_queries, query_noise=0.45, seed=1):
+    rng = np.random.default_rng(seed)
+    kimlikler = rng.integers(0, merkezler.shape[0], n_queries)
+    dim = merkezler.shape[1]
+    sorgular = merkezler[kimlikler] + query_noise * rng.normal(size=(n_queries, dim)).astype(np.float32) / np.sqrt(dim)
+    return kimlikler, sorgular
+
+
+def run(gallery, sorgular):
+    sonuclar, sureler = [], []
+    for sorgu in sorgular:
+        bas = time.perf_counter()
+        sonuc = gallery.search(sorgu, k=1)
+        sureler.append(time.perf_counter() - bas)
+        sonuclar.append(sonuc[0] if sonuc else (None, None, 0.0))
+    return sonuclar, np.array(sureler) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=20000)
+    parser.add_argument('--poses', type=int, default=10)
+    parser.add_argument('--queries', type=int, default=300)
+    parser.add_argument('--nlist', type=int, default=0, help='0 = otomatik (~4*sqrt(n))')
+    parser.add_argument('--nprobe', type=int, nargs='+', default=[1, 4, 8, 16, 32, 64])
+    parser.add_argument('--shortlist', type=int, nargs='+', default=[16, 64, 256],
+                        help='Merkez ön filtresinde tam skorlanan kullanıcı sayıları')
+    parser.add_argument('--threshold', type=float, default=70.0, help='Kabul eşiği (DETECTION_CONFIDENCE*100)')
+    args = parser.parse_args()
+
+    merkezler, pozlar = synthetic_gallery(args.users, args.poses)
+    kullanicilar = [(f"u{i}", f"user{i}", pozlar[i]) for i in range(args.users)]
+    _, sorgular = synthetic_queries(merkezler, args.queries)
+
+    exact = GalleryIndex(search_engine=ExactSearch(), centroid_shortlist=0)
+    exact.build(kullanicilar)
+    referans, sureler = run(exact, sorgular)
+    print(f"Galeri: {args.users} kullanıcı x {args.poses} poz = {exact.size} satır, {args.queries} sorgu")
+    print(f"{'motor':<16}{'recall@1':>10}{'karar uyumu':>13}{'p50 ms':>10}{'p99 ms':>10}{'kurulum s':>11}")
+    print(f"{'exact':<16}{1.0:>10.3f}{1.0:>13.3f}{np.percentile(sureler, 50):>10.3f}{np.percentile(sureler, 99):>10.3f}{'-':>11}")
+
+    ayarlar = [(f'ivf/nprobe={nprobe}', IVFSearch(nlist=args.nlist, nprobe=nprobe, min_train_size=0), 0) for nprobe in args.nprobe]
+    ayarlar += [(f'merkez/m={m}', ExactSearch(), m) for m in args.shortlist]
+    for ad, motor, kisa_liste in ayarlar:
+        galeri = GalleryIndex(search_engine=motor, centroid_shortlist=kisa_liste)
+        bas = time.perf_counter()
+        galeri.build(kullanicilar)
+        kurulum = time.perf_counter() - bas
+        sonuclar, sureler = run(galeri, sorgular)
+        recall = np.mean([a[0] == b[0] for a, b in zip(sonuclar, referans)])
+        # Eşik kararının (kabul/ret + kimlik) tam taramayla aynı olduğu sorguların oranı
+        karar = np.mean([
+            (a[2] > args.threshold) == (b[2] > args.threshold) and (b[2] <= args.threshold or a[0] == b[0])
+            for a, b in zip(sonuclar, referans)
+        ])
+        print(f"{ad:<16}{recall:>10.3f}{karar:>13.3f}{np.percentile(sureler, 50):>10.3f}{np.percentile(sureler, 99):>10.3f}{kurulum:>11.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,194 @@
+"""
+Simge: Waitress (main.py) ve ASGI (asgi.py, uvicorn) modlarının eşzamanlı istek kapasitesi karşılaştırması.
+Her mod ayrı bir sunucu sürecinde başlatılıyor; her eşzamanlılık düzeyinde o kadar istemci
+--duration saniye boyunca /api/auth/login/face'e (username_hint ile) ve isteğe bağlı olarak
+aynı anda bağlı --viewers /video_feed izleyicisiyle yük bindiriyor. Düzey başına saniyedeki
+yanıt, p50/p95/p99 gecikme ve durum kodu dağılımı yazdırılır; ASGI modunda sunucunun o ana kadar
+aynı anda işlediği en yüksek yüz ile giriş isteği sayısı (peak) da yazdırılıyor.
+--upload-kbps ile gövde yavaş gönderiliyor (mobil bağlantı benzetimi).
+MongoDB yerine varsayılan olarak mongomock (ASGI için mongomock_motor) kullanılıyor (--mongo ile gerçek MONGO_URI).
+
+Kullanım:
+    python benchmarks/asgi_load_test.py --levels 8,32,128 --duration 10
+    python benchmarks/asgi_load_test.py --modes asgi --upload-kbps 256 --viewers 4
+"""
+import argparse
+import collections
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+KOK = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def sunucu(mod, port, mongo):
+    # Ayrı süreçte çalışıyor: istenen modda sunucuyu başlatıyor, üst süreç işi bitince sonlandırıyor.
+    sys.path.insert(0, KOK)
+    if not mongo:
+        import mongomock
+        import pymongo
+        pymongo.MongoClient = mongomock.MongoClient
+    if mod == 'waitress':
+        from waitress import serve
+        from main import app
+        from config import Config
+        serve(app, host='127.0.0.1', port=port, threads=Config.WAITRESS_THREADS, _quiet=True)
+        return
+    import uvicorn
+    import app.asgi as asgi
+    if not mongo:
+        import mongomock_motor
+        import app.models as models
+        asgi.AsyncIOMotorClient = lambda uri: mongomock_motor.AsyncMongoMockClient(mock_mongo_client=models.client)
+    from main import app as flask_app
+    uygulama = asgi.create_asgi_app(flask_app)
+
+    async def istatistik(scope, receive, send):
+        # Yük testi için sunucu içi eşzamanlılık sayaçları (yetkilendirmesiz, sadece bu süreçte)
+        if scope['type'] == 'http' and scope['path'] == '/__load_test_stats':
+            from starlette.responses import JSONResponse
+            await JSONResponse(uygulama.stats())(scope, receive, send)
+            return
+        await uygulama(scope, receive, send)
+
+    uvicorn.run(istatistik, host='127.0.0.1', port=port, log_level='warning')
+
+
+def bos_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def bekle_hazir(port, timeout_s=120):
+    bitis = time.monotonic() + timeout_s
+    while time.monotonic() < bitis:
+        try:
+            baglanti = http.client.HTTPConnection('127.0.0.1', port, timeout=2)
+            baglanti.request('GET', '/healthz')
+            if baglanti.getresponse().status == 200:
+                return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+
+def istek(port, govde, upload_kbps):
+    baglanti = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+    baslangic = time.perf_counter()
+    try:
+        baglanti.putrequest('POST', '/api/auth/login/face?username_hint=load_test_user')
+        baglanti.putheader('Content-Type', 'image/jpeg')
+        baglanti.putheader('Content-Length', str(len(govde)))
+        baglanti.endheaders()
+        if upload_kbps:
+            parca = max(1024, upload_kbps * 1024 // 8 // 10)  # saniyede 10 parça
+            for i in range(0, len(govde), parca):
+                baglanti.send(govde[i:i + parca])
+                time.sleep(0.1)
+        else:
+            baglanti.send(govde)
+        durum = baglanti.getresponse().status
+    except OSError:
+        durum = 'hata'
+    finally:
+        baglanti.close()
+    return durum, time.perf_counter() - baslangic
+
+
+def izleyici(port, bitis):
+    try:
+        baglanti = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        baglanti.request('GET', '/video_feed')
+        yanit = baglanti.getresponse()
+        while time.monotonic() < bitis and yanit.status == 200 and yanit.read1(65536):
+            pass
+        baglanti.close()
+    except OSError:
+        pass
+
+
+def duzey(port, eszamanli, sure_s, govde, upload_kbps, viewers):
+    sureler, durumlar = [], collections.Counter()
+    kilit = threading.Lock()
+    bitis = time.monotonic() + sure_s
+
+    def istemci():
+        while time.monotonic() < bitis:
+            durum, sure = istek(port, govde, upload_kbps)
+            with kilit:
+                durumlar[durum] += 1
+                if durum != 'hata':
+                    sureler.append(sure)
+
+    threadler = [threading.Thread(target=izleyici, args=(port, bitis), daemon=True) for _ in range(viewers)]
+    threadler += [threading.Thread(target=istemci) for _ in range(eszamanli)]
+    for t in threadler:
+        t.start()
+    for t in threadler:
+        t.join(sure_s + 65)
+    return sureler, durumlar
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--modes', default='waitress,asgi')
+    parser.add_argument('--levels', default='4,16,64,128', help='Eşzamanlı istemci sayıları')
+    parser.add_argument('--duration', type=float, default=10.0, help='Düzey başına saniye')
+    parser.add_argument('--resolution', default='640x480')
+    parser.add_argument('--upload-kbps', type=int, default=0, help='0 = gövde tek seferde gönderilir')
+    parser.add_argument('--viewers', type=int, default=0, help='Aynı anda bağlı /video_feed izleyicisi')
+    parser.add_argument('--mongo', action='store_true', help='mongomock yerine MONGO_URI kullan')
+    parser.add_argument('--serve', choices=('waitress', 'asgi'), help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        sunucu(args.serve, args.port, args.mongo)
+        return 0
+
+    import cv2
+    import numpy as np
+    width, height = (int(v) for v in args.resolution.lower().split('x'))
+    kare = np.full((height, width, 3), 90, np.uint8)
+    cv2.ellipse(kare, (width // 2, height // 2), (width // 8, height // 4), 0, 0, 360, (150, 180, 220), -1)
+    govde = cv2.imencode('.jpg', kare)[1].tobytes()
+
+    print(f"{args.resolution} JPEG {len(govde) / 1024:.0f} KB, düzey başına {args.duration:.0f} sn, "
+          f"yükleme {'sınırsız' if not args.upload_kbps else f'{args.upload_kbps} kbps'}, {args.viewers} video izleyicisi")
+    print(f"{'mod':<10}{'eşzamanlı':>10}{'yanıt/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'peak':>6}  durumlar")
+    for mod in args.modes.split(','):
+        port = bos_port()
+        # Yük testinde oran sınırlayıcı kapalı; yüz hattı modeller kuruluysa gerçek, değilse hızlıca hata dönüyor.
+        ortam = dict(os.environ, RATE_LIMIT_ENABLED='false', VIDEO_SOURCE=os.environ.get('VIDEO_SOURCE', 'synthetic'))
+        komut = [sys.executable, os.path.abspath(__file__), '--serve', mod, '--port', str(port)]
+        if args.mongo:
+            komut.append('--mongo')
+        surec = subprocess.Popen(komut, env=ortam, cwd=KOK, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            if not bekle_hazir(port):
+                print(f"{mod:<10} sunucu başlatılamadı.")
+                continue
+            for eszamanli in (int(v) for v in args.levels.split(',')):
+                sureler, durumlar = duzey(port, eszamanli, args.duration, govde, args.upload_kbps, args.viewers)
+                peak = '-'
+                if mod == 'asgi':
+                    baglanti = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+                    baglanti.request('GET', '/__load_test_stats')
+                    peak = json.loads(baglanti.getresponse().read()).get('/api/auth/login/face', {}).get('peak', '-')
+                p50, p95, p99 = (np.quantile(sureler, (0.5, 0.95, 0.99)) * 1000) if sureler else (float('nan'),) * 3
+                print(f"{mod:<10}{eszamanli:>10}{len(sureler) / args.duration:>9.1f}{p50:>9.1f}{p95:>9.1f}{p99:>9.1f}"
+                      f"{peak:>6}  {dict(sorted(durumlar.items(), key=str))}")
+        finally:
+            surec.terminate()
+            surec.wait(10)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
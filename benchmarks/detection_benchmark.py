@@ -0,0 +1,80 @@
+"""
+Simge: detect_faces için çağrı başına dedektör oluşturma ile thread başına
+tekrar kullanılan dedektörün gecikme karşılaştırması.
+
+Sabit bir kare kümesi kullanılıyor: --images ile bir klasördeki jpg/png dosyaları,
+verilmezse sabit tohumla üretilmiş sentetik kareler.
+
+Kullanım:
+    python benchmarks/detection_benchmark.py --images ornek_kareler/ --repeat 5
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils import DETECTION_CONFIDENCE, close_face_detectors, detect_faces, model_manager  # noqa: E402
+
+
+def load_frames(images_dir, count, width, height):
+    if images_dir:
+        yollar = sorted(glob.glob(os.path.join(images_dir, '*.jpg')) + glob.glob(os.path.join(images_dir, '*.png')))
+        kareler = [cv2.imread(yol) for yol in yollar[:count]]
+        return [kare for kare in kareler if kare is not None]
+    rng = np.random.default_rng(0)
+    kareler = []
+    for _ in range(count):
+        kare = rng.integers(0, 255, (height, width, 3), dtype=np.uint8)
+        merkez = (int(rng.integers(width // 4, 3 * width // 4)), int(rng.integers(height // 4, 3 * height // 4)))
+        cv2.ellipse(kare, merkez, (width // 8, height // 5), 0, 0, 360, (150, 180, 220), -1)
+        kareler.append(kare)
+    return kareler
+
+
+def per_call(frame):
+    # Eski davranış: her çağrıda yeni FaceDetection grafiği kuruluyor.
+    with model_manager.get('face_detection').FaceDetection(min_detection_confidence=DETECTION_CONFIDENCE) as face_detection:
+        face_detection.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+
+
+def measure(fn, kareler, repeat):
+    sureler = []
+    for _ in range(repeat):
+        for kare in kareler:
+            bas = time.perf_counter()
+            fn(kare)
+            sureler.append(time.perf_counter() - bas)
+    return np.array(sureler) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--images', help='Kare klasörü (jpg/png)')
+    parser.add_argument('--frames', type=int, default=20)
+    parser.add_argument('--width', type=int, default=640)
+    parser.add_argument('--height', type=int, default=480)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    kareler = load_frames(args.images, args.frames, args.width, args.height)
+    if not kareler:
+        print("Kare bulunamadı.")
+        return
+
+    detect_faces(kareler[0])  # havuzdaki dedektörü ısıt
+    print(f"{len(kareler)} kare x {args.repeat} tekrar")
+    print(f"{'mod':<12}{'ort ms':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    for ad, fn in (('per-call', per_call), ('pooled', detect_faces)):
+        sureler = measure(fn, kareler, args.repeat)
+        print(f"{ad:<12}{sureler.mean():>10.2f}{np.percentile(sureler, 50):>10.2f}{np.percentile(sureler, 95):>10.2f}")
+    close_face_detectors()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+"""
+Simge: Yüz ile giriş ön işleme hattının tipik webcam çözünürlüklerinde karşılaştırması.
+- tam: JPEG tam boyutta çözülür, tüm kare RGB'ye çevrilip algılanır, yüz tam kareden kırpılır
+- küçük: JPEG DECODE_TARGET_SIDE'a göre IMREAD_REDUCED_* ile çözülür, algılama
+  DETECTION_MAX_SIDE'a küçültülmüş karede yapılır, yüz çözülen kareden kırpılır
+Her çözünürlük için istek başına süre, oluşan ara karelerin bayt toplamı ve iki hattın
+FaceNet girişlerinin (160x160 standardize kırpım) kosinüs benzerliği yazdırılır.
+MediaPipe/FaceNet kuruluysa gerçek algılama ve embedding benzerliği de ölçülür; değilse
+sentetik karedeki sabit yüz kutusu kullanılır.
+
+Kullanım:
+    python benchmarks/downscale_benchmark.py --repeat 50 --quality 90
+    python benchmarks/downscale_benchmark.py --resolutions 1280x720,1920x1080 --margin 0.1
+"""
+import argparse
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config  # noqa: E402
+from app.uploads import decode_image  # noqa: E402
+from app.utils import detection_frame, get_face_detector, get_face_roi, model_manager  # noqa: E402
+from upload_benchmark import synthetic_frame  # noqa: E402
+
+# Sentetik karedeki yüzün oransal kutusu (x, y, genişlik, yükseklik)
+YUZ_KUTUSU = (0.38, 0.25, 0.24, 0.42)
+
+
+def sentetik_kare(width, height):
+    kare = synthetic_frame(width, height)
+    x, y, w, h = YUZ_KUTUSU
+    merkez = (int((x + w / 2) * width), int((y + h / 2) * height))
+    cv2.ellipse(kare, merkez, (int(w * width / 2), int(h * height / 2)), 0, 0, 360, (150, 180, 220), -1)
+    cv2.circle(kare, (merkez[0] - int(w * width / 5), merkez[1] - int(h * height / 8)), max(2, width // 80), (40, 40, 40), -1)
+    cv2.circle(kare, (merkez[0] + int(w * width / 5), merkez[1] - int(h * height / 8)), max(2, width // 80), (40, 40, 40), -1)
+    return kare
+
+
+def yuz_kutusu(frame, algilama_karesi, dedektor):
+    # Algılama küçük karede, kutu verilen karenin boyutlarında
+    ih, iw = frame.shape[:2]
+    rgb = cv2.cvtColor(algilama_karesi, cv2.COLOR_BGR2RGB)
+    if dedektor is not None:
+        sonuc = dedektor.process(rgb)
+        if not sonuc.detections:
+            return None, rgb
+        b = sonuc.detections[0].location_data.relative_bounding_box
+        return (int(b.xmin * iw), int(b.ymin * ih), int(b.width * iw), int(b.height * ih)), rgb
+    x, y, w, h = YUZ_KUTUSU
+    return (int(x * iw), int(y * ih), int(w * iw), int(h * ih)), rgb
+
+
+def facenet_girisi(yuz):
+    # preprocess_face ile aynı: 160x160, görüntü başına standardizasyon
+    yuz = cv2.resize(yuz, (160, 160)).astype(np.float32)
+    return (yuz - yuz.mean()) / yuz.std()
+
+
+def hat(jpeg, target_side, max_side, margin, dedektor):
+    frame = decode_image(jpeg, target_side)
+    algilama_karesi = detection_frame(frame, max_side)
+    bbox, rgb = yuz_kutusu(frame, algilama_karesi, dedektor)
+    if bbox is None:
+        return None, 0
+    yuz = get_face_roi(frame, bbox, margin)
+    ara_bayt = frame.nbytes + rgb.nbytes + (algilama_karesi.nbytes if algilama_karesi is not frame else 0)
+    return facenet_girisi(yuz), ara_bayt
+
+
+def kosinus(a, b):
+    a, b = a.ravel(), b.ravel()
+    return float(np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--resolutions', default='640x480,1280x720,1920x1080,2560x1440,3840x2160')
+    parser.add_argument('--quality', type=int, default=90, help='JPEG kalitesi (tarayıcıdaki toBlob 0.9 ile aynı)')
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--target-side', type=int, default=Config.DECODE_TARGET_SIDE)
+    parser.add_argument('--max-side', type=int, default=Config.DETECTION_MAX_SIDE)
+    parser.add_argument('--margin', type=float, default=Config.FACE_ROI_MARGIN)
+    args = parser.parse_args()
+
+    # Modeller kurulu değilse (mediapipe/keras_facenet yok) sabit yüz kutusuyla sadece ön işleme ölçülüyor.
+    facenet = model_manager.get('facenet')
+    dedektor = None
+    if model_manager.get('face_detection') is not None:
+        dedektor = get_face_detector()
+    else:
+        print("MediaPipe yüklenemedi; algılama yerine sabit yüz kutusu kullanılacak.")
+    print(f"DECODE_TARGET_SIDE={args.target_side} DETECTION_MAX_SIDE={args.max_side} "
+          f"FACE_ROI_MARGIN={args.margin} JPEG kalite {args.quality}, {args.repeat} tekrar")
+    print(f"{'çözünürlük':<12}{'JPEG KB':>9}{'tam ms':>9}{'küçük ms':>10}{'hız':>7}"
+          f"{'tam MB':>9}{'küçük MB':>10}{'giriş cos':>11}{'emb cos':>9}")
+    for cozunurluk in args.resolutions.split(','):
+        width, height = (int(v) for v in cozunurluk.lower().split('x'))
+        jpeg = np.frombuffer(cv2.imencode('.jpg', sentetik_kare(width, height),
+                                          [cv2.IMWRITE_JPEG_QUALITY, args.quality])[1].tobytes(), np.uint8)
+        sonuclar = {}
+        for ad, target_side, max_side in (('tam', 0, 0), ('küçük', args.target_side, args.max_side)):
+            hat(jpeg, target_side, max_side, args.margin, dedektor)  # ısınma
+            sureler = []
+            for _ in range(args.repeat):
+                bas = time.perf_counter()
+                giris, ara_bayt = hat(jpeg, target_side, max_side, args.margin, dedektor)
+                sureler.append(time.perf_counter() - bas)
+            sonuclar[ad] = (np.median(sureler) * 1000, ara_bayt / 1e6, giris)
+
+        (tam_ms, tam_mb, tam_giris), (kucuk_ms, kucuk_mb, kucuk_giris) = sonuclar['tam'], sonuclar['küçük']
+        giris_cos = emb_cos = float('nan')
+        if tam_giris is not None and kucuk_giris is not None:
+            giris_cos = kosinus(tam_giris, kucuk_giris)
+            if facenet is not None:
+                a, b = facenet.embeddings(np.stack([tam_giris, kucuk_giris]))
+                emb_cos = kosinus(a, b)
+        print(f"{cozunurluk:<12}{jpeg.size / 1024:>9.0f}{tam_ms:>9.2f}{kucuk_ms:>10.2f}{tam_ms / kucuk_ms:>6.1f}x"
+              f"{tam_mb:>9.2f}{kucuk_mb:>10.2f}{giris_cos:>11.4f}{emb_cos:>9.4f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,163 @@
+"""
+Simge: Parola ile giriş patlamasında bcrypt'in Waitress thread'lerini tüketip tüketmediğinin ölçümü.
+Her senaryo ayrı bir Python sürecinde, gerçek bir Waitress sunucusuna (--threads thread) HTTP ile:
+- /api/auth/login/password'a --password-clients eşzamanlı istemci (doğru parola)
+- isteğe bağlı olarak /api/auth/login/face'e --face-clients eşzamanlı istemci
+Modlar: inline (PASSWORD_HASH_WORKERS=0, bcrypt istek thread'inde, eski davranış) ve
+pool (bcrypt sınırlı havuzda, kuyruk PASSWORD_HASH_ADMIT_WAIT_S boyunca dolu kalırsa 503). Parola girişi için saniyedeki başarılı giriş,
+p50/p95/p99 ve 503 sayısı; yüz ile giriş için p50/p95/p99 yazdırılır. MediaPipe/FaceNet kurulu
+değilse yüz istekleri hızlıca hata ile dönüyor; o durumda yüz gecikmesi sadece thread bekleme süresini gösteriyor.
+MongoDB yerine varsayılan olarak mongomock kullanılıyor (--mongo ile gerçek MONGO_URI).
+
+Kullanım:
+    python benchmarks/password_benchmark.py --rounds 12 --duration 10
+    python benchmarks/password_benchmark.py --password-clients 32 --face-clients 4 --threads 8
+"""
+import argparse
+import collections
+import http.client
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+KOK = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def istek(port, yol, govde, content_type):
+    baglanti = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+    try:
+        baslangic = time.perf_counter()
+        baglanti.request('POST', yol, body=govde, headers={'Content-Type': content_type})
+        durum = baglanti.getresponse().status
+        return durum, time.perf_counter() - baslangic
+    finally:
+        baglanti.close()
+
+
+def yuzdelik(sureler):
+    import numpy as np
+    if not sureler:
+        return {'p50_ms': None, 'p95_ms': None, 'p99_ms': None}
+    p50, p95, p99 = np.quantile(sureler, (0.5, 0.95, 0.99)) * 1000
+    return {'p50_ms': round(float(p50), 1), 'p95_ms': round(float(p95), 1), 'p99_ms': round(float(p99), 1)}
+
+
+def cocuk(args):
+    # Ayrı süreçte çalışıyor; sonuçları JSON olarak stdout'a yazıyor.
+    sys.path.insert(0, KOK)
+    if not args.mongo:
+        import mongomock
+        import pymongo
+        pymongo.MongoClient = mongomock.MongoClient
+    import cv2
+    import numpy as np
+    from waitress import create_server
+
+    from app import create_app
+    from app.models import User
+    from app.passwords import password_hasher
+
+    app = create_app()
+    user_model = User()
+    kullanicilar = [f"bench_user_{i}" for i in range(args.users)]
+    for ad in kullanicilar:
+        if not user_model.username_exists(ad):
+            user_model.create_user(ad, 'bench-password', np.random.rand(2, 128).astype(np.float32))
+
+    sunucu = create_server(app, host='127.0.0.1', port=0, threads=args.threads)
+    port = sunucu.effective_port
+    threading.Thread(target=sunucu.run, daemon=True).start()
+
+    kare = np.full((480, 640, 3), 90, np.uint8)
+    cv2.ellipse(kare, (320, 240), (80, 110), 0, 0, 360, (150, 180, 220), -1)
+    jpeg = cv2.imencode('.jpg', kare)[1].tobytes()
+
+    sonuclar = collections.defaultdict(list)
+    durumlar = collections.defaultdict(collections.Counter)
+    bitis = time.monotonic() + args.duration
+
+    def parola_istemcisi(i):
+        govde = json.dumps({'username': kullanicilar[i % len(kullanicilar)], 'password': 'bench-password'})
+        while time.monotonic() < bitis:
+            durum, sure = istek(port, '/api/auth/login/password', govde, 'application/json')
+            durumlar['password'][durum] += 1
+            if durum == 200:
+                sonuclar['password'].append(sure)
+            elif durum == 503:
+                time.sleep(0.05)  # Retry-After yerine kısa bekleme
+
+    def yuz_istemcisi(_):
+        while time.monotonic() < bitis:
+            durum, sure = istek(port, '/api/auth/login/face', jpeg, 'image/jpeg')
+            durumlar['face'][durum] += 1
+            sonuclar['face'].append(sure)
+
+    istemciler = [threading.Thread(target=parola_istemcisi, args=(i,)) for i in range(args.password_clients)]
+    istemciler += [threading.Thread(target=yuz_istemcisi, args=(i,)) for i in range(args.face_clients)]
+    for t in istemciler:
+        t.start()
+    for t in istemciler:
+        t.join()
+    sunucu.close()
+
+    print(json.dumps({
+        'password_per_s': round(len(sonuclar['password']) / args.duration, 1),
+        'password': yuzdelik(sonuclar['password']),
+        'password_statuses': dict(durumlar['password']),
+        'face': yuzdelik(sonuclar['face']),
+        'face_statuses': dict(durumlar['face']),
+        'hasher': password_hasher.stats(),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rounds', type=int, default=12, help='BCRYPT_ROUNDS')
+    parser.add_argument('--duration', type=float, default=10.0, help='Senaryo başına saniye')
+    parser.add_argument('--threads', type=int, default=4, help='WAITRESS_THREADS')
+    parser.add_argument('--password-clients', type=int, default=16)
+    parser.add_argument('--face-clients', type=int, default=2)
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--workers', type=int, default=-1, help='pool modunda PASSWORD_HASH_WORKERS (-1 = otomatik)')
+    parser.add_argument('--queue-depth', type=int, default=-1, help='pool modunda PASSWORD_HASH_QUEUE_DEPTH (-1 = otomatik)')
+    parser.add_argument('--mongo', action='store_true', help='mongomock yerine MONGO_URI kullan')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        cocuk(args)
+        return 0
+
+    print(f"bcrypt maliyeti {args.rounds}, Waitress {args.threads} thread, {args.password_clients} parola istemcisi, "
+          f"{args.duration:.0f} sn")
+    print(f"{'mod':<8}{'yüz':>5}{'giriş/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'503':>6}"
+          f"{'yüz p50':>9}{'yüz p95':>9}{'yüz p99':>9}")
+    for mod, workers in (('inline', 0), ('pool', args.workers)):
+        for yuz_istemcisi in (0, args.face_clients):
+            ortam = dict(os.environ, BCRYPT_ROUNDS=str(args.rounds), PASSWORD_HASH_WORKERS=str(workers),
+                         PASSWORD_HASH_QUEUE_DEPTH=str(args.queue_depth), RATE_LIMIT_ENABLED='false',
+                         WAITRESS_THREADS=str(args.threads), MODEL_PRELOAD='false')
+            komut = [sys.executable, os.path.abspath(__file__), '--child',
+                     '--rounds', str(args.rounds), '--duration', str(args.duration), '--threads', str(args.threads),
+                     '--password-clients', str(args.password_clients), '--face-clients', str(yuz_istemcisi),
+                     '--users', str(args.users)]
+            if args.mongo:
+                komut.append('--mongo')
+            cikti = subprocess.run(komut, env=ortam, cwd=KOK, capture_output=True, text=True)
+            satir = cikti.stdout.strip().splitlines()[-1] if cikti.stdout.strip() else ''
+            if cikti.returncode != 0 or not satir.startswith('{'):
+                print(f"{mod:<8} süreç başarısız: {cikti.stderr.strip().splitlines()[-1:]}")
+                continue
+            s = json.loads(satir)
+            p, f = s['password'], s['face']
+            print(f"{mod:<8}{yuz_istemcisi:>5}{s['password_per_s']:>9.1f}{p['p50_ms'] or 0:>9.1f}{p['p95_ms'] or 0:>9.1f}"
+                  f"{p['p99_ms'] or 0:>9.1f}{s['password_statuses'].get('503', 0):>6}"
+                  + (f"{f['p50_ms']:>9.1f}{f['p95_ms']:>9.1f}{f['p99_ms']:>9.1f}" if f['p50_ms'] is not None else f"{'-':>9}" * 3))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
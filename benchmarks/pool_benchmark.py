@@ -0,0 +1,77 @@
+"""
+Simge: Tek yüz embedding hattının (algılama + kırpma + FaceNet) çekirdek sayısıyla ölçeklenmesi.
+- thread: INFERENCE_MODE=thread gibi, N thread bu süreçteki modelleri paylaşıyor
+- process: INFERENCE_MODE=process gibi, N işçi süreci (kareler paylaşımlı bellekle aktarılıyor)
+Her N için saniyedeki görüntü sayısı ve 1'e göre hızlanma yazdırılır. Görüntüler istemci
+tarafında N eşzamanlı istek gibi gönderiliyor. MediaPipe/FaceNet kurulu olmalı.
+
+Kullanım:
+    python benchmarks/pool_benchmark.py --workers 1,2,4 --images 200
+    python benchmarks/pool_benchmark.py --threads-per-worker 2 --pinning auto
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.procpool import InferencePool, parse_cpu_sets  # noqa: E402
+from app.utils import embed_single_face, model_manager  # noqa: E402
+from downscale_benchmark import sentetik_kare  # noqa: E402
+
+
+def olc(embed, kare, eszamanli, adet):
+    # Hata kodları (yüz bulunamadı vb.) ayrıca döndürülüyor; varsa ölçüm anlamsız.
+    with ThreadPoolExecutor(max_workers=eszamanli) as havuz:
+        list(havuz.map(lambda _: embed(kare), range(eszamanli)))  # ısınma
+        baslangic = time.perf_counter()
+        sonuclar = list(havuz.map(lambda _: embed(kare), range(adet)))
+        sure = time.perf_counter() - baslangic
+    hatalar = {hata for _, hata in sonuclar if hata}
+    return adet / sure, hatalar
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', default='1,2,4', help='Denenecek thread/işçi sayıları')
+    parser.add_argument('--images', type=int, default=200)
+    parser.add_argument('--resolution', default='640x480')
+    parser.add_argument('--threads-per-worker', type=int, default=1)
+    parser.add_argument('--pinning', default='none', help="'none', 'auto' ya da '0,1;2,3'")
+    args = parser.parse_args()
+
+    width, height = (int(v) for v in args.resolution.lower().split('x'))
+    kare = sentetik_kare(width, height)
+    if not model_manager.load_all():
+        print(f"Modeller yüklenemedi: {model_manager.status()['errors']}")
+        return 1
+    print(f"{args.resolution}, {args.images} görüntü, işçi başına {args.threads_per_worker} thread, "
+          f"sabitleme '{args.pinning}', {os.cpu_count()} çekirdek")
+    print(f"{'N':>4}{'thread img/s':>14}{'hız':>7}{'process img/s':>15}{'hız':>7}  hatalar")
+    taban = {}
+    for n in (int(v) for v in args.workers.split(',')):
+        thread_hiz, thread_hata = olc(embed_single_face, kare, n, args.images)
+        havuz = InferencePool(workers=n, slots_per_worker=2, slot_bytes=max(kare.nbytes, 1 << 20),
+                              cpu_sets=parse_cpu_sets(args.pinning, n),
+                              threads_per_worker=args.threads_per_worker, timeout_s=30)
+        havuz.start()
+        while not havuz.is_ready():
+            if any(w['models'] and not w['ready'] for w in havuz.status()['workers']):
+                print("İşçi modelleri yükleyemedi.")
+                havuz.shutdown()
+                return 1
+            time.sleep(0.1)
+        # İstemci tarafı işçi başına iki istek: slotlar dolu kalsın, işçiler boşta beklemesin.
+        surec_hiz, surec_hata = olc(havuz.embed, kare, 2 * n, args.images)
+        havuz.shutdown()
+        taban.setdefault('thread', thread_hiz)
+        taban.setdefault('process', surec_hiz)
+        print(f"{n:>4}{thread_hiz:>14.1f}{thread_hiz / taban['thread']:>6.2f}x"
+              f"{surec_hiz:>15.1f}{surec_hiz / taban['process']:>6.2f}x  {sorted(thread_hata | surec_hata) or '-'}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
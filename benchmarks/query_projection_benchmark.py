@@ -0,0 +1,126 @@
+"""
+Simge: MongoDB okumalarında projeksiyonun etkisini ölçer. Her rota için eski sorgu
+(tüm doküman, embedding blob'ları dahil) ile yeni sorgu (USER_PROJECTIONS) arasında
+istek başına aktarılan BSON baytını ve gecikmeyi karşılaştırır.
+
+Varsayılan olarak mongomock üzerinde çalışır (baytlar birebir, gecikme sadece yaklaşık);
+gerçek sunucuda ölçmek için --mongo-uri verilebilir (ayrı bir veritabanı kullanın,
+benchmark o veritabanını siler).
+
+Kullanım:
+    python benchmarks/query_projection_benchmark.py --users 2000 --poses 12
+    python benchmarks/query_projection_benchmark.py --mongo-uri mongodb://localhost:27017 --db facesecure_bench
+"""
+import argparse
+import datetime
+import os
+import sys
+import time
+
+import bson
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.models import FailedLogin, User, ensure_indexes, face_profile_fields  # noqa: E402
+
+
+def seed(database, n_users, n_poses, n_failed, seed=0):
+    rng = np.random.default_rng(seed)
+    database.users.drop()
+    database.failed_logins.drop()
+    ensure_indexes(database)
+    sifre = "$2b$12$" + "x" * 53  # bcrypt özetiyle aynı uzunlukta
+    simdi = datetime.datetime.now(datetime.timezone.utc)
+    kullanicilar = []
+    for i in range(n_users):
+        kullanicilar.append({
+            "username": f"user{i}",
+            "password": sifre,
+            **face_profile_fields(rng.normal(size=(n_poses, 128)).astype(np.float32)),
+            "created_at": simdi,
+            "last_login": None,
+        })
+    database.users.insert_many(kullanicilar)
+    database.failed_logins.insert_many([
+        {"username": f"user{rng.integers(n_users)}", "ip_address": "10.0.0.1",
+         "timestamp": simdi - datetime.timedelta(seconds=int(s))}
+        for s in rng.integers(0, 86400, n_failed)
+    ])
+    return [str(u["_id"]) for u in database.users.find({}, {"_id": 1})]
+
+
+def olc(fn, tekrar):
+    boyutlar, sureler = [], []
+    for i in range(tekrar):
+        bas = time.perf_counter()
+        sonuc = fn(i)
+        sureler.append(time.perf_counter() - bas)
+        dokumanlar = sonuc if isinstance(sonuc, list) else [sonuc]
+        boyutlar.append(sum(len(bson.encode(d)) for d in dokumanlar if d is not None))
+    return np.mean(boyutlar), np.median(sureler) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--poses', type=int, default=12)
+    parser.add_argument('--failed', type=int, default=5000, help='failed_logins doküman sayısı')
+    parser.add_argument('--repeat', type=int, default=200, help='Tekil okumalarda tekrar sayısı')
+    parser.add_argument('--mongo-uri', default=None)
+    parser.add_argument('--db', default='facesecure_bench')
+    args = parser.parse_args()
+
+    if args.mongo_uri:
+        from pymongo import MongoClient
+        client = MongoClient(args.mongo_uri)
+    else:
+        import mongomock
+        client = mongomock.MongoClient()
+    database = client[args.db]
+    ids = seed(database, args.users, args.poses, args.failed)
+
+    user_model = User()
+    user_model.collection = database.users
+    failed_login_model = FailedLogin()
+    failed_login_model.collection = database.failed_logins
+    users, failed = database.users, database.failed_logins
+    ad = lambda i: f"user{i % args.users}"
+    oid = lambda i: bson.ObjectId(ids[i % len(ids)])
+    liste_tekrar = max(1, args.repeat // 50)
+
+    senaryolar = [
+        ('parola ile giriş', args.repeat,
+         lambda i: users.find_one({"username": ad(i)}),
+         lambda i: user_model.get_user_by_username(ad(i), 'credentials')),
+        ('kayıt (ad kontrolü)', args.repeat,
+         lambda i: users.find_one({"username": ad(i)}),
+         lambda i: user_model.get_user_by_username(ad(i), 'exists')),
+        ('yetkilendirme', args.repeat,
+         lambda i: users.find_one({"_id": oid(i)}),
+         lambda i: users.find_one({"_id": oid(i)}, {"username": 1, "role": 1})),
+        ('admin kullanıcılar', liste_tekrar,
+         lambda i: list(users.find({}, {"username": 1, "created_at": 1, "last_login": 1})),
+         lambda i: list(user_model.list_users())),
+        ('admin hatalı girişler', liste_tekrar,
+         lambda i: list(failed.find({}).sort("timestamp", -1)),
+         lambda i: list(failed_login_model.list_attempts())),
+    ]
+
+    print(f"{args.users} kullanıcı x {args.poses} poz, {args.failed} hatalı giriş ({'MongoDB' if args.mongo_uri else 'mongomock'})")
+    print(f"{'rota':<24}{'önce B':>12}{'sonra B':>12}{'küçülme':>10}{'önce ms':>10}{'sonra ms':>10}")
+    for rota, tekrar, once, sonra in senaryolar:
+        once_b, once_ms = olc(once, tekrar)
+        sonra_b, sonra_ms = olc(sonra, tekrar)
+        oran = once_b / sonra_b if sonra_b else 0
+        print(f"{rota:<24}{once_b:>12.0f}{sonra_b:>12.0f}{oran:>9.1f}x{once_ms:>10.3f}{sonra_ms:>10.3f}")
+
+    indeksler = sorted(database.users.index_information()) + sorted(database.failed_logins.index_information())
+    print(f"İndeksler: {', '.join(indeksler)}")
+    if args.mongo_uri:
+        client.drop_database(args.db)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,105 @@
+"""
+Simge: Soğuk başlangıç ölçümü. Her mod ayrı bir Python sürecinde çalıştırılıyor:
+- create_app() süresi (modüllerin import'u dahil)
+- /readyz 200 dönene kadar geçen süre (modeller yüklenip ısıtılana kadar)
+- ilk /api/utils/extract_embedding isteğinin gecikmesi ve sonraki isteklerin medyanı
+Modlar: MODEL_PRELOAD=true (arka planda yükleme + ısınma, ilk istek /readyz sonrasında)
+ve MODEL_PRELOAD=false (ilk istek modelleri yüklüyor).
+MongoDB yerine varsayılan olarak mongomock kullanılıyor (--mongo ile gerçek MONGO_URI).
+
+Kullanım:
+    python benchmarks/startup_benchmark.py --repeat 3
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+KOK = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def cocuk(mongo, istek_sayisi):
+    # Ayrı süreçte çalışıyor; sonuçları JSON olarak stdout'a yazıyor.
+    surec_baslangici = time.perf_counter()
+    sys.path.insert(0, KOK)
+    if not mongo:
+        import mongomock
+        import pymongo
+        pymongo.MongoClient = mongomock.MongoClient
+    import cv2
+    import numpy as np
+
+    from app import create_app
+    baslangic = time.perf_counter()
+    app = create_app()
+    create_app_s = time.perf_counter() - baslangic
+    client = app.test_client()
+
+    from config import Config
+    hazir_s = None
+    if Config.MODEL_PRELOAD:
+        while True:
+            yanit = client.get('/readyz')
+            if yanit.status_code == 200:
+                hazir_s = time.perf_counter() - surec_baslangici
+                break
+            if yanit.get_json()['models']['errors']:
+                break
+            time.sleep(0.05)
+
+    kare = np.full((480, 640, 3), 90, np.uint8)
+    cv2.ellipse(kare, (320, 240), (80, 110), 0, 0, 360, (150, 180, 220), -1)
+    jpeg = cv2.imencode('.jpg', kare)[1].tobytes()
+    sureler, durumlar = [], []
+    for _ in range(istek_sayisi):
+        bas = time.perf_counter()
+        yanit = client.post('/api/utils/extract_embedding', data=jpeg, content_type='image/jpeg')
+        sureler.append(time.perf_counter() - bas)
+        durumlar.append(yanit.status_code)
+    if hazir_s is None and client.get('/readyz').status_code == 200:
+        hazir_s = time.perf_counter() - surec_baslangici
+
+    print(json.dumps({
+        'create_app_s': create_app_s,
+        'ready_s': hazir_s,
+        'first_request_s': sureler[0],
+        'next_requests_median_s': float(np.median(sureler[1:])) if len(sureler) > 1 else None,
+        'statuses': sorted(set(durumlar)),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=3, help='Mod başına süreç sayısı')
+    parser.add_argument('--requests', type=int, default=5)
+    parser.add_argument('--mongo', action='store_true', help='mongomock yerine MONGO_URI kullan')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        cocuk(args.mongo, args.requests)
+        return 0
+
+    print(f"{'mod':<10}{'create_app s':>14}{'hazır s':>10}{'ilk istek s':>13}{'sonraki ms':>12}  durum")
+    for mod, preload in (('preload', 'true'), ('lazy', 'false')):
+        for _ in range(args.repeat):
+            ortam = dict(os.environ, MODEL_PRELOAD=preload)
+            komut = [sys.executable, os.path.abspath(__file__), '--child', '--requests', str(args.requests)]
+            if args.mongo:
+                komut.append('--mongo')
+            cikti = subprocess.run(komut, env=ortam, cwd=KOK, capture_output=True, text=True)
+            satir = cikti.stdout.strip().splitlines()[-1] if cikti.stdout.strip() else ''
+            if cikti.returncode != 0 or not satir.startswith('{'):
+                print(f"{mod:<10} süreç başarısız: {cikti.stderr.strip().splitlines()[-1:]}")
+                continue
+            s = json.loads(satir)
+            hazir = f"{s['ready_s']:.2f}" if s['ready_s'] is not None else '-'
+            sonraki = f"{s['next_requests_median_s'] * 1000:.1f}" if s['next_requests_median_s'] is not None else '-'
+            print(f"{mod:<10}{s['create_app_s']:>14.2f}{hazir:>10}{s['first_request_s']:>13.3f}{sonraki:>12}  {s['statuses']}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
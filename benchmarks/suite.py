@@ -0,0 +1,463 @@
+"""
+Simge: Yüz ile giriş hattının çevrimdışı benchmark paketi. Ağ, MongoDB ya da kamera gerekmiyor:
+veritabanı mongomock (users'ta _id/username sorguları indeksli; --mongo ile gerçek MONGO_URI),
+yüzler sentetik görüntüler, galerideki diğer kullanıcılar rastgele embedding'ler. Varsayılan olarak FaceNet ve MediaPipe yerine hafif taklitler
+kullanılıyor (--real-models ile kurulu gerçek modeller):
+- FaceNet taklidi: ön işlenmiş yüzü 8x8'e indirip sabit rastgele bir matrisle 512 boyuta izdüşürüyor;
+  aynı sentetik kişinin farklı çekimleri benzer, farklı kişiler benzemeyen embedding veriyor.
+- MediaPipe taklidi: sentetik yüzün kutusunu (YUZ_KUTUSU) döndürüyor.
+Taklitlerle ölçülen süreler modelin değil uygulama kodunun (çözme, kırpma, ön işleme, galeri arama,
+MongoDB, bcrypt, JWT, Flask) maliyeti; detect_faces/get_face_embedding değişikliklerinin modelden
+bağımsız etkisini görmek için.
+
+Her galeri boyutu ayrı bir süreçte ölçülüyor (tepe RSS süreç başına):
+- stages: aşama başına mikrobenchmark (medyan ve p99 µs)
+- end_to_end: Flask test istemcisiyle --concurrency thread'den yüz ile giriş (galeri araması ve
+  username_hint ile) ve parola ile giriş; saniyedeki yanıt, p50/p99 ve durum kodları
+- request_stages: bu isteklerde app.metrics'in ölçtüğü aşama süreleri
+- memory: kullanıcılar yazıldıktan ve galeri kurulduktan sonraki RSS, tepe RSS
+Sonuçlar commit, tarih ve ayarlarla birlikte JSON'a yazılıyor; --compare ile önceki bir çalıştırmayla
+karşılaştırılıyor. Uygulama logları (logs/access.log) benchmark süresince kapalı.
+
+Kullanım:
+    python benchmarks/suite.py
+    python benchmarks/suite.py --sizes 100,1000 --requests 100 --output /tmp/once.json
+    python benchmarks/suite.py --compare /tmp/once.json
+"""
+import argparse
+import collections
+import datetime
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import types
+
+KOK = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Sentetik yüzün karedeki yeri (oransal x, y, genişlik, yükseklik); downscale_benchmark.py ile aynı
+YUZ_KUTUSU = (0.38, 0.25, 0.24, 0.42)
+PAROLA = 'bench-password'
+
+
+def rss_mb():
+    # Anlık RSS (/proc); tepe için getrusage kullanılıyor.
+    try:
+        with open('/proc/self/statm') as f:
+            return round(int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20, 1)
+    except OSError:
+        return None
+
+
+def tepe_rss_mb():
+    # Linux'ta KB, macOS'ta bayt
+    tepe = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(tepe / (2 ** 20 if sys.platform == 'darwin' else 2 ** 10), 1)
+
+
+def yuzdelik(sureler):
+    import numpy as np
+    if not sureler:
+        return {'p50_ms': None, 'p99_ms': None}
+    p50, p99 = np.quantile(sureler, (0.5, 0.99)) * 1000
+    return {'p50_ms': round(float(p50), 2), 'p99_ms': round(float(p99), 2)}
+
+
+# FaceNet taklidinin embedding boyutu; keras-facenet'in varsayılan modeli gibi 512.
+TAKLIT_BOYUT = 512
+
+
+class TaklitFaceNet:
+    """Simge: keras_facenet.FaceNet yerine: (n, 160, 160, 3) -> (n, TAKLIT_BOYUT), sabit tohumlu izdüşüm."""
+
+    def __init__(self, dim):
+        import numpy as np
+        self._izdusum = np.random.default_rng(7).standard_normal((8 * 8 * 3, dim)).astype(np.float32)
+
+    def embeddings(self, yuzler):
+        import numpy as np
+        yuzler = np.asarray(yuzler, dtype=np.float32)
+        # 160x160 -> 8x8 blok ortalaması: ayrıntı (gürültü) düşüyor, kişiye özgü desen kalıyor
+        kucuk = yuzler.reshape(len(yuzler), 8, 20, 8, 20, 3).mean(axis=(2, 4))
+        return kucuk.reshape(len(yuzler), -1) @ self._izdusum
+
+
+def taklit_yuz_algilama():
+    """Simge: mediapipe.solutions.face_detection yerine: her karede YUZ_KUTUSU'nda tek yüz."""
+    x, y, w, h = YUZ_KUTUSU
+    sonuc = types.SimpleNamespace(detections=[types.SimpleNamespace(location_data=types.SimpleNamespace(
+        relative_bounding_box=types.SimpleNamespace(xmin=x, ymin=y, width=w, height=h)))])
+
+    class FaceDetection:
+        def __init__(self, min_detection_confidence=0.5):
+            self.min_detection_confidence = min_detection_confidence
+
+        def process(self, rgb):
+            return sonuc
+
+        def close(self):
+            pass
+
+    return types.SimpleNamespace(FaceDetection=FaceDetection)
+
+
+def sentetik_yuz(kisi, cekim, width=640, height=480):
+    """Simge: kisi numarasına özgü desenli bir yüz; cekim her seferinde farklı arka plan ve gürültü."""
+    import cv2
+    import numpy as np
+    rng = np.random.default_rng(10_000 + kisi)
+    desen = cv2.resize(rng.integers(40, 230, (6, 6, 3), dtype=np.uint8), (int(YUZ_KUTUSU[2] * width), int(YUZ_KUTUSU[3] * height)),
+                       interpolation=cv2.INTER_CUBIC)
+    gurultu = np.random.default_rng(1_000_000 * (kisi + 1) + cekim)
+    kare = gurultu.integers(60, 120, (height, width, 3), dtype=np.uint8)
+    x, y = int(YUZ_KUTUSU[0] * width), int(YUZ_KUTUSU[1] * height)
+    maske = np.zeros(desen.shape[:2], np.uint8)
+    cv2.ellipse(maske, (desen.shape[1] // 2, desen.shape[0] // 2), (desen.shape[1] // 2, desen.shape[0] // 2), 0, 0, 360, 255, -1)
+    bolge = kare[y:y + desen.shape[0], x:x + desen.shape[1]]
+    bolge[maske > 0] = desen[maske > 0]
+    kare = cv2.add(kare, gurultu.integers(0, 12, kare.shape, dtype=np.uint8))
+    return cv2.imencode('.jpg', kare, [cv2.IMWRITE_JPEG_QUALITY, 90])[1].tobytes()
+
+
+# indeksli_mongomock'un yazıldığı mongomock sürümü (benchmarks/requirements.txt'teki sabitleme)
+MONGOMOCK_SURUMU = '4.3.0'
+
+
+def indeksli_mongomock():
+    """
+    Simge: mongomock her sorguda koleksiyonun tamamını tarıyor; 100k kullanıcıda her okuma, last_login
+    yazması ve username_unique kontrolü (her eklemede) tek başına yüzlerce ms sürüp ölçümü MongoDB'ye değil
+    mongomock'a bağlıyordu. Gerçek MongoDB'deki _id ve username indeksleri gibi, users koleksiyonundaki
+    tek alanlı eşitlik sorgularında dokümanlar doğrudan bulunuyor; diğer sorgular eskisi gibi taranıyor.
+    mongomock'un özel metotları değiştirildiği için sadece MONGOMOCK_SURUMU'nde uygulanıyor; başka bir
+    sürümde uyarı verip düz mongomock ile devam ediyor (sonuçta 'mongo' alanı 'mongomock' olur).
+    Uygulandıysa True döner.
+    """
+    import mongomock
+    from mongomock.collection import Collection
+    from mongomock.store import CollectionStore
+    if mongomock.__version__ != MONGOMOCK_SURUMU or not hasattr(Collection, '_iter_documents'):
+        print(f"Uyarı: mongomock {mongomock.__version__} kurulu, indeksli sorgular {MONGOMOCK_SURUMU} için yazıldı; "
+              f"users sorguları taranacak (pip install -r benchmarks/requirements.txt).", file=sys.stderr)
+        return False
+    tara, yaz, sil = Collection._iter_documents, CollectionStore.__setitem__, CollectionStore.__delitem__
+
+    def indeks(store):
+        # username -> {_id}; aynı ada birden fazla doküman olursa username_unique kontrolü yakalasın diye küme
+        if '_kullanici_indeksi' not in store.__dict__:
+            store._kullanici_indeksi = collections.defaultdict(set)
+            for d in store.documents:
+                store._kullanici_indeksi[d.get('username')].add(d['_id'])
+        return store._kullanici_indeksi
+
+    def __setitem__(self, key, val):
+        if self.name == 'users':
+            eski = self._documents.get(key)
+            if eski is not None:
+                indeks(self)[eski.get('username')].discard(key)
+            indeks(self)[val.get('username')].add(key)
+        yaz(self, key, val)
+
+    def __delitem__(self, key):
+        if self.name == 'users' and key in self._documents:
+            indeks(self)[self._documents[key].get('username')].discard(key)
+        sil(self, key)
+
+    def _iter_documents(self, filter):
+        if self._store.name != 'users' or not isinstance(filter, dict) or len(filter) != 1:
+            return tara(self, filter)
+        alan, deger = next(iter(filter.items()))
+        if alan not in ('_id', 'username') or isinstance(deger, (dict, list)):
+            return tara(self, filter)
+        store = self._store
+        idler = [deger] if alan == '_id' else sorted(indeks(store).get(deger, ()))
+        return iter([store[i] for i in idler if i in store])
+
+    CollectionStore.__setitem__, CollectionStore.__delitem__ = __setitem__, __delitem__
+    Collection._iter_documents = _iter_documents
+    return True
+
+
+def mikro(fn, tekrar):
+    # Aşama başına medyan ve p99 (µs); ilk çağrılar ısınma
+    import numpy as np
+    for _ in range(min(5, tekrar)):
+        fn()
+    sureler = []
+    for _ in range(tekrar):
+        baslangic = time.perf_counter()
+        fn()
+        sureler.append(time.perf_counter() - baslangic)
+    p50, p99 = np.quantile(sureler, (0.5, 0.99)) * 1e6
+    return {'p50_us': round(float(p50), 1), 'p99_us': round(float(p99), 1)}
+
+
+def yuk(app, istekler, eszamanli):
+    # istekler: (yol, kwargs) listesi; her thread kendi test istemcisiyle sıradakini alıyor
+    sureler, durumlar = [], collections.Counter()
+    kilit = threading.Lock()
+    sira = iter(istekler)
+
+    def istemci():
+        client = app.test_client()
+        while True:
+            with kilit:
+                siradaki = next(sira, None)
+            if siradaki is None:
+                return
+            yol, kwargs = siradaki
+            baslangic = time.perf_counter()
+            durum = client.post(yol, **kwargs).status_code
+            sure = time.perf_counter() - baslangic
+            with kilit:
+                durumlar[durum] += 1
+                sureler.append(sure)
+
+    threadler = [threading.Thread(target=istemci) for _ in range(eszamanli)]
+    baslangic = time.perf_counter()
+    for t in threadler:
+        t.start()
+    for t in threadler:
+        t.join()
+    toplam = time.perf_counter() - baslangic
+    return {
+        'requests': len(sureler),
+        'req_per_s': round(len(sureler) / toplam, 1),
+        'ok_per_s': round(durumlar[200] / toplam, 1),
+        **yuzdelik(sureler),
+        'statuses': {str(d): n for d, n in sorted(durumlar.items())},
+    }
+
+
+def cocuk(args):
+    # Ayrı süreçte çalışıyor: tek galeri boyutunu ölçüp sonucu JSON olarak stdout'a yazıyor.
+    sys.path.insert(0, KOK)
+    if not args.mongo:
+        import mongomock
+        import pymongo
+        pymongo.MongoClient = mongomock.MongoClient
+        veritabani = 'mongomock-indexed' if indeksli_mongomock() else 'mongomock'
+    else:
+        veritabani = 'mongodb'
+    import numpy as np
+    from loguru import logger
+
+    logger.remove()  # uygulama logları kapalı (create_app'in eklediği dosya logu aşağıda kaldırılıyor)
+    from config import Config
+    from app import create_app
+    from app.gallery import gallery_index
+    from app.metrics import metrics
+    from app.models import User, face_profile_fields, generate_token
+    from app.passwords import password_hasher
+    from app.uploads import decode_image
+    from app.utils import (detect_faces, get_face_embedding, get_face_roi, model_manager, preprocess_face,
+                           single_face_roi)
+
+    if not args.real_models:
+        model_manager.override('facenet', lambda: TaklitFaceNet(TAKLIT_BOYUT))
+        model_manager.override('face_detection', taklit_yuz_algilama)
+
+    Config.LOG_FILE = os.path.join(tempfile.gettempdir(), 'facesecure-benchmark.log')  # logs/access.log'a yazılmasın
+    app = create_app()
+    # Sadece hatalar stderr'e
+    logger.remove()
+    logger.add(sys.stderr, level='ERROR')
+    if not model_manager.load_all():
+        raise SystemExit(f"Modeller yüklenemedi: {model_manager.status()['errors']}")
+
+    sonuc = {'size': args.size, 'mongo': veritabani, 'memory': {'rss_start_mb': rss_mb()}}
+    user_model = User()
+    rng = np.random.default_rng(args.size)
+
+    # Kayıtlı (eşleşecek) kişiler: pozları gerçek hattan (çözme, algılama, kırpma, FaceNet) geçiyor
+    kisi_sayisi = min(args.identities, args.size)
+    kisiler = [f"bench_probe_{k}" for k in range(kisi_sayisi)]
+
+    def hat_embedding(jpeg):
+        roi, hata = single_face_roi(decode_image(np.frombuffer(jpeg, np.uint8), Config.DECODE_TARGET_SIDE))
+        return None if hata else get_face_embedding(roi)
+
+    ozet = password_hasher.hash(PAROLA)  # tüm kullanıcılar aynı parolayı paylaşıyor, bcrypt bir kere
+    baslangic = time.perf_counter()
+    dokumanlar, boyut = [], None
+    for k, ad in enumerate(kisiler):
+        pozlar = [hat_embedding(sentetik_yuz(k, cekim)) for cekim in range(args.poses)]
+        alanlar = face_profile_fields(np.asarray([p for p in pozlar if p is not None], dtype=np.float32))
+        if alanlar is None:
+            # Ör. gerçek modelde yüz bulunamadı
+            raise SystemExit(f"'{ad}' için sentetik yüzlerden geçerli poz çıkarılamadı.")
+        boyut = boyut or next(len(p) for p in pozlar if p is not None)
+        dokumanlar.append({'username': ad, 'password': ozet, **alanlar,
+                           'created_at': datetime.datetime.now(datetime.timezone.utc), 'last_login': None})
+    # Galerinin geri kalanı: kişi başına bir merkez etrafında --poses rastgele poz (modelin çıktı boyutunda)
+    for i in range(args.size - kisi_sayisi):
+        merkez = rng.standard_normal(boyut).astype(np.float32)
+        pozlar = merkez + 0.3 * rng.standard_normal((args.poses, boyut)).astype(np.float32)
+        dokumanlar.append({'username': f"bench_user_{i}", 'password': ozet, **face_profile_fields(pozlar),
+                           'created_at': datetime.datetime.now(datetime.timezone.utc), 'last_login': None})
+        if len(dokumanlar) >= 5000:
+            user_model.collection.insert_many(dokumanlar)
+            dokumanlar = []
+    if dokumanlar:
+        user_model.collection.insert_many(dokumanlar)
+    sonuc['seed_s'] = round(time.perf_counter() - baslangic, 2)
+    sonuc['memory']['rss_after_seed_mb'] = rss_mb()
+
+    baslangic = time.perf_counter()
+    gallery_index.build(user_model.iter_gallery_entries())
+    sonuc['gallery_build_s'] = round(time.perf_counter() - baslangic, 2)
+    sonuc['gallery'] = gallery_index.stats()
+    sonuc['memory']['rss_after_gallery_mb'] = rss_mb()
+
+    # Aşama mikrobenchmark'ları: kayıtlı bir kişinin yeni bir çekimi üzerinde
+    jpeg = np.frombuffer(sentetik_yuz(0, 999), np.uint8)
+    kare = decode_image(jpeg, Config.DECODE_TARGET_SIDE)
+    kutu = detect_faces(kare)[0]
+    roi = get_face_roi(kare, kutu)
+    girdi = preprocess_face(roi)
+    facenet = model_manager.get('facenet')
+    sorgu = get_face_embedding(roi)
+    profil = user_model.get_face_profile(kisiler[0])
+    kimlik = user_model.get_user_by_username(kisiler[0], 'credentials')
+    tekrar = args.repeat
+    sonuc['stages'] = {
+        'decode_image': mikro(lambda: decode_image(jpeg, Config.DECODE_TARGET_SIDE), tekrar),
+        'detect_faces': mikro(lambda: detect_faces(kare), tekrar),
+        'get_face_roi': mikro(lambda: get_face_roi(kare, kutu), tekrar),
+        'preprocess_face': mikro(lambda: preprocess_face(roi), tekrar),
+        'facenet': mikro(lambda: facenet.embeddings(girdi), tekrar),
+        'get_face_embedding': mikro(lambda: get_face_embedding(roi), tekrar),
+        'gallery_search': mikro(lambda: gallery_index.search(sorgu, k=1), tekrar),
+        'hint_similarity': mikro(lambda: gallery_index.best_similarity(profil['matrix'], sorgu), tekrar),
+        'get_face_profile': mikro(lambda: user_model.get_face_profile(kisiler[0]), tekrar),
+        'user_fetch': mikro(lambda: user_model.get_user_by_username(kisiler[0], 'credentials'), min(tekrar, 50)),
+        'password_check': mikro(lambda: password_hasher.verify(kimlik['password'], PAROLA), min(tekrar, 20)),
+        'token': mikro(lambda: generate_token(kimlik['_id']), tekrar),
+    }
+    eslesen = gallery_index.search(sorgu, k=1)
+    sonuc['probe_match'] = {'username': eslesen[0][1], 'similarity': round(float(eslesen[0][2]), 2)} if eslesen else None
+
+    # Uçtan uca: kayıtlı kişilerin kayıtta kullanılmamış çekimleri
+    n = args.requests
+    sorgular = [sentetik_yuz(i % kisi_sayisi, 1000 + i // kisi_sayisi) for i in range(min(n, 4 * kisi_sayisi))]
+    metrics.reset()  # kayıt ve mikrobenchmark ölçümleri istek aşamalarına karışmasın
+    sonuc['end_to_end'] = {
+        'face_login': yuk(app, [('/api/auth/login/face', {'data': sorgular[i % len(sorgular)], 'content_type': 'image/jpeg'})
+                                for i in range(n)], args.concurrency),
+        'face_login_hint': yuk(app, [(f'/api/auth/login/face?username_hint={kisiler[i % len(sorgular) % kisi_sayisi]}',
+                                      {'data': sorgular[i % len(sorgular)], 'content_type': 'image/jpeg'})
+                                     for i in range(n)], args.concurrency),
+        'password_login': yuk(app, [('/api/auth/login/password',
+                                     {'json': {'username': kisiler[i % kisi_sayisi], 'password': PAROLA}})
+                                    for i in range(n)], args.concurrency),
+    }
+    sonuc['request_stages'] = metrics.snapshot()
+    sonuc['memory']['peak_rss_mb'] = tepe_rss_mb()
+    print(json.dumps(sonuc))
+
+
+def git_bilgisi():
+    def git(*komut):
+        try:
+            return subprocess.run(['git', *komut], cwd=KOK, capture_output=True, text=True, timeout=30).stdout.strip()
+        except (OSError, subprocess.SubprocessError):
+            return ''
+    return {'commit': git('rev-parse', 'HEAD') or None, 'dirty': bool(git('status', '--porcelain', '--untracked-files=no'))}
+
+
+def karsilastir(onceki, simdiki):
+    # Ortak galeri boyutlarında başlıca ölçümler: önceki -> şimdiki (oran)
+    def olcumler(s):
+        e2e = s['end_to_end']
+        yield 'peak_rss_mb', s['memory']['peak_rss_mb']
+        yield 'gallery_build_s', s['gallery_build_s']
+        for ad, asama in s['stages'].items():
+            yield f"stage.{ad}.p50_us", asama['p50_us']
+        for ad, senaryo in e2e.items():
+            yield f"{ad}.req_per_s", senaryo['req_per_s']
+            yield f"{ad}.p50_ms", senaryo['p50_ms']
+            yield f"{ad}.p99_ms", senaryo['p99_ms']
+
+    once = {s['size']: dict(olcumler(s)) for s in onceki['results']}
+    print(f"\nKarşılaştırma: {(onceki['meta'].get('commit') or '?')[:10]} -> {(simdiki['meta'].get('commit') or '?')[:10]}")
+    for s in simdiki['results']:
+        if s['size'] not in once:
+            continue
+        print(f"galeri {s['size']}:")
+        for ad, deger in olcumler(s):
+            eski = once[s['size']].get(ad)
+            oran = f"{deger / eski:6.2f}x" if eski and deger is not None else '      -'
+            print(f"  {ad:<36}{eski if eski is not None else '-':>12}{deger if deger is not None else '-':>12}  {oran}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='100,1000,10000,100000', help='Galerideki kullanıcı sayıları')
+    parser.add_argument('--identities', type=int, default=32, help='Eşleşecek (sentetik yüzü olan) kullanıcı sayısı')
+    parser.add_argument('--poses', type=int, default=5, help='Kullanıcı başına poz')
+    parser.add_argument('--requests', type=int, default=200, help='Uçtan uca senaryo başına istek')
+    parser.add_argument('--concurrency', type=int, default=4, help='Uçtan uca eşzamanlı istemci thread')
+    parser.add_argument('--repeat', type=int, default=200, help='Mikrobenchmark tekrar sayısı')
+    parser.add_argument('--rounds', type=int, default=10, help='BCRYPT_ROUNDS')
+    parser.add_argument('--real-models', action='store_true', help='Taklitler yerine kurulu FaceNet/MediaPipe')
+    parser.add_argument('--mongo', action='store_true', help='mongomock yerine MONGO_URI kullan (boş bir veritabanı olmalı)')
+    parser.add_argument('--output', help='JSON dosyası (varsayılan benchmarks/results/<tarih>-<commit>.json)')
+    parser.add_argument('--compare', help='Karşılaştırılacak önceki JSON')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--size', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        cocuk(args)
+        return 0
+
+    git = git_bilgisi()
+    zaman = datetime.datetime.now(datetime.timezone.utc)
+    cikti_yolu = args.output or os.path.join(KOK, 'benchmarks', 'results',
+                                             f"{zaman:%Y%m%d-%H%M%S}-{(git['commit'] or 'nogit')[:10]}.json")
+    rapor = {
+        'meta': {**git, 'timestamp': zaman.isoformat(timespec='seconds'), 'python': platform.python_version(),
+                 'platform': platform.platform(), 'cpu_count': os.cpu_count(),
+                 'args': {k: v for k, v in vars(args).items() if k not in ('child', 'size', 'output', 'compare')}},
+        'results': [],
+    }
+    # Oran sınırlayıcı ve ön yükleme kapalı; parola havuzu uygulamanın varsayılanlarıyla ölçülüyor.
+    ortam = dict(os.environ, RATE_LIMIT_ENABLED='false', MODEL_PRELOAD='false', BCRYPT_ROUNDS=str(args.rounds))
+
+    print(f"{'galeri':>8}{'kurulum s':>10}{'yüz/s':>8}{'p50 ms':>8}{'p99 ms':>8}{'ipucu/s':>9}{'p50 ms':>8}{'p99 ms':>8}"
+          f"{'parola/s':>9}{'p50 ms':>8}{'p99 ms':>8}{'tepe MB':>9}")
+    for boyut in (int(v) for v in args.sizes.split(',')):
+        komut = [sys.executable, os.path.abspath(__file__), '--child', '--size', str(boyut),
+                 '--identities', str(args.identities), '--poses', str(args.poses), '--requests', str(args.requests),
+                 '--concurrency', str(args.concurrency), '--repeat', str(args.repeat), '--rounds', str(args.rounds)]
+        komut += ['--real-models'] * args.real_models + ['--mongo'] * args.mongo
+        cikti = subprocess.run(komut, env=ortam, cwd=KOK, capture_output=True, text=True)
+        satir = cikti.stdout.strip().splitlines()[-1] if cikti.stdout.strip() else ''
+        if cikti.returncode != 0 or not satir.startswith('{'):
+            print(f"{boyut:>8} süreç başarısız: {cikti.stderr.strip().splitlines()[-1:]}")
+            continue
+        s = json.loads(satir)
+        rapor['results'].append(s)
+        e = s['end_to_end']
+        print(f"{boyut:>8}{s['gallery_build_s']:>10.2f}"
+              + ''.join(f"{e[ad]['req_per_s']:>{g}.1f}{e[ad]['p50_ms']:>8.1f}{e[ad]['p99_ms']:>8.1f}"
+                        for ad, g in (('face_login', 8), ('face_login_hint', 9), ('password_login', 9)))
+              + f"{s['memory']['peak_rss_mb']:>9.1f}")
+
+    os.makedirs(os.path.dirname(os.path.abspath(cikti_yolu)), exist_ok=True)
+    with open(cikti_yolu, 'w') as f:
+        json.dump(rapor, f, indent=2)
+    print(f"Sonuçlar: {cikti_yolu}")
+    if args.compare:
+        with open(args.compare) as f:
+            karsilastir(json.load(f), rapor)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
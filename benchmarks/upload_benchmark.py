@@ -0,0 +1,84 @@
+"""
+Simge: Yüz ile giriş / embedding çıkarımı için görüntü yükleme biçimlerini karşılaştırır.
+Aynı kare JSON içinde base64 data URL, multipart/form-data ve ham image/jpeg gövde olarak
+hazırlanıp istek boyutu ve sunucu tarafında gövdeyi okuma + cv2.imdecode süresi ölçülür.
+Sadece app.uploads kullanılıyor, model ya da MongoDB gerekmiyor.
+
+Kullanım:
+    python benchmarks/upload_benchmark.py --width 640 --height 480 --quality 90 --repeat 200
+"""
+import argparse
+import base64
+import io
+import json
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+from flask import Flask, request
+from werkzeug.test import EnvironBuilder
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.uploads import decode_image, request_image_bytes  # noqa: E402
+
+
+def synthetic_frame(width, height, seed=0):
+    # Düz gürültü JPEG'de gerçekçi olmayan kadar büyük çıkıyor; yumuşak desen + biraz gürültü.
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    desen = 127 + 60 * np.sin(x / 23.0) * np.cos(y / 31.0)
+    kare = np.stack([desen, np.roll(desen, 40, axis=1), np.roll(desen, 80, axis=0)], axis=2)
+    kare += rng.normal(0, 6, kare.shape)
+    return np.clip(kare, 0, 255).astype(np.uint8)
+
+
+def builders(jpeg):
+    data_url = 'data:image/jpeg;base64,' + base64.b64encode(jpeg).decode('ascii')
+    return {
+        'json (data URL)': lambda: EnvironBuilder(method='POST', path='/', data=json.dumps({'image': data_url}),
+                                                  content_type='application/json'),
+        'multipart': lambda: EnvironBuilder(method='POST', path='/', data={'image': (io.BytesIO(jpeg), 'frame.jpg', 'image/jpeg')}),
+        'image/jpeg': lambda: EnvironBuilder(method='POST', path='/', data=jpeg, content_type='image/jpeg'),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--width', type=int, default=640)
+    parser.add_argument('--height', type=int, default=480)
+    parser.add_argument('--quality', type=int, default=90, help='JPEG kalitesi (tarayıcıdaki toBlob 0.9 ile aynı)')
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    kare = synthetic_frame(args.width, args.height)
+    jpeg = cv2.imencode('.jpg', kare, [cv2.IMWRITE_JPEG_QUALITY, args.quality])[1].tobytes()
+    app = Flask(__name__)
+
+    print(f"{args.width}x{args.height} JPEG (kalite {args.quality}): {len(jpeg)} B, {args.repeat} tekrar")
+    print(f"{'biçim':<18}{'istek B':>10}{'oran':>8}{'okuma ms':>11}{'decode ms':>11}{'toplam ms':>11}")
+    for ad, builder in builders(jpeg).items():
+        okuma, cozme, boyut = [], [], 0
+        for _ in range(args.repeat):
+            environ = builder().get_environ()
+            boyut = int(environ.get('CONTENT_LENGTH') or 0)
+            with app.request_context(environ):
+                bas = time.perf_counter()
+                veri = request_image_bytes(request)
+                ara = time.perf_counter()
+                frame = decode_image(veri)
+                son = time.perf_counter()
+            if frame is None:
+                print(f"{ad}: görüntü çözülemedi")
+                return 1
+            okuma.append(ara - bas)
+            cozme.append(son - ara)
+        okuma_ms, cozme_ms = np.median(okuma) * 1000, np.median(cozme) * 1000
+        print(f"{ad:<18}{boyut:>10}{boyut / len(jpeg):>8.2f}{okuma_ms:>11.3f}{cozme_ms:>11.3f}{okuma_ms + cozme_ms:>11.3f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
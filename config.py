@@ -18,7 +18,162 @@ class Config:
 
    
     DETECTION_CONFIDENCE = 0.70 
+
+    # 1:N yüz araması için galeri arama motoru: 'exact' (tam tarama), 'ivf' (yaklaşık),
+    # 'int8' veya 'pq' (nicemlenmiş kodlar üzerinden arama + float yeniden skorlama)
+    GALLERY_SEARCH_BACKEND = os.getenv('GALLERY_SEARCH_BACKEND', 'exact')
+    # IVF küme sayısı (0 = galeri boyutuna göre otomatik) ve sorguda taranan küme sayısı.
+    # IVF_NPROBE doğruluk/gecikme ayarıdır: büyüdükçe recall artar, arama yavaşlar.
+    IVF_NLIST = int(os.getenv('IVF_NLIST', 0))
+    IVF_NPROBE = int(os.getenv('IVF_NPROBE', 16))
+    # Bu satır sayısının altındaki galerilerde IVF eğitilmez, tam tarama yapılır.
+    IVF_MIN_TRAIN_SIZE = int(os.getenv('IVF_MIN_TRAIN_SIZE', 20000))
+    # Nicemlenmiş aramada float vektörlerle tam olarak yeniden skorlanan aday satır sayısı
+    QUANTIZED_RERANK_K = int(os.getenv('QUANTIZED_RERANK_K', 64))
+    # PQ: alt uzay sayısı (vektör başına bayt) ve alt uzay başına kod kitabı boyutu (en fazla 256)
+    PQ_SUBSPACES = int(os.getenv('PQ_SUBSPACES', 16))
+    PQ_CODEBOOK_SIZE = int(os.getenv('PQ_CODEBOOK_SIZE', 256))
+    # Nicemleyici galeri eğitildiği boyutun iki katına çıkınca yeniden eğitiliyor. Bu satır sayısına
+    # ulaşılana kadar float satırlar (GALLERY_KEEP_FLOAT_VECTORS=false olsa da) yeniden eğitim için tutuluyor.
+    QUANTIZED_MIN_TRAIN_SIZE = int(os.getenv('QUANTIZED_MIN_TRAIN_SIZE', 4096))
+    # false ise nicemlenmiş motorlarda float galeri matrisi bellekte tutulmaz,
+    # yeniden skorlama için adayların vektörleri MongoDB'den okunur.
+    GALLERY_KEEP_FLOAT_VECTORS = os.getenv('GALLERY_KEEP_FLOAT_VECTORS', 'true').lower() == 'true'
+
+    # PCA ile boyut indirgeme: açıksa galeri eşleştirmesi PCA_MODEL_PATH'teki izdüşümle
+    # indirgenmiş uzayda yapılır. İzdüşüm tools/pca.py fit ile üretilir.
+    PCA_ENABLED = os.getenv('PCA_ENABLED', 'false').lower() == 'true'
+    PCA_COMPONENTS = int(os.getenv('PCA_COMPONENTS', 64))
+    PCA_MODEL_PATH = os.getenv('PCA_MODEL_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models', 'pca_projection.npz'))
+
+    # Kayıt sonrası işleme: birbirine bu benzerlikten (0-100) fazla benzeyen pozlardan biri atılır
+    # (100 = kapalı), kalan pozlardan en fazla PROTOTYPES_PER_USER farklı prototip seçilir.
+    POSE_DEDUP_SIMILARITY = float(os.getenv('POSE_DEDUP_SIMILARITY', 98))
+    PROTOTYPES_PER_USER = int(os.getenv('PROTOTYPES_PER_USER', 4))
+    # true ise galeri (1:N) tüm pozlar yerine kullanıcıların prototipleriyle eşleştirir.
+    GALLERY_USE_PROTOTYPES = os.getenv('GALLERY_USE_PROTOTYPES', 'true').lower() == 'true'
+    # İki aşamalı eşleştirme: önce kullanıcı merkezleriyle en iyi CENTROID_SHORTLIST kullanıcı
+    # seçilir, arama motoru sadece onların satırları arasından aday seçer. Sonuç yaklaşık olur,
+    # bu yüzden varsayılan 0 (kapalı; motor tüm galeriye bakar).
+    CENTROID_SHORTLIST = int(os.getenv('CENTROID_SHORTLIST', 0))
+
+    # Flask'ın kabul ettiği en büyük istek gövdesi (bayt); aşılırsa 413. Görüntü yüklemeleri için sınır.
+    MAX_CONTENT_LENGTH = int(os.getenv('MAX_CONTENT_LENGTH', 16 * 1024 * 1024))
+
+    # Yüklenen görüntünün ön işlenmesi. Uzun kenarı DECODE_TARGET_SIDE'ın en az iki katı olan JPEG'ler
+    # 1/2, 1/4 ya da 1/8 boyutta çözülür (0 = her zaman tam boyut). Yüz algılama uzun kenarı
+    # DETECTION_MAX_SIDE'a küçültülmüş karede yapılır (0 = küçültme yok), yüz bölgesi çözülen kareden kırpılır.
+    DECODE_TARGET_SIDE = int(os.getenv('DECODE_TARGET_SIDE', 960))
+    DETECTION_MAX_SIDE = int(os.getenv('DETECTION_MAX_SIDE', 320))
+    # Yüz kutusunun her kenarına eklenen pay (kutu boyutunun oranı). Kayıtlı embedding'ler payla
+    # çıkarılmadığı için değiştirilirse kullanıcıların yeniden kayıt olması gerekir.
+    FACE_ROI_MARGIN = float(os.getenv('FACE_ROI_MARGIN', 0.0))
+
+    # Toplu embedding isteğinde (/api/utils/extract_embeddings) kabul edilen en fazla görüntü
+    EMBEDDING_BATCH_MAX_IMAGES = int(os.getenv('EMBEDDING_BATCH_MAX_IMAGES', 32))
+
+    # İstekler arası FaceNet mikro-toplama: en fazla kaç yüz bir arada işlenir,
+    # ilk yüz en fazla kaç ms bekletilir ve kuyrukta en fazla kaç yüz birikebilir.
+    INFERENCE_BATCHING_ENABLED = os.getenv('INFERENCE_BATCHING_ENABLED', 'true').lower() == 'true'
+    INFERENCE_MAX_BATCH_SIZE = int(os.getenv('INFERENCE_MAX_BATCH_SIZE', 16))
+    INFERENCE_MAX_WAIT_MS = float(os.getenv('INFERENCE_MAX_WAIT_MS', 5))
+    INFERENCE_QUEUE_DEPTH = int(os.getenv('INFERENCE_QUEUE_DEPTH', 256))
+    INFERENCE_TIMEOUT_S = float(os.getenv('INFERENCE_TIMEOUT_S', 10))
+
+    # Çıkarım modu: 'thread' (Waitress thread'leri bu süreçteki modelleri paylaşır) ya da 'process'
+    # (algılama + FaceNet ayrı işçi süreçlerinde, kareler paylaşımlı bellekle aktarılır).
+    # İşçi sayısı (0 = çekirdek sayısı / işçi başına thread), işçi başına TF/OpenMP thread sayısı,
+    # işçi başına paylaşımlı bellek slotu ve slot boyutu (MB), CPU sabitleme: 'none', 'auto' ya da '0,1;2,3'.
+    INFERENCE_MODE = os.getenv('INFERENCE_MODE', 'thread')
+    INFERENCE_POOL_WORKERS = int(os.getenv('INFERENCE_POOL_WORKERS', 0))
+    INFERENCE_POOL_THREADS_PER_WORKER = int(os.getenv('INFERENCE_POOL_THREADS_PER_WORKER', 1))
+    INFERENCE_POOL_SLOTS_PER_WORKER = int(os.getenv('INFERENCE_POOL_SLOTS_PER_WORKER', 2))
+    INFERENCE_POOL_SLOT_MB = int(os.getenv('INFERENCE_POOL_SLOT_MB', 8))
+    INFERENCE_POOL_CPU_PINNING = os.getenv('INFERENCE_POOL_CPU_PINNING', 'none')
+
+    # bcrypt maliyet faktörü (2^rounds tur). Farklı maliyetle saklanmış parolalar başarılı girişte yeniden özetleniyor.
+    # Özetleme/doğrulama PASSWORD_HASH_WORKERS thread'lik ayrı havuzda yapılıyor (0 = istek thread'inde);
+    # havuzda ve kuyrukta yer yoksa istek en fazla PASSWORD_HASH_ADMIT_WAIT_S bekleyip 503 alıyor.
+    # WORKERS + QUEUE_DEPTH, WAITRESS_THREADS'ten küçük kalmalı ki parola patlamasında yüz ile giriş için
+    # boş Waitress thread'i kalsın. -1 = otomatik: toplam WAITRESS_THREADS - 1, işçi sayısı en fazla çekirdek sayısı.
+    BCRYPT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS', 12))
+    PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', -1))
+    PASSWORD_HASH_QUEUE_DEPTH = int(os.getenv('PASSWORD_HASH_QUEUE_DEPTH', -1))
+    PASSWORD_HASH_ADMIT_WAIT_S = float(os.getenv('PASSWORD_HASH_ADMIT_WAIT_S', 1.0))
+    PASSWORD_HASH_TIMEOUT_S = float(os.getenv('PASSWORD_HASH_TIMEOUT_S', 10))
+
+    # username_hint ile girişte kullanılan kullanıcı embedding önbelleği (LRU + TTL)
+    USER_CACHE_MAX_SIZE = int(os.getenv('USER_CACHE_MAX_SIZE', 1024))
+    USER_CACHE_TTL_S = int(os.getenv('USER_CACHE_TTL_S', 300))
+    # Yetkilendirmede kullanılan kimlik (principal) önbelleği; TTL kısa tutulmalı
+    PRINCIPAL_CACHE_MAX_SIZE = int(os.getenv('PRINCIPAL_CACHE_MAX_SIZE', 4096))
+    PRINCIPAL_CACHE_TTL_S = int(os.getenv('PRINCIPAL_CACHE_TTL_S', 30))
+
+    # Hatalı giriş kayıtları bu kadar gün sonra TTL indeksiyle otomatik silinir (0 = süresiz saklanır)
+    FAILED_LOGIN_RETENTION_DAYS = int(os.getenv('FAILED_LOGIN_RETENTION_DAYS', 90))
+
+    # Hatalı giriş kayıtları istek thread'inde değil arka planda toplu (insert_many) yazılır.
+    # Bir toplu yazmada en fazla kaç kayıt, ilk kayıt en fazla kaç ms bekletilir, kuyrukta en fazla
+    # kaç kayıt birikebilir ve kuyruk dolunca ne yapılır: 'drop' (düşür ve say) ya da 'block' (bekle).
+    FAILED_LOGIN_ASYNC = os.getenv('FAILED_LOGIN_ASYNC', 'true').lower() == 'true'
+    FAILED_LOGIN_BATCH_SIZE = int(os.getenv('FAILED_LOGIN_BATCH_SIZE', 100))
+    FAILED_LOGIN_FLUSH_MS = float(os.getenv('FAILED_LOGIN_FLUSH_MS', 500))
+    FAILED_LOGIN_QUEUE_DEPTH = int(os.getenv('FAILED_LOGIN_QUEUE_DEPTH', 10000))
+    FAILED_LOGIN_OVERFLOW = os.getenv('FAILED_LOGIN_OVERFLOW', 'drop')
+    FAILED_LOGIN_BLOCK_TIMEOUT_S = float(os.getenv('FAILED_LOGIN_BLOCK_TIMEOUT_S', 1.0))
+
+    # Giriş uç noktaları için oran sınırlama (kayan pencere). Pencere içinde IP başına en fazla
+    # RATE_LIMIT_IP_REQUESTS istek işlenir; IP başına RATE_LIMIT_IP_FAILURES ya da kullanıcı adı başına
+    # RATE_LIMIT_USERNAME_FAILURES hatalı girişte IP/kullanıcı adı RATE_LIMIT_LOCKOUT_S saniye kilitlenir.
+    # Sayaçlar varsayılan olarak süreç içinde ('memory'); birden fazla süreç için 'mongo'.
+    RATE_LIMIT_ENABLED = os.getenv('RATE_LIMIT_ENABLED', 'true').lower() == 'true'
+    RATE_LIMIT_STORE = os.getenv('RATE_LIMIT_STORE', 'memory')
+    RATE_LIMIT_WINDOW_S = int(os.getenv('RATE_LIMIT_WINDOW_S', 60))
+    RATE_LIMIT_IP_REQUESTS = int(os.getenv('RATE_LIMIT_IP_REQUESTS', 30))
+    RATE_LIMIT_IP_FAILURES = int(os.getenv('RATE_LIMIT_IP_FAILURES', 20))
+    RATE_LIMIT_USERNAME_FAILURES = int(os.getenv('RATE_LIMIT_USERNAME_FAILURES', 5))
+    RATE_LIMIT_LOCKOUT_S = int(os.getenv('RATE_LIMIT_LOCKOUT_S', 300))
+
+    # /video_feed kare kaynağı: kamera indeksi ('0'), video dosyası/akış URL'si ya da
+    # test için 'synthetic' / 'synthetic:640x480@30'. Tüm izleyiciler tek kaynağı paylaşır.
+    VIDEO_SOURCE = os.getenv('VIDEO_SOURCE', '0')
+    # Canlı yayın: yüz algılama kaç karede bir yapılır (1 = her kare, aradaki karelerde kutular izlenir),
+    # hedef FPS (yavaş izleyicilerde otomatik düşer), JPEG kalitesi ve çıktı karesinin uzun kenarı (0 = kaynak boyutu).
+    VIDEO_DETECT_EVERY_N = int(os.getenv('VIDEO_DETECT_EVERY_N', 5))
+    VIDEO_TARGET_FPS = float(os.getenv('VIDEO_TARGET_FPS', 15))
+    VIDEO_JPEG_QUALITY = int(os.getenv('VIDEO_JPEG_QUALITY', 80))
+    VIDEO_OUTPUT_MAX_SIDE = int(os.getenv('VIDEO_OUTPUT_MAX_SIDE', 640))
+
+    # /metrics (Prometheus metin biçimi). 'Authorization: Bearer <METRICS_TOKEN>' ya da admin JWT'si istenir
+    # (METRICS_TOKEN boşsa sadece admin JWT'si).
+    # Yüzdelikler (p50/p95/p99) aşama başına son METRICS_WINDOW ölçümden hesaplanır.
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+    METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+    METRICS_WINDOW = int(os.getenv('METRICS_WINDOW', 2048))
+    # Yanıtlara aşama sürelerini içeren Server-Timing başlığı eklenir (tarayıcıdan profil çıkarmak için)
+    SERVER_TIMING_ENABLED = os.getenv('SERVER_TIMING_ENABLED', 'false').lower() == 'true'
+
+    # FaceNet/MediaPipe create_app sonrasında arka plan thread'inde yüklenip ısıtılır (false = ilk kullanımda yüklenir)
+    MODEL_PRELOAD = os.getenv('MODEL_PRELOAD', 'true').lower() == 'true'
+    # Yüklenemeyen model bu kadar saniye sonra tekrar denenir (hata kalıcı sayılmaz)
+    MODEL_RETRY_AFTER_S = float(os.getenv('MODEL_RETRY_AFTER_S', 30))
+    # /readyz MongoDB'ye ping atarken sunucu seçimi dahil en fazla bu kadar bekler
+    READYZ_MONGO_TIMEOUT_MS = int(os.getenv('READYZ_MONGO_TIMEOUT_MS', 500))
+
+    # Yönetim paneli listelerinde sayfa boyutu (limit parametresi verilmezse) ve izin verilen en büyük limit
+    ADMIN_PAGE_SIZE = int(os.getenv('ADMIN_PAGE_SIZE', 50))
+    ADMIN_PAGE_SIZE_MAX = int(os.getenv('ADMIN_PAGE_SIZE_MAX', 500))
+
+    # Yüz embedding'lerinin MongoDB'de saklanma tipi: 'float32' veya 'float16' (yarı boyut)
+    EMBEDDING_STORAGE_DTYPE = os.getenv('EMBEDDING_STORAGE_DTYPE', 'float32')
     
     #Flask uygulamasının çalışacağı port
     
     FLASK_PORT = int(os.getenv('FLASK_PORT', 5000)) 
+    # Waitress istek thread sayısı (Waitress varsayılanı 4)
+    WAITRESS_THREADS = int(os.getenv('WAITRESS_THREADS', 4))
+    # ASGI modu (asgi.py): çözme/algılama/FaceNet executor thread sayısı (0 = çekirdek sayısı) ve
+    # yol başına eşzamanlı istek sınırı ('yol=sınır' virgülle ayrılmış; aşan istek 503 alıyor).
+    # Flask'a giden diğer yollar WAITRESS_THREADS thread'lik WSGI köprüsünden geçiyor.
+    ASGI_CPU_WORKERS = int(os.getenv('ASGI_CPU_WORKERS', 0))
+    ASGI_ENDPOINT_LIMITS = os.getenv('ASGI_ENDPOINT_LIMITS', '/api/auth/login/face=256,/api/utils/extract_embedding=128,/video_feed=16')
@@ -6,21 +6,19 @@ from loguru import logger
 import os 
 
 
-# Uygulama objesini oluştur
-
-app = create_app()
-
-
-@app.before_first_request
-def create_admin_user_if_not_exists():
+def create_admin_user_if_not_exists(app):
+    """
+    Simge: Varsayılan admin kullanıcısını yoksa oluşturur. Eskiden before_first_request ile
+    ilk isteğin içinde çalışıyordu; artık sunucu dinlemeye başlamadan önce bir kere çağrılıyor.
+    """
     with app.app_context(): # Flask uygulama bağlamı içinde çalıştır
         user_model = User()
         # Admin kullanıcısının olup olmadığını kontrol et
-        if user_model.get_user_by_username(Config.ADMIN_USERNAME) is None:
+        if not user_model.username_exists(Config.ADMIN_USERNAME):
             
 
             # Bu, uygulamanın sorunsuz başlamasını sağlıyor.
-            dummy_embedding = np.random.rand(128).tolist() # 128 boyutlu rastgele bir embedding
+            dummy_embedding = np.random.rand(512).tolist() # FaceNet (varsayılan model) boyutunda rastgele bir embedding
             # Admin kullanıcısını oluştur
             user_model.create_user(Config.ADMIN_USERNAME, Config.ADMIN_PASSWORD, [dummy_embedding])
             logger.info(f"Varsayılan admin kullanıcısı '{Config.ADMIN_USERNAME}' başarıyla oluşturuldu.")
@@ -31,13 +29,26 @@ def create_admin_user_if_not_exists():
     logger.info("Uygulama başlangıç ön-işlemleri tamamlandı.")
 
 
+def create_server_app():
+    """
+    Simge: Sunucunun çalıştıracağı Flask uygulamasını oluşturup varsayılan admini kontrol eder.
+    Modül seviyesinde değil bu fonksiyonla yapılıyor: INFERENCE_MODE=process'te çıkarım havuzu
+    işçileri spawn ile başlıyor ve her işçi __main__ modülünü (main.py/asgi.py) yeniden import
+    ediyor. Uygulama import sırasında kurulsaydı her işçi galeriyi kurup kendi havuzunu başlatmaya
+    çalışacak, RuntimeError ile ölüp sürekli yeniden başlatılacaktı.
+    """
+    app = create_app()
+    create_admin_user_if_not_exists(app)
+    return app
+
 
 if __name__ == '__main__':
+    app = create_server_app()
 
     try:
         from waitress import serve
         logger.info(f"Waitress sunucusu başlatılıyor. Dinlenen port: {Config.FLASK_PORT}") # Log ekledim
-        serve(app, host="0.0.0.0", port=Config.FLASK_PORT)
+        serve(app, host="0.0.0.0", port=Config.FLASK_PORT, threads=Config.WAITRESS_THREADS)
     except ImportError:
         logger.warning("Waitress bulunamadı, Flask geliştirme sunucusu kullanılıyor. Üretim için Waitress'i kurmayı unutma!")
         app.run(debug=True, host='0.0.0.0', port=Config.FLASK_PORT) 
@@ -0,0 +1,63 @@
+"""
+Simge: Kayıt sonrası işlemeden (tekrar eden pozları atma, prototip hesaplama)
+önce oluşturulmuş kullanıcılar için face_prototypes alanını doldurur.
+Sadece face_prototypes alanı olmayan dokümanlara dokunur, tekrar çalıştırmak güvenli.
+--dedup verilirse face_embeddings de tekrarları atılmış pozlarla değiştirilir.
+
+Kullanım:
+    python tools/backfill_prototypes.py [--dedup] [--batch-size 500] [--dry-run]
+"""
+import argparse
+import os
+import sys
+
+from pymongo import UpdateOne
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.models import db, decode_face_embeddings, face_profile_fields  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dedup', action='store_true', help='face_embeddings alanını da tekrarları atılmış pozlarla güncelle')
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--dry-run', action='store_true', help='Sadece kaç satır kazanılacağını hesapla, yazma')
+    args = parser.parse_args()
+
+    if db is None:
+        print("MongoDB bağlantısı yok.")
+        return 1
+
+    islenen = atlanan = eski_poz = yeni_poz = prototip = 0
+    islemler = []
+    for user in db.users.find({"face_prototypes": {"$exists": False}}, {"face_embeddings": 1}):
+        pozlar = decode_face_embeddings(user.get('face_embeddings'))
+        alanlar = face_profile_fields(pozlar)
+        if alanlar is None:
+            atlanan += 1
+            continue
+        islenen += 1
+        eski_poz += pozlar.shape[0]
+        yeni_poz += alanlar['face_embeddings']['shape'][0]
+        prototip += alanlar['face_prototypes']['shape'][0]
+        if not args.dedup:
+            del alanlar['face_embeddings']
+        if not args.dry_run:
+            islemler.append(UpdateOne({"_id": user['_id']}, {"$set": alanlar}))
+            if len(islemler) >= args.batch_size:
+                db.users.bulk_write(islemler, ordered=False)
+                islemler = []
+    if islemler:
+        db.users.bulk_write(islemler, ordered=False)
+
+    print(f"{islenen} doküman {'işlenecek' if args.dry_run else 'işlendi'}, {atlanan} doküman geçerli poz olmadığı için atlandı.")
+    if islenen:
+        print(f"Poz sayısı: {eski_poz} -> {yeni_poz} (tekrarlar atılınca), prototip: {prototip} "
+              f"(kullanıcı başına ort. {prototip / islenen:.1f}). Galeri bir sonraki açılışta ya da "
+              f"/api/admin/gallery/rebuild ile prototiplerle kurulur.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
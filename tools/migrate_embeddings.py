@@ -0,0 +1,56 @@
+"""
+Simge: users koleksiyonundaki eski (BSON float listesi) face_embeddings alanlarını
+tek seferde ikili blob formatına çevirir. Zaten çevrilmiş dokümanlara dokunmaz,
+yani tekrar çalıştırmak güvenli.
+
+Kullanım:
+    python tools/migrate_embeddings.py [--dtype float16] [--batch-size 500] [--dry-run]
+"""
+import argparse
+import os
+import sys
+
+import bson
+from pymongo import UpdateOne
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config  # noqa: E402
+from app.models import EMBEDDING_STORAGE_DTYPES, db, encode_face_embeddings  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dtype', choices=EMBEDDING_STORAGE_DTYPES, default=Config.EMBEDDING_STORAGE_DTYPE)
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--dry-run', action='store_true', help='Sadece boyut kazancını hesapla, yazma')
+    args = parser.parse_args()
+
+    if db is None:
+        print("MongoDB bağlantısı yok.")
+        return 1
+
+    eski_boyut = yeni_boyut = donusen = 0
+    islemler = []
+    # $type: 'array' sadece eski liste formatındaki dokümanları seçiyor.
+    for user in db.users.find({"face_embeddings": {"$type": "array"}}, {"face_embeddings": 1}):
+        blob = encode_face_embeddings(user['face_embeddings'], args.dtype)
+        eski_boyut += len(bson.encode({"face_embeddings": user['face_embeddings']}))
+        yeni_boyut += len(bson.encode({"face_embeddings": blob}))
+        donusen += 1
+        if not args.dry_run:
+            islemler.append(UpdateOne({"_id": user['_id']}, {"$set": {"face_embeddings": blob}}))
+            if len(islemler) >= args.batch_size:
+                db.users.bulk_write(islemler, ordered=False)
+                islemler = []
+    if islemler:
+        db.users.bulk_write(islemler, ordered=False)
+
+    oran = eski_boyut / yeni_boyut if yeni_boyut else 0
+    print(f"{donusen} doküman {'çevrilecek' if args.dry_run else 'çevrildi'} ({args.dtype}). "
+          f"Embedding alanı: {eski_boyut} B -> {yeni_boyut} B ({oran:.1f}x küçülme)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,79 @@
+"""
+Simge: Eski sürümlerin yerel saatle (saat dilimsiz datetime.now()) yazdığı zaman damgalarını UTC'ye
+çevirir. pymongo saat dilimsiz datetime'ı UTC kabul ettiği için bu kayıtlar sunucunun UTC farkı kadar
+kaymış duruyor; admin zaman filtreleri ve failed_logins TTL süresi bu farkla hatalı çalışıyor.
+Çevrilen alanlar: failed_logins.timestamp, users.created_at, users.last_login.
+
+Sadece --before'dan (UTC yazan sürümün devreye alındığı an, ISO 8601) önceki değerlere dokunur.
+Yerel saat, betiğin çalıştığı makinenin saat dilimiyle (yaz saati dahil, kayıt tarihine göre)
+yorumlanıyor; uygulamanın çalıştığı saat dilimiyle çalıştırın (ör. TZ=Europe/Istanbul).
+Dönüşüm migrations koleksiyonuna işleniyor, tekrar çalıştırılırsa kayıtları bir daha kaydırmıyor.
+
+Kullanım:
+    python tools/migrate_timestamps.py --before 2026-10-18T12:00:00+03:00 [--batch-size 500] [--dry-run]
+"""
+import argparse
+import datetime
+import os
+import sys
+
+from pymongo import UpdateOne
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.models import db  # noqa: E402
+
+MIGRATION_ID = 'timestamps_utc'
+ALANLAR = (('failed_logins', 'timestamp'), ('users', 'created_at'), ('users', 'last_login'))
+
+
+def yerelden_utc(zaman):
+    # Saklanan değer yerel saatin rakamlarını taşıyor: saat dilimsiz yorumlayıp UTC'ye çeviriyorum.
+    return zaman.replace(tzinfo=None).astimezone(datetime.timezone.utc)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--before', required=True, help='UTC yazan sürümün devreye alındığı an (ISO 8601)')
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--dry-run', action='store_true', help='Sadece kaç kaydın çevrileceğini say, yazma')
+    args = parser.parse_args()
+
+    if db is None:
+        print("MongoDB bağlantısı yok.")
+        return 1
+    if db.migrations.find_one({"_id": MIGRATION_ID}) is not None:
+        print("Zaman damgaları daha önce UTC'ye çevrilmiş, bir şey yapılmadı.")
+        return 0
+
+    sinir = datetime.datetime.fromisoformat(args.before)
+    if sinir.tzinfo is None:
+        sinir = sinir.astimezone()
+    # Eski kayıtlar yerel saatin rakamlarıyla saklandığı için sınırı da yerel rakamlarla karşılaştırıyorum.
+    yerel_sinir = sinir.astimezone().replace(tzinfo=None)
+
+    sayilar = {}
+    for koleksiyon, alan in ALANLAR:
+        islemler, sayi = [], 0
+        for doc in db[koleksiyon].find({alan: {"$type": "date", "$lt": yerel_sinir}}, {alan: 1}):
+            sayi += 1
+            if not args.dry_run:
+                islemler.append(UpdateOne({"_id": doc['_id'], alan: doc[alan]}, {"$set": {alan: yerelden_utc(doc[alan])}}))
+                if len(islemler) >= args.batch_size:
+                    db[koleksiyon].bulk_write(islemler, ordered=False)
+                    islemler = []
+        if islemler:
+            db[koleksiyon].bulk_write(islemler, ordered=False)
+        sayilar[f"{koleksiyon}.{alan}"] = sayi
+
+    if not args.dry_run:
+        db.migrations.insert_one({"_id": MIGRATION_ID, "before": sinir.astimezone(datetime.timezone.utc),
+                                  "migrated_at": datetime.datetime.now(datetime.timezone.utc), "counts": sayilar})
+    fark = sinir.astimezone().utcoffset()
+    print(f"Yerel saat farkı {fark}; {'çevrilecek' if args.dry_run else 'çevrilen'} kayıtlar: "
+          + ", ".join(f"{ad}: {sayi}" for ad, sayi in sayilar.items()))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,125 @@
+"""
+Simge: PCA izdüşümünü eğitme ve hedef boyut başına doğruluk/gecikme raporu.
+
+    python tools/pca.py fit [--components 64]
+        users koleksiyonundaki embedding'lerden yeni bir izdüşüm sürümü eğitir ve
+        Config.PCA_MODEL_PATH'e kaydeder (eski sürüm .<sürüm>.npz olarak arşivlenir).
+        Çalışan uygulamada galeri POST /api/admin/gallery/rebuild ile yeni sürüme
+        izdüşürülür; yeniden başlatmada da otomatik yüklenir.
+
+    python tools/pca.py report [--components 128 64 32 16] [--synthetic 10000]
+        Her hedef boyut için tam boyutlu eşleştirmeye göre top-1 ve eşik kararı
+        uyumunu, benzerlik sapmasını ve sorgu gecikmesini ölçer.
+"""
+import argparse
+import os
+import shutil
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config  # noqa: E402
+from app.ann import ExactSearch  # noqa: E402
+from app.gallery import GalleryIndex, common_dim, embeddings_to_matrix  # noqa: E402
+from app.pca import PCAProjection  # noqa: E402
+
+
+def load_users(synthetic):
+    if synthetic:
+        from benchmarks.ann_benchmark import synthetic_gallery
+        _, pozlar = synthetic_gallery(synthetic, 10)
+        return [(f"u{i}", f"user{i}", pozlar[i]) for i in range(synthetic)]
+    from app.models import User
+    return list(User().iter_gallery_entries())
+
+
+def gallery_matrix(users):
+    # İzdüşüm galerinin boyutunda eğitiliyor; başka boyuttaki kullanıcılar galeriye de alınmıyor.
+    bloklar = [embeddings_to_matrix(embeddings) for _, _, embeddings in users]
+    boyut = common_dim(bloklar)
+    bloklar = [blok for blok in bloklar if blok.shape[0] and blok.shape[1] == boyut]
+    return np.concatenate(bloklar) if bloklar else np.empty((0, boyut or 0), dtype=np.float32)
+
+
+def cmd_fit(args):
+    users = load_users(args.synthetic)
+    matrix = gallery_matrix(users)
+    if matrix.shape[0] < args.components:
+        print(f"Eğitim için yeterli embedding yok ({matrix.shape[0]} poz).")
+        return 1
+    projection = PCAProjection.fit(matrix, args.components)
+    if os.path.exists(args.output):
+        eski = PCAProjection.load(args.output)
+        arsiv = args.output.replace('.npz', f'.{eski.version}.npz')
+        shutil.copyfile(args.output, arsiv)
+        print(f"Önceki sürüm arşivlendi: {arsiv}")
+    projection.save(args.output)
+    print(f"Sürüm {projection.version}: {matrix.shape[0]} pozdan {projection.n_components} bileşen, "
+          f"korunan varyans %{projection.retained_variance() * 100:.1f}")
+    return 0
+
+
+def cmd_report(args):
+    users = load_users(args.synthetic)
+    matrix = gallery_matrix(users)
+    if matrix.shape[0] == 0:
+        print("Galeri boş, ölçülecek bir şey yok.")
+        return 1
+
+    rng = np.random.default_rng(0)
+    secilen = matrix[rng.choice(matrix.shape[0], min(args.queries, matrix.shape[0]), replace=False)]
+    sorgular = embeddings_to_matrix(secilen + args.noise * rng.normal(size=secilen.shape).astype(np.float32) / np.sqrt(secilen.shape[1]))
+    esik = Config.DETECTION_CONFIDENCE * 100
+
+    def olc(galeri):
+        sonuclar, sureler = [], []
+        for sorgu in sorgular:
+            bas = time.perf_counter()
+            sonuclar.append(galeri.search(sorgu)[0])
+            sureler.append(time.perf_counter() - bas)
+        return sonuclar, np.median(sureler) * 1000
+
+    referans = GalleryIndex(search_engine=ExactSearch(), keep_float=True, centroid_shortlist=0)
+    referans.build(users, projection=None)
+    ref_sonuclar, ref_sure = olc(referans)
+
+    print(f"Galeri: {len(referans)} kullanıcı, {referans.size} poz. {len(sorgular)} sorgu, eşik %{esik:.0f}")
+    print(f"{'boyut':>6}{'varyans':>9}{'B/vektör':>10}{'top1':>8}{'karar':>8}{'ort sapma':>11}{'ms/sorgu':>10}")
+    print(f"{matrix.shape[1]:>6}{1.0:>9.3f}{4 * matrix.shape[1]:>10}{1.0:>8.3f}{1.0:>8.3f}{0.0:>11.3f}{ref_sure:>10.3f}")
+    for boyut in args.components:
+        projection = PCAProjection.fit(matrix, boyut)
+        galeri = GalleryIndex(search_engine=ExactSearch(), keep_float=True, centroid_shortlist=0)
+        galeri.build(users, projection=projection)
+        sonuclar, sure = olc(galeri)
+        top1 = np.mean([a[0] == b[0] for a, b in zip(sonuclar, ref_sonuclar)])
+        karar = np.mean([(a[2] > esik) == (b[2] > esik) and (b[2] <= esik or a[0] == b[0]) for a, b in zip(sonuclar, ref_sonuclar)])
+        sapma = np.mean([abs(a[2] - b[2]) for a, b in zip(sonuclar, ref_sonuclar)])
+        print(f"{boyut:>6}{projection.retained_variance():>9.3f}{4 * boyut:>10}{top1:>8.3f}{karar:>8.3f}{sapma:>11.3f}{sure:>10.3f}")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--synthetic', type=int, default=0, help='MongoDB yerine bu kadar sentetik kullanıcı kullan')
+    alt = parser.add_subparsers(dest='command', required=True)
+
+    fit = alt.add_parser('fit', help='Yeni izdüşüm sürümü eğit ve kaydet')
+    fit.add_argument('--components', type=int, default=Config.PCA_COMPONENTS)
+    fit.add_argument('--output', default=Config.PCA_MODEL_PATH)
+    fit.set_defaults(func=cmd_fit)
+
+    report = alt.add_parser('report', help='Hedef boyut başına doğruluk/gecikme raporu')
+    report.add_argument('--components', type=int, nargs='+', default=[96, 64, 48, 32, 16])
+    report.add_argument('--queries', type=int, default=500)
+    report.add_argument('--noise', type=float, default=0.03)
+    report.set_defaults(func=cmd_report)
+
+    args = parser.parse_args()
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
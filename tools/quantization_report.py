@@ -0,0 +1,92 @@
+"""
+Simge: Nicemlenmiş embedding ayarlarının doğruluk farkını mevcut galeri üzerinde ölçer.
+Referans, calculate_similarity ile aynı sonucu veren tam float taramadır. Her ayar için:
+  - vektör başına bellek,
+  - kodlar üzerinden hesaplanan benzerliğin tam benzerlikten sapması (puan),
+  - yeniden skorlama olmadan ve yeniden skorlamayla top-1 kullanıcı uyumu,
+  - DETECTION_CONFIDENCE eşiğindeki kabul/ret kararının uyumu.
+
+Sorgular galerideki pozlardan örneklenip hafif gürültü eklenerek üretiliyor.
+
+Kullanım:
+    python tools/quantization_report.py [--queries 500] [--pq-subspaces 8 16 32] [--synthetic 10000]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config  # noqa: E402
+from app.ann import ExactSearch, Int8Search, PQSearch  # noqa: E402
+from app.gallery import GalleryIndex, cosine_to_similarity, embeddings_to_matrix  # noqa: E402
+
+
+def load_users(args):
+    if args.synthetic:
+        from benchmarks.ann_benchmark import synthetic_gallery
+        _, pozlar = synthetic_gallery(args.synthetic, 10)
+        return [(f"u{i}", f"user{i}", pozlar[i]) for i in range(args.synthetic)]
+    from app.models import User
+    return list(User().iter_gallery_entries())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--noise', type=float, default=0.03, help='Sorgulara eklenen gürültü (vektör normuna göre)')
+    parser.add_argument('--pq-subspaces', type=int, nargs='+', default=[8, 16, 32])
+    parser.add_argument('--rerank-k', type=int, default=Config.QUANTIZED_RERANK_K)
+    parser.add_argument('--synthetic', type=int, default=0, help='MongoDB yerine bu kadar sentetik kullanıcı kullan')
+    args = parser.parse_args()
+
+    kullanicilar = load_users(args)
+    referans = GalleryIndex(search_engine=ExactSearch(), keep_float=True, centroid_shortlist=0)
+    referans.build(kullanicilar)
+    if referans.size == 0:
+        print("Galeri boş, ölçülecek bir şey yok.")
+        return 1
+
+    rng = np.random.default_rng(0)
+    tum_pozlar = referans._state.matrix
+    secilen = tum_pozlar[rng.choice(tum_pozlar.shape[0], min(args.queries, tum_pozlar.shape[0]), replace=False)]
+    sorgular = secilen + args.noise * rng.normal(size=secilen.shape).astype(np.float32) / np.sqrt(secilen.shape[1])
+    sorgular = embeddings_to_matrix(sorgular)
+    esik = Config.DETECTION_CONFIDENCE * 100
+    ref_sonuclar = [referans.search(sorgu)[0] for sorgu in sorgular]
+
+    ayarlar = [('int8', Int8Search(rerank_k=args.rerank_k))]
+    ayarlar += [(f'pq/m={m}', PQSearch(n_subspaces=m, rerank_k=args.rerank_k)) for m in args.pq_subspaces]
+
+    print(f"Galeri: {len(referans)} kullanıcı, {referans.size} poz. {len(sorgular)} sorgu, eşik %{esik:.0f}")
+    print(f"{'ayar':<10}{'B/vektör':>10}{'ort sapma':>11}{'max sapma':>11}{'top1 kod':>10}{'top1 rerank':>13}{'karar':>8}{'ms/sorgu':>10}")
+    print(f"{'float32':<10}{4 * tum_pozlar.shape[1]:>10}{0.0:>11.3f}{0.0:>11.3f}{1.0:>10.3f}{1.0:>13.3f}{1.0:>8.3f}{'-':>10}")
+
+    slot_of_row = np.searchsorted(referans._state.starts, np.arange(tum_pozlar.shape[0]), side='right') - 1
+    for ad, motor in ayarlar:
+        galeri = GalleryIndex(search_engine=motor, keep_float=True, centroid_shortlist=0)
+        galeri.build(kullanicilar)
+        durum = galeri._state.engine_state
+        sapmalar, kod_uyumu, rerank_uyumu, karar_uyumu, sureler = [], [], [], [], []
+        for sorgu, ref in zip(sorgular, ref_sonuclar):
+            yaklasik = durum.quantizer.scores(durum.codes, durum.scales, sorgu)
+            tam = tum_pozlar @ sorgu
+            sapmalar.append(np.abs(cosine_to_similarity(yaklasik) - cosine_to_similarity(tam)).mean())
+            kod_uyumu.append(referans._state.user_ids[slot_of_row[int(np.argmax(yaklasik))]] == ref[0])
+
+            bas = time.perf_counter()
+            sonuc = galeri.search(sorgu)[0]
+            sureler.append(time.perf_counter() - bas)
+            rerank_uyumu.append(sonuc[0] == ref[0])
+            karar_uyumu.append((sonuc[2] > esik) == (ref[2] > esik) and (ref[2] <= esik or sonuc[0] == ref[0]))
+
+        print(f"{ad:<10}{motor.quantizer_factory().bytes_per_vector(tum_pozlar.shape[1]):>10}{np.mean(sapmalar):>11.3f}{np.max(sapmalar):>11.3f}"
+              f"{np.mean(kod_uyumu):>10.3f}{np.mean(rerank_uyumu):>13.3f}{np.mean(karar_uyumu):>8.3f}{np.median(sureler) * 1000:>10.3f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())